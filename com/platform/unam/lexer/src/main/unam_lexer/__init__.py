@@ -0,0 +1,25 @@
+"""Lexical analyzer core: importable without tkinter.
+
+The GUI lives in unam_lexer.gui and is only imported by the GUI entry
+point (unam_lexer.cli.main without a command).
+"""
+
+from .tokens import Token, TokenBuffer, TokenStatistics, LexerProfile
+from .dfa import LexerDFA, PatternSyntaxError
+from .languages import DEFAULT_LANGUAGE, LANGUAGE_PROFILES, LanguageProfile
+from .utf8 import MappedTokenBuffer
+from .analyzer import (LexicalAnalyzer, IncrementalLexer, TokenCache, AnalysisJob,
+                       UnknownInputError)
+from .columnar import TokenTable
+from .preprocessor import Preprocessor, TranslationUnit
+from .index import TokenIndex
+from .tokendiff import TokenDiff
+
+__all__ = [
+    'Token', 'TokenBuffer', 'TokenStatistics', 'LexerProfile',
+    'LexerDFA', 'PatternSyntaxError',
+    'DEFAULT_LANGUAGE', 'LANGUAGE_PROFILES', 'LanguageProfile',
+    'MappedTokenBuffer',
+    'LexicalAnalyzer', 'IncrementalLexer', 'TokenCache', 'AnalysisJob', 'UnknownInputError',
+    'TokenTable', 'Preprocessor', 'TranslationUnit', 'TokenIndex', 'TokenDiff',
+]
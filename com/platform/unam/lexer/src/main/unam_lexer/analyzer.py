@@ -0,0 +1,1642 @@
+"""The lexical analyzer, incremental re-lexing and the token cache"""
+
+import re
+import sys
+import time
+import queue
+import hashlib
+import struct
+import tempfile
+import threading
+import os
+import mmap
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .languages import DEFAULT_LANGUAGE, LanguageProfile
+from .dfa import CharSet, LexerDFA, PatternSyntaxError, start_chars
+from .tokens import LexerProfile, Token, TokenBuffer, TokenStatistics
+from .utf8 import (MappedTokenBuffer, charset_bytes_regex, count_line_ends, last_line_end,
+                   utf8_bytes_pattern, utf8_length)
+
+class UnknownInputError(ValueError):
+    """More runs of unrecognized input than an analyzer's max_unknown allows"""
+
+    def __init__(self, limit, line, column):
+        super().__init__(f"gave up after {limit} runs of unrecognized input "
+                         f"(line {line}, column {column})")
+        self.limit = limit
+        self.line = line
+        self.column = column
+
+class LexicalAnalyzer:
+    # Available scanning engines:
+    #   'master'    -> one combined regex with named groups (fast)
+    #   'reference' -> original loop trying each pattern in order
+    #   'dfa'       -> table-driven DFA compiled from the patterns (no backtracking)
+    ENGINES = ('master', 'reference', 'dfa')
+
+    # Compiled scanner artifacts (DFA tables, UTF-8 byte patterns) are saved
+    # here keyed by the language spec fingerprint, and kept per process
+    DFA_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'unam_lexer')
+    _dfa_by_fingerprint = {}
+    # UTF-8 bytes master patterns for memory-mapped scanning, per fingerprint
+    _bytes_pattern_by_fingerprint = {}
+    BYTES_PATTERN_VERSION = 1
+    UNKNOWN_PATTERN_VERSION = 1
+    # compile_spec() results, per fingerprint
+    _compiled_by_fingerprint = {}
+    # Patterns consuming a whole run of unrecognized input, per fingerprint
+    # (str pattern, then UTF-8 bytes pattern); built on the first unknown char
+    _unknown_pattern_by_fingerprint = {}
+    _bytes_unknown_pattern_by_fingerprint = {}
+
+    # Streaming: default chunk size read from files/streams, and how many
+    # characters must follow a match before it is trusted not to grow
+    # (covers CHAR_LITERAL like '\\n' and float exponents like 1.5e+3)
+    STREAM_CHUNK_SIZE = 64 * 1024
+    STREAM_MARGIN = 4
+    # tokenize_parallel: smallest chunk worth a worker process
+    PARALLEL_MIN_CHUNK = 1024 * 1024
+    # Only these tokens can span lines (or need text past a window to match)
+    SPANNING_TYPES = ('STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE', 'COMMENT_MULTI')
+
+    def __init__(self, engine='master', dfa_cache_dir=None, dfa_fast_path=True, language=None,
+                 max_unknown=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        self.engine = engine
+        self.dfa_cache_dir = dfa_cache_dir or self.DFA_CACHE_DIR
+        self.dfa_fast_path = dfa_fast_path
+        self.dfa = None
+        # LexerProfile while profiling is enabled; tokenize checks it once per call
+        self.profile = None
+        # Error budget: scanning raises UnknownInputError past this many
+        # UNKNOWN runs in one call (None: no limit)
+        self.max_unknown = max_unknown
+
+        # Token definitions come from a language profile; the compiled
+        # patterns are shared by every analyzer with the same spec
+        if not isinstance(language, LanguageProfile):
+            language = LanguageProfile.get(language or DEFAULT_LANGUAGE)
+        self.language = language
+        self.keywords = language.keywords
+        self.operators = language.operators
+        self.punctuators = language.punctuators
+        self.special_symbols = language.special_symbols
+        self.token_patterns = language.token_patterns
+        self.dotall_patterns = language.dotall
+        self.STREAM_MARGIN = language.lookahead
+        self.compiled = None
+
+    @property
+    def compiled_patterns(self):
+        return self.compile_spec()[0]
+
+    @property
+    def master_pattern(self):
+        return self.compile_spec()[1]
+
+    @property
+    def string_prefix_pattern(self):
+        # Opening part of a string literal, used by the streaming scanner to
+        # tell an unterminated string from one cut by a chunk boundary
+        return self.compile_spec()[2]
+
+    @property
+    def state_pattern(self):
+        # Finds only the tokens that can span lines, skipping everything in
+        # between in bulk. None of the other tokens contain / " or ', so the
+        # spans it finds are the ones the master pattern would produce.
+        return self.compile_spec()[3]
+
+    def compile_spec(self):
+        """(compiled_patterns, master_pattern, string_prefix_pattern, state_pattern),
+        compiled on first use and then shared by every analyzer of the same spec
+        in the process
+        """
+        compiled = self.compiled
+        if compiled is None:
+            fingerprint = self.fingerprint()
+            compiled = self._compiled_by_fingerprint.get(fingerprint)
+            if compiled is None:
+                # Compile patterns (enable DOTALL only where the profile asks for it)
+                compiled_patterns = []
+                for name, pattern in self.token_patterns:
+                    flags = re.DOTALL if name in self.dotall_patterns else 0
+                    compiled_patterns.append((name, re.compile(pattern, flags)))
+                # Master pattern: every token pattern as a named group, in the same
+                # order, so the regex alternation keeps the first-match priority
+                compiled = (compiled_patterns, self.build_master_pattern(),
+                            re.compile(self.language.string_prefix), self.build_state_pattern())
+                self._compiled_by_fingerprint[fingerprint] = compiled
+            self.compiled = compiled
+        return compiled
+
+    def fingerprint(self):
+        """Hash of everything that decides the token output (not the engine)"""
+        return self.language.spec_hash()
+
+    def group_pattern(self, name, pattern):
+        """pattern as used inside a combined pattern (DOTALL scoped to it if needed)"""
+        return f'(?s:{pattern})' if name in self.dotall_patterns else pattern
+
+    def build_master_pattern(self):
+        """Combine all token patterns into a single alternation of named groups"""
+        parts = []
+        for name, pattern in self.token_patterns:
+            parts.append(f'(?P<{name}>{self.group_pattern(name, pattern)})')
+        return re.compile('|'.join(parts))
+
+    def build_state_pattern(self):
+        parts = [f'(?P<{name}>{self.group_pattern(name, pattern)})'
+                 for name, pattern in self.token_patterns if name in self.SPANNING_TYPES]
+        parts.append(r'(?P<BULK>[^/"\']+)|(?P<OTHER>(?s:.))')
+        return re.compile('|'.join(parts))
+
+    @property
+    def unknown_pattern(self):
+        # Matches a whole run of chars where the master pattern fails, so
+        # the run becomes one UNKNOWN token
+        fingerprint = self.fingerprint()
+        pattern = self._unknown_pattern_by_fingerprint.get(fingerprint)
+        if pattern is None:
+            pattern = re.compile(self.cached_pattern_source(
+                'unknown', self.UNKNOWN_PATTERN_VERSION, self.build_unknown_source).decode('utf-8'))
+            self._unknown_pattern_by_fingerprint[fingerprint] = pattern
+        return pattern
+
+    def build_unknown_source(self):
+        parts = []
+        dead = self.dead_chars()
+        if dead is not None and dead.intervals:
+            # Chars no token starts with are skipped in bulk, without the lookahead
+            parts.append(dead.to_regex() + '+')
+        parts.append(f'(?!(?:{self.master_pattern.pattern}))(?s:.)')
+        return ('(?:' + '|'.join(parts) + ')+').encode('utf-8')
+
+    def get_bytes_unknown_pattern(self):
+        """unknown_pattern for UTF-8 bytes; a run also takes invalid bytes and stops at \\r"""
+        fingerprint = self.fingerprint()
+        pattern = self._bytes_unknown_pattern_by_fingerprint.get(fingerprint)
+        if pattern is None:
+            pattern = re.compile(self.cached_pattern_source(
+                'bytes-unknown', self.UNKNOWN_PATTERN_VERSION, self.build_bytes_unknown_source))
+            self._bytes_unknown_pattern_by_fingerprint[fingerprint] = pattern
+        return pattern
+
+    def build_bytes_unknown_source(self):
+        carriage_return = CharSet.of('\r')
+        parts = []
+        dead = self.dead_chars()
+        if dead is not None:
+            dead = dead.complement().union(carriage_return).complement()
+            if dead.intervals:
+                parts.append(f'(?:{charset_bytes_regex(dead)})+')
+        master = self.get_bytes_pattern().pattern.decode('ascii')
+        parts.append(f'(?!(?:{master}))(?:{charset_bytes_regex(carriage_return.complement())}'
+                     r'|[\x80-\xff])')
+        return ('(?:' + '|'.join(parts) + ')+').encode('ascii')
+
+    def dead_chars(self):
+        """CharSet of the chars no token can start with, or None if the
+        patterns use syntax the DFA parser does not read
+        """
+        try:
+            return start_chars(self.token_patterns, self.dotall_patterns).complement()
+        except PatternSyntaxError:
+            return None
+
+    def tokenize(self, text):
+        if self.profile is not None:
+            return self.tokenize_profiled(text)
+        if self.engine == 'reference':
+            return self.tokenize_reference(text)
+        if self.engine == 'dfa':
+            return self.tokenize_dfa(text)
+        return self.tokenize_master(text)
+
+    def enable_profiling(self):
+        """Record a LexerProfile on every tokenize call until disabled"""
+        self.profile = LexerProfile(name for name, _ in self.compiled_patterns)
+        return self.profile
+
+    def disable_profiling(self):
+        profile = self.profile
+        self.profile = None
+        return profile
+
+    def tokenize_profiled(self, text, profile=None):
+        """tokenize with every pattern tried and timed in turn.
+
+        The master pattern tries the same alternatives in the same order,
+        so the failed attempts recorded per pattern are what pattern order
+        costs. Much slower than tokenize; only used while profiling.
+        """
+        if profile is None:
+            profile = self.profile
+        clock = time.perf_counter_ns
+        started = clock()
+        matches = profile.matches
+        failures = profile.failures
+        pattern_ns = profile.pattern_ns
+        type_counts = profile.type_counts
+        category_bytes = profile.category_bytes
+        category_of = {name: profile.category_of(name) for name in profile.pattern_names}
+        category_of.update((tt, profile.category_of(tt)) for tt in ('KEYWORD', 'PUNCTUATOR', 'UNKNOWN'))
+
+        tokens = []
+        pos = 0
+        line = 1
+        column = 1
+        length = len(text)
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+
+        while pos < length:
+            match = None
+            for token_type, pattern in self.compiled_patterns:
+                before = clock()
+                match = pattern.match(text, pos)
+                pattern_ns[token_type] += clock() - before
+                if match:
+                    matches[token_type] += 1
+                    break
+                failures[token_type] += 1
+
+            if match is None:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                match = self.unknown_pattern.match(text, pos)
+                token_type = 'UNKNOWN'
+                profile.unknown_lines[line] += 1
+                profile.unknown_chars.update(match.group(0))
+
+            value = match.group(0)
+            tt = token_type
+            if tt == 'IDENTIFIER' and value in self.keywords:
+                tt = 'KEYWORD'
+            elif tt == 'SPECIAL_SYMBOL' and value in self.punctuators:
+                tt = 'PUNCTUATOR'
+            if tt not in ignore_types:
+                tokens.append(Token(tt, value, line, column))
+            type_counts[tt] += 1
+            category_bytes[category_of[tt]] += (len(value) if value.isascii()
+                                                else len(value.encode('utf-8', 'surrogatepass')))
+
+            newlines = value.count('\n')
+            if newlines:
+                line += newlines
+                column = len(value) - value.rfind('\n')
+            else:
+                column += len(value)
+            pos = match.end()
+
+        profile.runs += 1
+        profile.chars += length
+        profile.total_ns += clock() - started
+        return tokens
+
+    def get_dfa(self):
+        """The LexerDFA for these patterns: from memory, the disk cache, or compiled"""
+        if self.dfa is not None:
+            return self.dfa
+        fingerprint = self.fingerprint()
+        dfa = self._dfa_by_fingerprint.get(fingerprint)
+        if dfa is None:
+            path = os.path.join(self.dfa_cache_dir, f'dfa-{fingerprint}-v{LexerDFA.VERSION}.bin')
+            try:
+                dfa = LexerDFA.load(path)
+            except (OSError, ValueError, struct.error):
+                dfa = LexerDFA.compile(self.token_patterns, dotall_patterns=self.dotall_patterns)
+                try:
+                    os.makedirs(self.dfa_cache_dir, exist_ok=True)
+                    dfa.save(path)
+                except OSError:
+                    # Only startup time is lost
+                    pass
+            self._dfa_by_fingerprint[fingerprint] = dfa
+        self.dfa = dfa
+        return dfa
+
+    def tokenize_dfa(self, text):
+        """Scan with the compiled DFA (maximal munch, pattern order breaks ties)"""
+        dfa = self.get_dfa()
+        names = dfa.pattern_names
+        tokens = []
+        append = tokens.append
+        keywords = self.keywords
+        punctuators = self.punctuators
+        line = 1
+        column = 1
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        # An UNKNOWN run holds newlines when no pattern matches them
+        multiline_types = {'STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE',
+                           'COMMENT_MULTI', 'NEWLINE', 'UNKNOWN'}
+
+        for index, pos, end in dfa.scan(text, self.dfa_fast_path):
+            value = text[pos:end]
+            if index < 0:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                tt = 'UNKNOWN'
+            else:
+                tt = names[index]
+            if tt not in ignore_types:
+                if tt == 'IDENTIFIER':
+                    if value in keywords:
+                        tt = 'KEYWORD'
+                elif tt == 'SPECIAL_SYMBOL' and value in punctuators:
+                    tt = 'PUNCTUATOR'
+                append(Token(tt, value, line, column))
+
+            if tt in multiline_types:
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    column = end - pos - value.rfind('\n')
+                else:
+                    column += end - pos
+            else:
+                column += end - pos
+
+        return tokens
+
+    def tokenize_master(self, text):
+        """Scan with the combined master pattern, dispatching on match.lastgroup"""
+        tokens = []
+        append = tokens.append
+        match = self.master_pattern.match
+        keywords = self.keywords
+        punctuators = self.punctuators
+        pos = 0
+        line = 1
+        column = 1
+        length = len(text)
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        # Only these can consume a newline character (an UNKNOWN run when
+        # no pattern matches newlines)
+        multiline_types = {'STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE',
+                           'COMMENT_MULTI', 'NEWLINE', 'UNKNOWN'}
+
+        while pos < length:
+            m = match(text, pos)
+
+            if m is None:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                m = self.unknown_pattern.match(text, pos)
+                tt = 'UNKNOWN'
+            else:
+                tt = m.lastgroup
+            end = m.end()
+            value = text[pos:end]
+
+            if tt not in ignore_types:
+                if tt == 'IDENTIFIER':
+                    if value in keywords:
+                        tt = 'KEYWORD'
+                elif tt == 'SPECIAL_SYMBOL' and value in punctuators:
+                    tt = 'PUNCTUATOR'
+                append(Token(tt, value, line, column))
+
+            if tt in multiline_types:
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    column = end - pos - value.rfind('\n')
+                else:
+                    column += end - pos
+            else:
+                column += end - pos
+
+            pos = end
+
+        return tokens
+
+    def tokenize_buffer(self, text):
+        """Scan like tokenize_master but store the result in a TokenBuffer"""
+        buffer = TokenBuffer(text)
+        self.scan_into(buffer, text)
+        return buffer
+
+    def scan_into(self, buffer, text, pos=0, line=1, column=1, stop=None):
+        """Append the tokens starting in text[pos:stop] to buffer.
+
+        Returns the (pos, line, column) to resume from, so a long text can
+        be scanned in steps. max_unknown applies to each call.
+        """
+        push = buffer.append
+        intern = TokenBuffer.intern_type
+        match = self.master_pattern.match
+        keywords = self.keywords
+        punctuators = self.punctuators
+        if stop is None or stop > len(text):
+            stop = len(text)
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        multiline_types = {'STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE',
+                           'COMMENT_MULTI', 'NEWLINE', 'UNKNOWN'}
+        codes = {name: intern(name) for name, _ in self.token_patterns}
+        codes['UNKNOWN'] = intern('UNKNOWN')
+        keyword_code = intern('KEYWORD')
+        punctuator_code = intern('PUNCTUATOR')
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        while pos < stop:
+            m = match(text, pos)
+
+            if m is None:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                m = self.unknown_pattern.match(text, pos)
+                tt = 'UNKNOWN'
+            else:
+                tt = m.lastgroup
+            end = m.end()
+
+            if tt not in ignore_types:
+                code = codes[tt]
+                if tt == 'IDENTIFIER':
+                    if text[pos:end] in keywords:
+                        code = keyword_code
+                elif tt == 'SPECIAL_SYMBOL' and text[pos:end] in punctuators:
+                    code = punctuator_code
+                push(code, pos, end, line, column)
+
+            if tt in multiline_types:
+                newlines = text.count('\n', pos, end)
+                if newlines:
+                    line += newlines
+                    column = end - text.rfind('\n', pos, end)
+                else:
+                    column += end - pos
+            else:
+                column += end - pos
+
+            pos = end
+
+        return pos, line, column
+
+    def tokenize_parallel(self, text, workers=None, min_chunk=None):
+        """Lex a large text in chunks on worker processes; same result as tokenize_buffer.
+
+        A pre-scan over state_pattern finds line starts that no string or
+        comment spans, and each chunk is handed to a worker as soon as the
+        pre-scan has passed its end, so the pre-scan overlaps the lexing.
+        Workers scan their chunk of the full text, so matches see the same
+        lookahead as a sequential scan. Stitching still checks that every
+        chunk's scan ends exactly where the next one starts and rescans
+        otherwise, so the result never depends on the pre-scan being right.
+        """
+        workers = workers or os.cpu_count() or 1
+        min_chunk = min_chunk or self.PARALLEL_MIN_CHUNK
+        if workers < 2 or len(text) < 2 * min_chunk or 'fork' not in multiprocessing.get_all_start_methods():
+            # Workers inherit the text through fork; without it, stay sequential
+            return self.tokenize_buffer(text)
+        # A few chunks per worker keep them busy while the pre-scan runs ahead
+        chunk_size = max(min_chunk, len(text) // (workers * 4))
+
+        # Intern every type code before forking so all processes agree on them
+        for name, _ in self.token_patterns:
+            TokenBuffer.intern_type(name)
+        for name in ('KEYWORD', 'PUNCTUATOR', 'UNKNOWN'):
+            TokenBuffer.intern_type(name)
+
+        global _parallel_job
+        _parallel_job = (self, text)
+        chunks = []
+        futures = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('fork')) as pool:
+                start = 0
+                line = 1
+                for stop in self.iter_chunk_boundaries(text, chunk_size):
+                    chunks.append((start, stop, line))
+                    futures.append(pool.submit(lex_chunk_worker, chunks[-1]))
+                    line += text.count('\n', start, stop)
+                    start = stop
+                chunks.append((start, len(text), line))
+                futures.append(pool.submit(lex_chunk_worker, chunks[-1]))
+                results = [future.result() for future in futures]
+        finally:
+            _parallel_job = None
+        return self.stitch_chunks(text, chunks, results)
+
+    def iter_chunk_boundaries(self, text, size):
+        """Yield line starts about size chars apart that no string or comment spans"""
+        target = size
+        find = text.find
+        for m in self.state_pattern.finditer(text):
+            end = m.end()
+            if end <= target:
+                continue
+            tt = m.lastgroup
+            if tt == 'BULK' or tt == 'OTHER':
+                newline = find('\n', max(m.start(), target), end)
+                if newline >= 0:
+                    if newline + 1 >= len(text):
+                        return
+                    yield newline + 1
+                    target = newline + 1 + size
+
+    def stitch_chunks(self, text, chunks, results):
+        """Join the chunk results of tokenize_parallel, rescanning where a chunk started mid-token"""
+        buffer = TokenBuffer(text)
+        columns = (buffer.type_codes, buffer.starts, buffer.ends, buffer.lines, buffer.columns)
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        intern = TokenBuffer.intern_type
+        pos, line, column = 0, 1, 1
+
+        for (start, _, _), (arrays, end) in zip(chunks, results):
+            first = 0
+            if pos > start:
+                # The previous chunk ran past this chunk's start: rescan until
+                # reaching one of this chunk's token starts
+                starts = arrays[1]
+                first = None
+                for tt, seg_start, seg_end, seg_line, seg_column in self.scan_segments(text, pos, line, column):
+                    if seg_start >= end[0]:
+                        break
+                    i = bisect_left(starts, seg_start)
+                    if i < len(starts) and starts[i] == seg_start:
+                        first = i
+                        break
+                    if tt not in ignore_types:
+                        buffer.append(intern(tt), seg_start, seg_end, seg_line, seg_column)
+                else:
+                    seg_start, seg_line, seg_column = len(text), None, None
+                if first is None:
+                    # No common token start: the rescan carries on into the next chunk
+                    if seg_line is None:
+                        pos = len(text)
+                    else:
+                        pos, line, column = seg_start, seg_line, seg_column
+                    continue
+            for target, source in zip(columns, arrays):
+                target.extend(source[first:] if first else source)
+            pos, line, column = end
+
+        if pos < len(text):
+            self.scan_into(buffer, text, pos, line, column)
+        return buffer
+
+    def get_bytes_pattern(self):
+        """Master pattern rewritten to match UTF-8 bytes: from memory, the disk cache, or built"""
+        fingerprint = self.fingerprint()
+        pattern = self._bytes_pattern_by_fingerprint.get(fingerprint)
+        if pattern is None:
+            pattern = re.compile(self.cached_pattern_source('bytes', self.BYTES_PATTERN_VERSION,
+                                                            self.build_bytes_source))
+            self._bytes_pattern_by_fingerprint[fingerprint] = pattern
+        return pattern
+
+    def build_bytes_source(self):
+        parts = []
+        for name, token_pattern in self.token_patterns:
+            source = utf8_bytes_pattern(token_pattern, name in self.dotall_patterns)
+            parts.append(f'(?P<{name}>{source})')
+        return '|'.join(parts).encode('ascii')
+
+    def cached_pattern_source(self, kind, version, build):
+        """Regex source from the disk cache (keyed by the spec fingerprint), or build() saved there"""
+        path = os.path.join(self.dfa_cache_dir, f'{kind}-{self.fingerprint()}-v{version}.re')
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            pass
+        source = build()
+        try:
+            os.makedirs(self.dfa_cache_dir, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(source)
+        except OSError:
+            # Only startup time is lost
+            pass
+        return source
+
+    def iter_mapped_rows(self, data):
+        """Yield (type, start, end, line, column) over UTF-8 bytes (e.g. an mmap).
+
+        Offsets are byte offsets; tokens, lines and columns are exactly
+        what tokenize gives on the text read from the file in text mode,
+        where \r\n and a lone \r are \n (MappedTokenBuffer decodes values
+        the same way). Nothing is kept, so memory stays constant whatever
+        the input size.
+        """
+        match = self.get_bytes_pattern().match
+        keywords = {keyword.encode('utf-8') for keyword in self.keywords}
+        punctuators = {punctuator.encode('utf-8') for punctuator in self.punctuators}
+        pos = 0
+        line = 1
+        column = 1
+        length = len(data)
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        # Types whose text may hold newlines or non-ASCII chars
+        counted_types = {'IDENTIFIER', 'STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE',
+                         'COMMENT_MULTI', 'NEWLINE'}
+
+        while pos < length:
+            m = match(data, pos)
+
+            if m is None:
+                if data[pos] == 13:
+                    # \r\n and lone \r end lines, as when reading in text mode
+                    if pos + 1 < length and data[pos + 1] == 10:
+                        pos += 1
+                    else:
+                        line += 1
+                        column = 1
+                        pos += 1
+                    continue
+                # Unrecognized input (or invalid bytes) -> one UNKNOWN token for the run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                end = self.get_bytes_unknown_pattern().match(data, pos).end()
+                yield 'UNKNOWN', pos, end, line, column
+                # Every invalid byte counts as one column
+                value = bytes(data[pos:end])
+                newlines = value.count(b'\n')
+                if newlines:
+                    line += newlines
+                    column = len(value[value.rfind(b'\n') + 1:].decode('utf-8', 'surrogateescape')) + 1
+                else:
+                    column += len(value.decode('utf-8', 'surrogateescape'))
+                pos = end
+                continue
+
+            tt = m.lastgroup
+            end = m.end()
+
+            if tt in counted_types:
+                value = m.group()
+                if b'\r' in value:
+                    newlines = count_line_ends(value)
+                    last = last_line_end(value)
+                else:
+                    newlines = value.count(b'\n')
+                    last = value.rfind(b'\n')
+                if newlines:
+                    next_line = line + newlines
+                    next_column = utf8_length(value[last + 1:]) + 1
+                else:
+                    next_line = line
+                    next_column = column + utf8_length(value)
+            else:
+                next_line = line
+                next_column = column + end - pos
+
+            if tt not in ignore_types:
+                if tt == 'IDENTIFIER':
+                    if data[pos:end] in keywords:
+                        tt = 'KEYWORD'
+                elif tt == 'SPECIAL_SYMBOL' and data[pos:end] in punctuators:
+                    tt = 'PUNCTUATOR'
+                yield tt, pos, end, line, column
+
+            line = next_line
+            column = next_column
+            pos = end
+
+    def tokenize_mapped(self, path):
+        """Lex a file through mmap into a MappedTokenBuffer (close it when done)"""
+        f = open(path, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                data = b''
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if hasattr(data, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+            buffer = MappedTokenBuffer(data, f)
+            push = buffer.append
+            intern = TokenBuffer.intern_type
+            codes = {}
+            for tt, start, end, line, column in self.iter_mapped_rows(data):
+                code = codes.get(tt)
+                if code is None:
+                    code = codes[tt] = intern(tt)
+                push(code, start, end, line, column)
+            return buffer
+        except Exception:
+            f.close()
+            raise
+
+    def iter_tokens(self, source=None, chunk_size=None, path=None):
+        """Yield tokens lazily from source text, a file or a text stream.
+
+        A str source is always lexed as source text, never opened as a
+        file: name a file with path= (a str or os.PathLike), or pass an
+        os.PathLike such as pathlib.Path as source. Files and streams are
+        read in bounded chunks, so memory does not grow with the input size.
+        """
+        if (source is None) == (path is None):
+            raise TypeError("iter_tokens needs exactly one of source and path")
+        if isinstance(source, os.PathLike):
+            source, path = None, source
+        chunk_size = chunk_size or self.STREAM_CHUNK_SIZE
+        if isinstance(source, str):
+            yield from self.iter_chunk_tokens((source,))
+        elif path is not None:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from self.iter_chunk_tokens(iter(lambda: f.read(chunk_size), ''))
+        else:
+            yield from self.iter_chunk_tokens(iter(lambda: source.read(chunk_size), ''))
+
+    def iter_chunk_tokens(self, chunks):
+        """Yield tokens from an iterable of text chunks, same output as tokenize"""
+        chunks = iter(chunks)
+        match = self.master_pattern.match
+        keywords = self.keywords
+        punctuators = self.punctuators
+        buf = ''
+        pos = 0
+        eof = False
+        line = 1
+        column = 1
+        budget = self.max_unknown
+        unknown_runs = 0
+
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        multiline_types = {'STRING_LITERAL', 'CHAR_LITERAL', 'COMMENT_SINGLE',
+                           'COMMENT_MULTI', 'NEWLINE', 'UNKNOWN'}
+
+        while True:
+            if pos >= len(buf) and eof:
+                return
+
+            m = match(buf, pos) if pos < len(buf) else None
+
+            # The match may change once more text arrives: read more first
+            if not eof and (pos >= len(buf) or not self.is_stream_match_final(buf, pos, m)):
+                # Read at least as much as is pending so a long token that
+                # straddles many chunks is rescanned a logarithmic number of times
+                pending = buf[pos:]
+                parts = [pending]
+                wanted = max(len(pending), 1)
+                read = 0
+                while read < wanted:
+                    chunk = next(chunks, '')
+                    if not chunk:
+                        eof = True
+                        break
+                    parts.append(chunk)
+                    read += len(chunk)
+                buf = ''.join(parts)
+                pos = 0
+                continue
+
+            if m is None:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if budget is not None and unknown_runs > budget:
+                    raise UnknownInputError(budget, line, column)
+                m = self.unknown_pattern.match(buf, pos)
+                tt = 'UNKNOWN'
+            else:
+                tt = m.lastgroup
+            end = m.end()
+            value = buf[pos:end]
+
+            if tt not in ignore_types:
+                if tt == 'IDENTIFIER':
+                    if value in keywords:
+                        tt = 'KEYWORD'
+                elif tt == 'SPECIAL_SYMBOL' and value in punctuators:
+                    tt = 'PUNCTUATOR'
+                yield Token(tt, value, line, column)
+
+            if tt in multiline_types:
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    column = end - pos - value.rfind('\n')
+                else:
+                    column += end - pos
+            else:
+                column += end - pos
+
+            pos = end
+
+    def is_stream_match_final(self, buf, pos, m):
+        """Check that a match at pos cannot change when more text is appended to buf"""
+        if m is None:
+            # An UNKNOWN run: final once it stops short of the buffer end
+            return self.unknown_pattern.match(buf, pos).end() <= len(buf) - self.STREAM_MARGIN
+
+        if m.end() > len(buf) - self.STREAM_MARGIN:
+            return False
+
+        tt = m.lastgroup
+        if buf[pos] == '"' and tt != 'STRING_LITERAL':
+            # Unterminated string: final only if it broke before the buffer end
+            prefix = self.string_prefix_pattern.match(buf, pos)
+            return prefix.end() < len(buf) - 1
+        if tt == 'OPERATOR' and buf.startswith('/*', pos):
+            # Unclosed comment, the closing */ may be in the next chunk
+            return False
+        return True
+
+    def scan_segments(self, text, pos=0, line=1, column=1):
+        """Yield every scanned segment, ignored ones included, from pos.
+
+        Each item is (type, start, end, line, column) with keyword and
+        punctuator types already resolved; used to rescan a region.
+        """
+        match = self.master_pattern.match
+        keywords = self.keywords
+        punctuators = self.punctuators
+        length = len(text)
+
+        while pos < length:
+            m = match(text, pos)
+
+            if m is None:
+                m = self.unknown_pattern.match(text, pos)
+                tt = 'UNKNOWN'
+            else:
+                tt = m.lastgroup
+            end = m.end()
+            if tt == 'IDENTIFIER':
+                if text[pos:end] in keywords:
+                    tt = 'KEYWORD'
+            elif tt == 'SPECIAL_SYMBOL' and text[pos:end] in punctuators:
+                tt = 'PUNCTUATOR'
+            yield tt, pos, end, line, column
+
+            newlines = text.count('\n', pos, end)
+            if newlines:
+                line += newlines
+                column = end - text.rfind('\n', pos, end)
+            else:
+                column += end - pos
+            pos = end
+
+    def tokenize_reference(self, text):
+        """Original scanner: try each compiled pattern in order at every position"""
+        tokens = []
+        pos = 0
+        line = 1
+        column = 1
+        length = len(text)
+
+        unknown_runs = 0
+
+        # Tokens we want to skip entirely
+        ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+
+        while pos < length:
+            match_found = False
+
+            for token_type, pattern in self.compiled_patterns:
+                match = pattern.match(text, pos)
+                if not match:
+                    continue
+
+                value = match.group(0)
+                tt = token_type  # local copy so we don't mutate the pattern name
+
+                # classify identifiers that are keywords
+                if tt == 'IDENTIFIER' and value in self.keywords:
+                    tt = 'KEYWORD'
+
+                # add token unless it's in the ignore set
+                if tt not in ignore_types:
+                    if tt == 'PUNCTUATOR' or (tt == 'SPECIAL_SYMBOL' and value in self.punctuators):
+                        tokens.append(Token('PUNCTUATOR', value, line, column))
+                    else:
+                        tokens.append(Token(tt, value, line, column))
+
+                # advance pos and update line/column
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    last_nl = value.rfind('\n')
+                    # column after the last newline: number of chars after it
+                    column = len(value) - last_nl
+                else:
+                    column += len(value)
+
+                pos = match.end()
+                match_found = True
+                break
+
+            if not match_found:
+                # Unrecognized input -> one UNKNOWN token for the whole run
+                unknown_runs += 1
+                if self.max_unknown is not None and unknown_runs > self.max_unknown:
+                    raise UnknownInputError(self.max_unknown, line, column)
+                end = pos + 1
+                while end < length and not any(pattern.match(text, end)
+                                               for _, pattern in self.compiled_patterns):
+                    end += 1
+                value = text[pos:end]
+                tokens.append(Token('UNKNOWN', value, line, column))
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    column = len(value) - value.rfind('\n')
+                else:
+                    column += len(value)
+                pos = end
+
+        return tokens
+
+    
+    def classify_tokens(self, tokens):
+        """Classify tokens into categories, returns a TokenStatistics"""
+        stats = TokenStatistics()
+        stats.add_rows(self.token_rows(tokens))
+        return stats
+
+    def token_rows(self, tokens):
+        """(type, value, line, column) rows of a token list or columnar result"""
+        # TokenBuffer/IncrementalLexer hand out rows without Token objects
+        if hasattr(tokens, 'rows'):
+            return tokens.rows()
+        return ((token.type, token.value, token.line, token.column) for token in tokens)
+
+# (analyzer, text) of the running tokenize_parallel call, inherited by its forked workers
+_parallel_job = None
+
+def lex_chunk_worker(chunk):
+    """Scan text[start:stop] of the inherited job: (start, stop, line) -> (columns, end state)"""
+    analyzer, text = _parallel_job
+    start, stop, line = chunk
+    buffer = TokenBuffer(text)
+    end = analyzer.scan_into(buffer, text, start, line, 1, stop)
+    return (buffer.type_codes, buffer.starts, buffer.ends, buffer.lines, buffer.columns), end
+
+class TokenBlock:
+    """A run of consecutive tokens stored relative to a base offset and line"""
+    __slots__ = ('base', 'line_base', 'type_codes', 'starts', 'ends', 'lines', 'columns')
+
+    def __init__(self, rows):
+        self.base = rows[0][1]
+        self.line_base = rows[0][3]
+        self.type_codes = array('B', [row[0] for row in rows])
+        self.starts = array('q', [row[1] - self.base for row in rows])
+        self.ends = array('q', [row[2] - self.base for row in rows])
+        self.lines = array('I', [row[3] - self.line_base for row in rows])
+        self.columns = array('I', [row[4] for row in rows])
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def end_offset(self):
+        return self.base + self.ends[-1]
+
+    def row(self, i):
+        """Absolute (type_code, start, end, line, column) of the i-th token"""
+        base = self.base
+        return (self.type_codes[i], self.starts[i] + base, self.ends[i] + base,
+                self.lines[i] + self.line_base, self.columns[i])
+
+    def rows(self, first=0):
+        return [self.row(i) for i in range(first, len(self))]
+
+class IncrementalLexer:
+    """Keeps the token stream of a text and re-lexes only edited regions.
+
+    Tokens live in blocks with relative offsets and lines, so an edit only
+    rebuilds the blocks it touches and shifts the base of the ones after it.
+    After an edit the scan restarts at the last token whose match could not
+    have looked at the changed text and stops as soon as it reaches a token
+    start of the old stream past the edit (the stream has resynchronized).
+    """
+
+    BLOCK_SIZE = 512
+    # Lookahead of a lone '"' that runs to the end of text, or an unclosed '/*'
+    UNBOUNDED = sys.maxsize
+
+    def __init__(self, analyzer=None):
+        self.analyzer = analyzer or LexicalAnalyzer()
+        self.text = ''
+        self.blocks = []
+        self.count = 0
+        # Tokens whose match looked further than STREAM_MARGIN past their
+        # end, as [start, lookahead_end, type_code], ordered by start
+        self.long_lookahead = []
+        # Characters scanned by the last set_text/edit, to see the savings
+        self.rescanned_chars = 0
+        self.ignore_types = {'WHITESPACE', 'COMMENT_SINGLE', 'COMMENT_MULTI', 'NEWLINE'}
+        self.string_code = TokenBuffer.intern_type('STRING_LITERAL')
+        self.operator_code = TokenBuffer.intern_type('OPERATOR')
+
+    # -- read access, same interface as TokenBuffer --------------------------
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        bi, li = self.locate(index)
+        if bi >= len(self.blocks):
+            raise IndexError("token index out of range")
+        code, start, end, line, column = self.blocks[bi].row(li)
+        return Token(TokenBuffer.TYPE_NAMES[code], self.text[start:end], line, column)
+
+    def __iter__(self):
+        for token_type, value, line, column in self.rows():
+            yield Token(token_type, value, line, column)
+
+    def rows(self):
+        """Yield (type, value, line, column) tuples"""
+        names = TokenBuffer.TYPE_NAMES
+        text = self.text
+        for block in self.blocks:
+            base = block.base
+            line_base = block.line_base
+            for code, start, end, line, column in zip(block.type_codes, block.starts, block.ends,
+                                                      block.lines, block.columns):
+                yield names[code], text[start + base:end + base], line + line_base, column
+
+    def row_at(self, index):
+        code, start, end, line, column = self.row(index)
+        return TokenBuffer.TYPE_NAMES[code], self.text[start:end], line, column
+
+    def row_range(self, first, last):
+        """(type, value, line, column) tuples of tokens [first, last)"""
+        names = TokenBuffer.TYPE_NAMES
+        text = self.text
+        result = []
+        bi, li = self.locate(first)
+        for block in self.blocks[bi:]:
+            for i in range(li, len(block)):
+                if len(result) >= last - first:
+                    return result
+                code, start, end, line, column = block.row(i)
+                result.append((names[code], text[start:end], line, column))
+            li = 0
+        return result
+
+    def index_of_line(self, line):
+        """Index of the first token on or after the given line"""
+        seen = 0
+        for block in self.blocks:
+            if block.lines[-1] + block.line_base >= line:
+                return seen + bisect_left(block.lines, line - block.line_base)
+            seen += len(block)
+        return seen
+
+    # -- updates ----------------------------------------------------------------
+
+    def set_text(self, text):
+        """Lex text from scratch; returns (first_index, removed, inserted)"""
+        return self.set_buffer(self.analyzer.tokenize_buffer(text))
+
+    def set_buffer(self, buffer):
+        """Take over a complete TokenBuffer lexed elsewhere (e.g. on a worker thread)"""
+        removed = self.count
+        text = buffer.source
+        self.text = text
+        rows = list(zip(buffer.type_codes, buffer.starts, buffer.ends, buffer.lines, buffer.columns))
+        self.blocks = self.build_blocks(rows)
+        self.count = len(rows)
+        self.long_lookahead = self.find_long_lookahead(text, rows)
+        self.rescanned_chars = len(text)
+        return 0, removed, self.count
+
+    def update(self, text):
+        """Re-lex after the text changed to text, finding the edited region itself"""
+        if not self.blocks and not self.text:
+            return self.set_text(text)
+        return self.edit(*self.changed_region(text))
+
+    def changed_region(self, text):
+        """(start, end, new_text) turning the current text into text"""
+        old = self.text
+        prefix = common_prefix_length(old, text)
+        suffix = common_suffix_length(old, text, min(len(old), len(text)) - prefix)
+        return prefix, len(old) - suffix, text[prefix:len(text) - suffix]
+
+    def edit(self, start, end, new_text):
+        """Replace text[start:end] with new_text and re-lex only what changed.
+
+        Returns (first_index, removed, inserted): tokens [first_index,
+        first_index + removed) of the old stream were replaced by tokens
+        [first_index, first_index + inserted) of the new one.
+        """
+        old_text = self.text
+        text = old_text[:start] + new_text + old_text[end:]
+        delta = len(new_text) - (end - start)
+        self.text = text
+        margin = self.analyzer.STREAM_MARGIN
+
+        # First token whose match may have looked at the edited text
+        first = self.first_token_ending_at(start - margin)
+        first_start = self.start_offset(first)
+        for lead_start, lookahead_end, code in self.long_lookahead:
+            if lead_start >= first_start:
+                break
+            if lookahead_end < start:
+                continue
+            # It looked past the edit: rescan from it unless it still matches the same
+            m = self.analyzer.master_pattern.match(text, lead_start)
+            if m is None or m.lastgroup != TokenBuffer.TYPE_NAMES[code] or m.end() != lead_start + 1:
+                first = self.index_at_offset(lead_start)
+                break
+
+        # Resume right after the last unaffected token
+        if first > 0:
+            code, prev_start, pos, line, column = self.row(first - 1)
+            value = old_text[prev_start:pos]
+            newlines = value.count('\n')
+            if newlines:
+                line += newlines
+                column = len(value) - value.rfind('\n')
+            else:
+                column += len(value)
+        else:
+            pos, line, column = 0, 1, 1
+
+        # Rescan until a segment starts where an old token past the edit started
+        codes = TokenBuffer.TYPE_CODES
+        intern = TokenBuffer.intern_type
+        new_rows = []
+        resync = self.count
+        dline = dcol = 0
+        old_line = None
+        edit_end = start + len(new_text)
+        old_starts = self.iter_starts(first)
+        old_index, old_start, old_line_at, old_column_at = next(old_starts, (self.count, None, 0, 0))
+        scanned_to = pos
+        for tt, seg_start, seg_end, seg_line, seg_column in self.analyzer.scan_segments(text, pos, line, column):
+            if seg_start >= edit_end and old_start is not None:
+                target = seg_start - delta
+                while old_start is not None and old_start < target:
+                    old_index, old_start, old_line_at, old_column_at = next(
+                        old_starts, (self.count, None, 0, 0))
+                if old_start == target:
+                    resync = old_index
+                    dline = seg_line - old_line_at
+                    dcol = seg_column - old_column_at
+                    old_line = old_line_at
+                    break
+            if tt not in self.ignore_types:
+                code = codes.get(tt)
+                if code is None:
+                    code = intern(tt)
+                new_rows.append((code, seg_start, seg_end, seg_line, seg_column))
+            scanned_to = seg_end
+        self.rescanned_chars = max(scanned_to - pos, 0)
+
+        resync_start = self.start_offset(resync)
+        self.splice(first, resync, new_rows, delta, dline, dcol, old_line)
+        self.update_long_lookahead(text, start, pos, resync_start, new_rows, delta)
+        return first, resync - first, len(new_rows)
+
+    # -- block bookkeeping ----------------------------------------------------
+
+    def build_blocks(self, rows):
+        size = self.BLOCK_SIZE
+        return [TokenBlock(rows[i:i + size]) for i in range(0, len(rows), size)]
+
+    def locate(self, index):
+        """(block index, index inside block); (len(blocks), 0) past the end"""
+        for bi, block in enumerate(self.blocks):
+            if index < len(block):
+                return bi, index
+            index -= len(block)
+        return len(self.blocks), 0
+
+    def row(self, index):
+        bi, li = self.locate(index)
+        return self.blocks[bi].row(li)
+
+    def start_offset(self, index):
+        if index >= self.count:
+            return self.UNBOUNDED
+        return self.row(index)[1]
+
+    def first_token_ending_at(self, offset):
+        """Index of the first token whose end is at or after offset"""
+        seen = 0
+        for block in self.blocks:
+            if block.end_offset() >= offset:
+                lo, hi = 0, len(block)
+                rel = offset - block.base
+                ends = block.ends
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if ends[mid] < rel:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                return seen + lo
+            seen += len(block)
+        return seen
+
+    def index_at_offset(self, offset):
+        """Index of the first token starting at or after offset"""
+        seen = 0
+        for block in self.blocks:
+            if block.end_offset() > offset:
+                rel = offset - block.base
+                for i, token_start in enumerate(block.starts):
+                    if token_start >= rel:
+                        return seen + i
+            seen += len(block)
+        return seen
+
+    def iter_starts(self, index):
+        """Yield (index, start, line, column) of the old tokens from index on"""
+        bi, li = self.locate(index)
+        for block in self.blocks[bi:]:
+            base = block.base
+            line_base = block.line_base
+            for i in range(li, len(block)):
+                yield index, block.starts[i] + base, block.lines[i] + line_base, block.columns[i]
+                index += 1
+            li = 0
+
+    def splice(self, first, resync, new_rows, delta, dline, dcol, old_line):
+        """Replace tokens [first, resync) with new_rows and shift the rest"""
+        blocks = self.blocks
+        bi, li = self.locate(first)
+        bk, lk = self.locate(resync)
+
+        rows = blocks[bi].rows()[:li] if bi < len(blocks) else []
+        rows.extend(new_rows)
+
+        stop = bk
+        if bk < len(blocks):
+            stop = bk + 1
+            tail = blocks[bk].rows(lk)
+            # Tokens left on the resync line also move sideways; pull in the
+            # following blocks while they still start on that line
+            while dcol and stop < len(blocks) and blocks[stop].line_base == old_line:
+                tail.extend(blocks[stop].rows())
+                stop += 1
+            # Merge a small remainder into the next block to limit fragmentation
+            if len(rows) + len(tail) < self.BLOCK_SIZE and stop < len(blocks):
+                tail.extend(blocks[stop].rows())
+                stop += 1
+            for code, t_start, t_end, t_line, t_column in tail:
+                if t_line == old_line:
+                    t_column += dcol
+                rows.append((code, t_start + delta, t_end + delta, t_line + dline, t_column))
+
+        blocks[bi:stop] = self.build_blocks(rows)
+        for block in blocks[bi + (len(rows) + self.BLOCK_SIZE - 1) // self.BLOCK_SIZE:]:
+            block.base += delta
+            block.line_base += dline
+        self.count += len(new_rows) - (resync - first)
+
+    def find_long_lookahead(self, text, rows):
+        entries = []
+        for code, token_start, token_end, line, column in rows:
+            ch = text[token_start]
+            if ch == '"' or ch == '/':
+                entry = self.long_lookahead_entry(text, code, token_start)
+                if entry:
+                    entries.append(entry)
+        return entries
+
+    def long_lookahead_entry(self, text, code, token_start):
+        """[start, lookahead_end, code] for a lone '"' or an unclosed '/*'"""
+        if text[token_start] == '"' and code != self.string_code:
+            prefix_end = self.analyzer.string_prefix_pattern.match(text, token_start).end()
+            if prefix_end >= len(text) - 1:
+                return [token_start, self.UNBOUNDED, code]
+            return [token_start, prefix_end + 2, code]
+        if code == self.operator_code and text.startswith('/*', token_start):
+            return [token_start, self.UNBOUNDED, code]
+        return None
+
+    def update_long_lookahead(self, text, start, rescan_start, resync_start, new_rows, delta):
+        """Keep the entries before the rescan, add the rescanned ones, shift the rest"""
+        entries = []
+        for lead_start, lookahead_end, code in self.long_lookahead:
+            if lead_start >= rescan_start:
+                break
+            if lookahead_end >= start:
+                # Unchanged token, but how far it looks may have changed
+                entry = self.long_lookahead_entry(text, code, lead_start)
+                if entry:
+                    entries.append(entry)
+            else:
+                entries.append([lead_start, lookahead_end, code])
+        entries.extend(self.find_long_lookahead(text, new_rows))
+        for lead_start, lookahead_end, code in self.long_lookahead:
+            if lead_start >= resync_start:
+                if lookahead_end != self.UNBOUNDED:
+                    lookahead_end += delta
+                entries.append([lead_start + delta, lookahead_end, code])
+        self.long_lookahead = entries
+
+def common_prefix_length(a, b):
+    """Length of the common prefix of two strings, compared in C-sized slices"""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def common_suffix_length(a, b, limit):
+    """Length of the common suffix of two strings, at most limit"""
+    lo, hi = 0, limit
+    la, lb = len(a), len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class TokenCache:
+    """Token results keyed by content hash and lexer fingerprint.
+
+    Keeps an in-memory LRU of TokenBuffers bounded by max_bytes and, when
+    a directory is given, a binary copy of each result on disk, so
+    unchanged sources (headers especially) are answered without scanning.
+    """
+
+    MAGIC = b'LXTK'
+    VERSION = 1
+    # magic, version, big-endian flag, token count, size of the type name table
+    HEADER = struct.Struct('<4sBBQI')
+
+    def __init__(self, analyzer=None, max_bytes=64 * 1024 * 1024, directory=None):
+        self.analyzer = analyzer or LexicalAnalyzer()
+        self.fingerprint = self.analyzer.fingerprint()
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()   # key -> (TokenBuffer, size)
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_writes': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, text):
+        digest = hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+        return f"{self.fingerprint}-{digest}"
+
+    def tokenize(self, text):
+        """TokenBuffer for text, from the cache when possible"""
+        key = self.key(text)
+        buffer = self.lookup(key, text)
+        if buffer is None:
+            buffer = self.analyzer.tokenize_buffer(text)
+            self.store(key, buffer)
+        return buffer
+
+    def tokenize_file(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.tokenize(f.read())
+
+    def lookup(self, key, text):
+        """Cached TokenBuffer for key (over text) or None; counts hits and misses"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+
+        buffer = self.read_disk(key, text) if self.directory else None
+        with self.lock:
+            if buffer is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+        self.remember(key, buffer)
+        return buffer
+
+    def store(self, key, buffer):
+        self.remember(key, buffer)
+        if self.directory:
+            self.write_disk(key, buffer)
+
+    def remember(self, key, buffer):
+        size = buffer.nbytes() + sys.getsizeof(buffer.source)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self.entries[key] = (buffer, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.current_bytes
+        return stats
+
+    # -- on-disk store ------------------------------------------------------------
+
+    def disk_path(self, key):
+        return os.path.join(self.directory, key + '.tok')
+
+    def write_disk(self, key, buffer):
+        """Write header, type name table and the raw columns; atomic via rename"""
+        names = '\n'.join(TokenBuffer.TYPE_NAMES).encode('utf-8')
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, sys.byteorder == 'big',
+                                  len(buffer), len(names))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(names)
+                for column in (buffer.type_codes, buffer.starts, buffer.ends,
+                               buffer.lines, buffer.columns):
+                    column.tofile(f)
+            os.replace(tmp_path, self.disk_path(key))
+            with self.lock:
+                self.stats['disk_writes'] += 1
+        except OSError:
+            # The disk store is only an optimization
+            try:
+                os.remove(tmp_path)
+            except (OSError, UnboundLocalError):
+                pass
+
+    def read_disk(self, key, text):
+        path = self.disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        try:
+            magic, version, big_endian, count, names_size = self.HEADER.unpack_from(data)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("not a token cache file")
+            pos = self.HEADER.size
+            names = data[pos:pos + names_size].decode('utf-8').split('\n')
+            pos += names_size
+
+            # Type codes are interned per process, translate the stored ones
+            translate = bytes(TokenBuffer.intern_type(name) for name in names)
+            buffer = TokenBuffer(text)
+            for column in (buffer.type_codes, buffer.starts, buffer.ends,
+                           buffer.lines, buffer.columns):
+                size = column.itemsize * count
+                if pos + size > len(data):
+                    raise ValueError("truncated token cache file")
+                column.frombytes(data[pos:pos + size])
+                pos += size
+                if big_endian != (sys.byteorder == 'big'):
+                    column.byteswap()
+            buffer.type_codes = array('B', bytes(buffer.type_codes).translate(translate.ljust(256, b'\0')))
+            return buffer
+        except (ValueError, struct.error, UnicodeDecodeError):
+            # Corrupt or foreign file: drop it and lex again
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+class AnalysisJob:
+    """Lex a text on a worker thread, reporting progress and token batches.
+
+    Messages are put on self.messages for the caller to poll:
+      ('progress', chars_scanned, tokens_found)  after every step
+      ('done', incremental_lexer, classification)
+      ('cancelled', chars_scanned, tokens_found)
+      ('error', message)
+    Tokens [0, tokens_found) of self.buffer are complete once reported.
+    """
+
+    STEP = 128 * 1024  # characters scanned between progress reports
+
+    def __init__(self, analyzer, text, cache=None):
+        self.analyzer = analyzer
+        self.text = text
+        self.cache = cache
+        self.buffer = TokenBuffer(text)
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def run(self):
+        text = self.text
+        pos, line, column = 0, 1, 1
+        try:
+            key = None
+            if self.cache is not None:
+                key = self.cache.key(text)
+                cached = self.cache.lookup(key, text)
+                if cached is not None:
+                    # Unchanged text: no scan, publish everything at once
+                    self.buffer = cached
+                    pos = len(text)
+                    self.messages.put(('progress', pos, len(cached)))
+
+            while pos < len(text):
+                if self.cancel_event.is_set():
+                    self.messages.put(('cancelled', pos, len(self.buffer)))
+                    return
+                pos, line, column = self.analyzer.scan_into(self.buffer, text, pos, line, column,
+                                                            pos + self.STEP)
+                self.messages.put(('progress', pos, len(self.buffer)))
+
+            if key is not None and pos == len(text):
+                self.cache.store(key, self.buffer)
+
+            # Building the incremental state and the classification is O(n)
+            # too, keep it off the GUI thread
+            incremental = IncrementalLexer(self.analyzer)
+            incremental.set_buffer(self.buffer)
+            classification = self.analyzer.classify_tokens(self.buffer)
+            self.messages.put(('done', incremental, classification))
+        except Exception as e:
+            self.messages.put(('error', str(e)))
+
+# class CFGModel:
+#     """
+#     Basic CFG model for variable declarations with right recursion
+#     and left factorization.
+    
+#     Grammar:
+#     S -> declaration
+#     declaration -> type identifier_list ';'
+#     identifier_list -> identifier identifier_list'
+#     identifier_list' -> ',' identifier identifier_list' | ε
+#     type -> 'int' | 'float' | 'double' | 'char' | 'string'
+#     identifier -> LETTER (LETTER | DIGIT)*
+    
+#     Example: int x, y, z;
+#     """
+    
+#     def __init__(self):
+#         self.grammar = {
+#             'S': ['declaration'],
+#             'declaration': ['type identifier_list ;'],
+#             'identifier_list': ['identifier identifier_list_prime'],
+#             'identifier_list_prime': [', identifier identifier_list_prime', 'ε'],
+#             'type': ['int', 'float', 'double', 'char', 'string'],
+#             'identifier': ['LETTER (LETTER | DIGIT)*']
+#         }
+    
+#     def get_grammar_text(self):
+#         text = "CONTEXT-FREE GRAMMAR (CFG)\n"
+#         text += "Variable declarations with right recursion\n"
+#         text += "=" * 60 + "\n\n"
+        
+#         for non_terminal, productions in self.grammar.items():
+#             text += f"{non_terminal} -> {productions[0]}\n"
+#             for production in productions[1:]:
+#                 text += f"{' ' * (len(non_terminal) + 3)}| {production}\n"
+        
+#         text += "\nApplied features:\n"
+#         text += "✓ Right recursion in 'identifier_list_prime'\n"
+#         text += "✓ Left factorization in 'identifier_list'\n"
+#         text += "✓ Epsilon production (ε) to terminate recursion\n"
+        
+#         return text
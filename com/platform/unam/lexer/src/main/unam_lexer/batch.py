@@ -0,0 +1,429 @@
+"""Headless batch lexing of files and directory trees"""
+
+import sys
+import csv
+import json
+import time
+import os
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+
+from .languages import DEFAULT_LANGUAGE, LanguageProfile
+from .analyzer import LexicalAnalyzer, TokenCache, UnknownInputError
+from .tokens import TokenBuffer, TokenStatistics
+from .columnar import TokenTable
+from .preprocessor import HEADER_EXTENSIONS, Preprocessor
+from .index import TokenIndex
+from .utf8 import sniff_file
+
+DEFAULT_EXTENSIONS = ('.txt', '.c', '.h')
+
+# One analyzer (and token cache) per worker process, built on first use
+_worker_analyzer = None
+_worker_cache = None
+
+def profile_extensions(language=None):
+    """Extensions of a language profile (the default one if None), else DEFAULT_EXTENSIONS"""
+    return LanguageProfile.get(language or DEFAULT_LANGUAGE).extensions or DEFAULT_EXTENSIONS
+
+def language_extensions(args):
+    """--ext if given, else the extensions of --language (or the default profile)"""
+    return args.ext or profile_extensions(args.language)
+
+def check_roots(roots):
+    """Report each root that does not exist on stderr; True if they all exist"""
+    missing = [root for root in roots if not os.path.exists(root)]
+    for root in missing:
+        print(f"error: {root}: no such file or directory", file=sys.stderr)
+    return not missing
+
+def collect_source_files(root, extensions):
+    """Walk root and return the matching file paths in a stable order"""
+    if os.path.isfile(root):
+        return [root]
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                paths.append(os.path.join(dirpath, name))
+    return paths
+
+def lex_file_worker(job):
+    """Lex one file in a worker process:
+    (path, mode, cache_dir, use_mmap, language, binary, max_unknown) -> result dict
+    """
+    global _worker_analyzer, _worker_cache
+    path, mode, cache_dir, use_mmap, language, binary, max_unknown = job
+    if _worker_analyzer is None:
+        _worker_analyzer = LexicalAnalyzer(language=language, max_unknown=max_unknown)
+        if cache_dir:
+            _worker_cache = TokenCache(_worker_analyzer, directory=cache_dir)
+
+    if use_mmap:
+        return checked_lex(path, binary, lambda: lex_mapped_file(path, mode))
+    return checked_lex(path, binary, lambda: lex_text_file(path, mode))
+
+def checked_lex(path, binary, lex):
+    """Result of lex() for path, applying the --binary policy first.
+
+    'skip' leaves out files that look binary, 'flag' lexes them and adds
+    the reason to the result, 'lex' does not look. A file that exceeds
+    the analyzer's max_unknown becomes an error result.
+    """
+    reason = None
+    try:
+        if binary != 'lex':
+            reason = sniff_file(path)
+        if reason is not None and binary == 'skip':
+            return {'file': path, 'skipped': reason, 'bytes': 0, 'total': 0}
+        result = lex()
+    except (OSError, UnknownInputError) as e:
+        return {'file': path, 'error': str(e), 'bytes': 0, 'total': 0}
+    if reason is not None:
+        result['binary'] = reason
+    return result
+
+def lex_text_file(path, mode):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            size = os.fstat(f.fileno()).st_size
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'file': path, 'error': str(e), 'bytes': 0, 'total': 0}
+
+    if _worker_cache is not None:
+        tokens = _worker_cache.tokenize(content)
+    else:
+        tokens = _worker_analyzer.tokenize_buffer(content)
+    result = {'file': path, 'bytes': size}
+    result.update(token_result(_worker_analyzer, tokens, mode))
+    return result
+
+def token_result(analyzer, tokens, mode):
+    """The JSON-ready result for a TokenBuffer in one of the lex modes"""
+    result = {'total': len(tokens)}
+    if mode == 'tokens':
+        result['tokens'] = [list(row) for row in tokens.rows()]
+    elif mode == 'classify':
+        result['classification'] = analyzer.classify_tokens(tokens).to_dict()
+    else:
+        counts = {}
+        names = TokenBuffer.TYPE_NAMES
+        for code in tokens.type_codes:
+            name = names[code]
+            counts[name] = counts.get(name, 0) + 1
+        result['counts'] = counts
+        result['categories'] = analyzer.classify_tokens(tokens).category_totals()
+    return result
+
+def lex_split_file(analyzer, path, mode, jobs):
+    """lex --split: one file lexed in parallel chunks by analyzer.tokenize_parallel"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            size = os.fstat(f.fileno()).st_size
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'file': path, 'error': str(e), 'bytes': 0, 'total': 0}
+    result = {'file': path, 'bytes': size}
+    result.update(token_result(analyzer, analyzer.tokenize_parallel(content, jobs), mode))
+    return result
+
+def lex_mapped_file(path, mode):
+    """lex_file_worker for --mmap: scan the mapped bytes, decode values only when emitted"""
+    try:
+        size = os.path.getsize(path)
+        if mode == 'counts':
+            # Nothing is stored, so memory stays flat however big the file is
+            counts = {}
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+                try:
+                    for row in _worker_analyzer.iter_mapped_rows(data):
+                        counts[row[0]] = counts.get(row[0], 0) + 1
+                finally:
+                    if size:
+                        data.close()
+            categories = {key: 0 for key, _, _ in TokenStatistics.CATEGORIES}
+            for name, count in counts.items():
+                category = TokenStatistics.CATEGORY_OF_TYPE.get(name)
+                if category is not None:
+                    categories[category] += count
+            return {'file': path, 'bytes': size, 'total': sum(counts.values()),
+                    'counts': counts, 'categories': categories}
+
+        with _worker_analyzer.tokenize_mapped(path) as tokens:
+            result = {'file': path, 'bytes': size, 'total': len(tokens)}
+            if mode == 'tokens':
+                result['tokens'] = [list(row) for row in tokens.rows()]
+            else:
+                result['classification'] = _worker_analyzer.classify_tokens(tokens).to_dict()
+            return result
+    except (OSError, ValueError) as e:
+        return {'file': path, 'error': str(e), 'bytes': 0, 'total': 0}
+
+def write_batch_result(writer, fmt, mode, result):
+    if fmt == 'jsonl':
+        writer.write(json.dumps(result, ensure_ascii=False) + '\n')
+    elif mode == 'tokens':
+        for token_type, value, line, column in result['tokens']:
+            writer.writerow([result['file'], token_type, value, line, column])
+    elif mode == 'classify':
+        for category, items in result['classification']['categories'].items():
+            for item in items:
+                writer.writerow([result['file'], category, item['value'], item['count'],
+                                 item['line'], item['column']])
+    else:
+        for token_type, count in result['counts'].items():
+            writer.writerow([result['file'], token_type, count])
+
+def run_batch(args):
+    """Lex every source file under args.path in a process pool"""
+    extensions = tuple(ext if ext.startswith('.') else '.' + ext for ext in language_extensions(args))
+    paths = collect_source_files(args.path, tuple(ext.lower() for ext in extensions))
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    writer = out
+    if args.format == 'csv':
+        writer = csv.writer(out)
+        if args.mode == 'tokens':
+            writer.writerow(['file', 'type', 'value', 'line', 'column'])
+        elif args.mode == 'classify':
+            writer.writerow(['file', 'category', 'value', 'count', 'line', 'column'])
+        else:
+            writer.writerow(['file', 'type', 'count'])
+
+    files = 0
+    failed = 0
+    skipped = 0
+    total_tokens = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    pool = None
+    try:
+        if args.split:
+            # One file at a time, each split into chunks lexed by --jobs workers
+            analyzer = LexicalAnalyzer(language=args.language, max_unknown=args.max_unknown)
+            results = (checked_lex(path, args.binary,
+                                   lambda path=path: lex_split_file(analyzer, path, args.mode, args.jobs))
+                       for path in paths)
+        else:
+            jobs = [(path, args.mode, args.cache_dir, args.mmap, args.language, args.binary,
+                     args.max_unknown) for path in paths]
+            chunksize = max(1, min(64, len(jobs) // (args.jobs * 4 or 1)))
+            pool = ProcessPoolExecutor(max_workers=args.jobs)
+            results = pool.map(lex_file_worker, jobs, chunksize=chunksize)
+        for result in results:
+            if 'error' in result:
+                failed += 1
+                print(f"error: {result['file']}: {result['error']}", file=sys.stderr)
+                if args.format == 'jsonl':
+                    write_batch_result(writer, args.format, args.mode, result)
+                continue
+            if 'skipped' in result:
+                skipped += 1
+                print(f"skipped: {result['file']}: {result['skipped']}", file=sys.stderr)
+                if args.format == 'jsonl':
+                    write_batch_result(writer, args.format, args.mode, result)
+                continue
+            if 'binary' in result:
+                print(f"warning: {result['file']}: {result['binary']}", file=sys.stderr)
+            files += 1
+            total_tokens += result['total']
+            total_bytes += result['bytes']
+            write_batch_result(writer, args.format, args.mode, result)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Lexed {files} files ({failed} failed, {skipped} skipped), {total_tokens} tokens, "
+          f"{total_bytes} bytes in {elapsed:.2f}s: "
+          f"{files / elapsed:.1f} files/s, {total_tokens / elapsed:.0f} tokens/s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+def table_file_worker(job):
+    """Lex one file into a one-file TokenTable: (path, language) -> (path, table or error)"""
+    global _worker_analyzer
+    path, language = job
+    if _worker_analyzer is None:
+        _worker_analyzer = LexicalAnalyzer(language=language)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return path, str(e)
+    table = TokenTable()
+    table.add(path, _worker_analyzer.tokenize_buffer(content))
+    return path, table
+
+def run_export(args):
+    """Lex source trees in a process pool into one columnar token table"""
+    extensions = tuple(ext if ext.startswith('.') else '.' + ext for ext in language_extensions(args))
+    paths = []
+    for root in args.paths:
+        paths.extend(collect_source_files(root, tuple(ext.lower() for ext in extensions)))
+
+    start = time.perf_counter()
+    table = TokenTable()
+    failed = 0
+    jobs = [(path, args.language) for path in paths]
+    chunksize = max(1, min(64, len(jobs) // (args.jobs * 4 or 1)))
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for path, result in pool.map(table_file_worker, jobs, chunksize=chunksize):
+            if isinstance(result, str):
+                failed += 1
+                print(f"error: {path}: {result}", file=sys.stderr)
+            else:
+                table.merge(result)
+
+    try:
+        if args.format == 'parquet':
+            table.write_parquet(args.output)
+        elif args.format == 'npz':
+            rows, values = table.to_numpy()
+            import numpy as np
+            np.savez(args.output, **{name: rows[name] for name in rows.dtype.names},
+                     values=np.array(values, dtype=str), files=np.array(table.files, dtype=str),
+                     types=np.array(table.type_names, dtype=str))
+        else:
+            table.save(args.output)
+    except ImportError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Exported {len(table.files)} files ({failed} failed), {len(table)} tokens, "
+          f"{len(table.values)} distinct values to {args.output} in {elapsed:.2f}s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+def run_stats(args):
+    """Aggregate a token table written by export (or lex the given sources first)"""
+    if len(args.paths) == 1 and os.path.isfile(args.paths[0]) and args.paths[0].endswith('.lxt'):
+        table = TokenTable.load(args.paths[0])
+    else:
+        analyzer = LexicalAnalyzer(language=args.language)
+        extensions = tuple(ext if ext.startswith('.') else '.' + ext
+                           for ext in language_extensions(args))
+        paths = []
+        for root in args.paths:
+            paths.extend(collect_source_files(root, tuple(ext.lower() for ext in extensions)))
+        table = TokenTable.from_files(paths, analyzer)
+
+    types = tuple(args.types)
+    if args.file:
+        report = {'file': args.file, 'types': table.type_histogram(args.file),
+                  'top_values': table.top_values(types, args.top, args.file),
+                  'lines': sorted(table.line_counts(types, args.file).items())}
+    else:
+        report = table.summary(types, args.top)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+def run_deps(args):
+    """Expand the includes of every translation unit under args.paths and write the graph"""
+    extensions = tuple(ext if ext.startswith('.') else '.' + ext for ext in language_extensions(args))
+    paths = []
+    for root in args.paths:
+        paths.extend(collect_source_files(root, tuple(ext.lower() for ext in extensions)))
+
+    cache = TokenCache(LexicalAnalyzer(language=args.language), directory=args.cache_dir) \
+        if args.cache_dir else None
+    preprocessor = Preprocessor(LexicalAnalyzer(language=args.language), args.include,
+                                args.isystem, cache)
+    start = time.perf_counter()
+    units = []
+    skipped = 0
+    for path in paths:
+        if path.lower().endswith(HEADER_EXTENSIONS):
+            continue
+        unit = preprocessor.translation_unit(path)
+        if unit.source.skipped:
+            skipped += 1
+            print(f"skipped: {path}: {unit.source.skipped}", file=sys.stderr)
+            continue
+        units.append(unit)
+    for unit in units:
+        for path, line, target, reason in unit.skipped:
+            print(f"warning: {path}:{line}: skipped include {target}: {reason}", file=sys.stderr)
+        for path, line, argument in unit.missing:
+            if args.warn_missing:
+                print(f"warning: {path}:{line}: cannot find include {argument}", file=sys.stderr)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'dot':
+            preprocessor.write_dot(out)
+        elif args.format == 'make':
+            preprocessor.write_make(out, units)
+        else:
+            preprocessor.write_json(out, units)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    stats = preprocessor.stats
+    included = sum(unit.bytes for unit in units)
+    print(f"{len(units)} translation units ({skipped} skipped), {stats['files_lexed']} files: "
+          f"lexed {stats['bytes_lexed']} chars for {included} included chars "
+          f"in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+def run_index(args):
+    """Create or update the token index of source trees"""
+    extensions = tuple(ext if ext.startswith('.') else '.' + ext for ext in language_extensions(args))
+    paths = []
+    for root in args.paths:
+        paths.extend(collect_source_files(root, tuple(ext.lower() for ext in extensions)))
+
+    start = time.perf_counter()
+    index = TokenIndex.load(args.index, LexicalAnalyzer(language=args.language))
+    if index.reset:
+        print(f"note: {index.reset}; starting a new index", file=sys.stderr)
+    summary = index.update(paths, args.jobs, args.paths)
+    for path, error in summary['errors']:
+        print(f"error: {path}: {error}", file=sys.stderr)
+    index.save(args.index)
+    stats = index.get_stats()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Indexed {summary['indexed']} files ({summary['unchanged']} unchanged, "
+          f"{summary['removed']} removed, {len(summary['errors'])} failed): "
+          f"{stats['files']} files, {stats['terms']} terms, {stats['postings_bytes']} postings "
+          f"bytes in {args.index} ({elapsed:.2f}s)", file=sys.stderr)
+    return 1 if summary['errors'] else 0
+
+def run_lookup(args):
+    """Query the token index: where a value (or every value with a prefix) occurs"""
+    start = time.perf_counter()
+    if not os.path.exists(args.index):
+        print(f"error: no index at {args.index} (build it with the index command)", file=sys.stderr)
+        return 2
+    index = TokenIndex.load(args.index, LexicalAnalyzer(language=args.language))
+    if index.reset:
+        print(f"note: {index.reset}; rebuild it with the index command", file=sys.stderr)
+    loaded = time.perf_counter()
+    if args.counts:
+        rows = index.counts(args.term, args.prefix, args.type)
+    else:
+        rows = index.search(args.term, args.prefix, args.type, args.limit)
+    done = time.perf_counter()
+
+    if args.format == 'jsonl':
+        keys = ('value', 'type', 'occurrences', 'files') if args.counts else \
+               ('value', 'type', 'file', 'line', 'column')
+        for row in rows:
+            print(json.dumps(dict(zip(keys, row)), ensure_ascii=False))
+    elif args.counts:
+        for value, token_type, occurrences, files in rows:
+            print(f"{value}\t{token_type}\t{occurrences} in {files} files")
+    else:
+        for value, token_type, path, line, column in rows:
+            print(f"{path}:{line}:{column}: {token_type} {value}")
+    print(f"{len(rows)} results; load {(loaded - start) * 1000:.1f} ms, "
+          f"query {(done - loaded) * 1000:.1f} ms", file=sys.stderr)
+    return 0 if rows else 1
@@ -0,0 +1,575 @@
+"""Command line entry point (lex, bench, profile, serve, ...) and the GUI launcher"""
+
+import sys
+import argparse
+import json
+import time
+import random
+import tracemalloc
+import os
+import io
+import subprocess
+
+from .languages import DEFAULT_LANGUAGE, LANGUAGE_PROFILES, LanguageProfile
+from .analyzer import LexicalAnalyzer
+from .batch import (check_roots, collect_source_files, language_extensions, run_batch, run_deps,
+                    run_export, run_index, run_lookup, run_stats)
+from .server import run_serve
+from .watch import run_watch
+from .tokendiff import run_diff
+
+DEFAULT_INDEX = 'tokens.idx'
+
+# Relative weight of each kind of fragment in a generated corpus
+CORPUS_MIXES = {
+    'balanced': {'keyword': 10, 'identifier': 30, 'number': 10, 'string': 5, 'char': 2,
+                 'operator': 18, 'punctuator': 20, 'comment': 4, 'unknown': 1},
+    'comment-heavy': {'keyword': 5, 'identifier': 10, 'number': 3, 'string': 2, 'char': 1,
+                      'operator': 5, 'punctuator': 6, 'comment': 40, 'unknown': 0},
+    'string-heavy': {'keyword': 5, 'identifier': 10, 'number': 3, 'string': 40, 'char': 10,
+                     'operator': 5, 'punctuator': 8, 'comment': 2, 'unknown': 0},
+    'identifier-heavy': {'keyword': 10, 'identifier': 70, 'number': 3, 'string': 1, 'char': 0,
+                         'operator': 8, 'punctuator': 10, 'comment': 1, 'unknown': 0},
+    'unknown-heavy': {'keyword': 2, 'identifier': 5, 'number': 2, 'string': 1, 'char': 0,
+                      'operator': 2, 'punctuator': 3, 'comment': 1, 'unknown': 60},
+}
+
+CORPUS_KEYWORDS = ('int', 'float', 'char', 'return', 'if', 'else', 'while', 'for',
+                   'static', 'struct', 'void', 'const', 'unsigned', 'sizeof')
+CORPUS_OPERATORS = ('=', '+', '-', '*', '/', '%', '++', '--', '==', '!=', '<', '>', '<=',
+                    '>=', '&&', '||', '!', '&', '|', '^', '~', '<<', '>>', '+=', '-=')
+CORPUS_PUNCTUATORS = ('(', ')', '{', '}', '[', ']', ';', ',', '.', ':')
+CORPUS_UNKNOWN = ('@', '$', '`', '?', '\r', '¿', '€')
+CORPUS_LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+CORPUS_ACCENTS = 'áéíóúñü'
+
+def parse_size(text):
+    """'4MB', '512k' or '1000' -> number of characters"""
+    text = text.strip().upper().rstrip('B')
+    factor = 1
+    for suffix, value in (('K', 1024), ('M', 1024 ** 2), ('G', 1024 ** 3)):
+        if text.endswith(suffix):
+            text, factor = text[:-1], value
+            break
+    return int(float(text) * factor)
+
+def generate_corpus(size, mix='balanced', seed=0):
+    """Reproducible C-like source of about size characters with the given token mix"""
+    rng = random.Random(seed)
+    weights = CORPUS_MIXES[mix]
+    kinds = [kind for kind in weights if weights[kind]]
+    cumulative = []
+    total = 0
+    for kind in kinds:
+        total += weights[kind]
+        cumulative.append(total)
+
+    def identifier():
+        name = rng.choice(CORPUS_LETTERS[:-1]) + ''.join(
+            rng.choice(CORPUS_LETTERS + '0123456789') for _ in range(rng.randint(0, 10)))
+        if rng.random() < 0.05:
+            name += rng.choice(CORPUS_ACCENTS)
+        return name
+
+    def fragment(kind):
+        if kind == 'keyword':
+            return rng.choice(CORPUS_KEYWORDS)
+        if kind == 'identifier':
+            return identifier()
+        if kind == 'number':
+            if rng.random() < 0.3:
+                return f"{rng.randint(0, 999)}.{rng.randint(0, 99999)}"
+            return str(rng.randint(0, 100000))
+        if kind == 'string':
+            words = ' '.join(identifier() for _ in range(rng.randint(1, 8)))
+            return '"' + words + (' %d\\n' if rng.random() < 0.5 else '') + '"'
+        if kind == 'char':
+            return rng.choice(("'a'", "'Z'", "'\\n'", "'0'", "'\\''"))
+        if kind == 'operator':
+            return rng.choice(CORPUS_OPERATORS)
+        if kind == 'punctuator':
+            return rng.choice(CORPUS_PUNCTUATORS)
+        if kind == 'comment':
+            words = ' '.join(identifier() for _ in range(rng.randint(2, 12)))
+            if rng.random() < 0.5:
+                return '// ' + words + '\n'
+            return '/* ' + words + '\n   ' + words + ' */'
+        return ''.join(rng.choice(CORPUS_UNKNOWN) for _ in range(rng.randint(1, 16)))
+
+    parts = []
+    length = 0
+    line_length = 0
+    while length < size:
+        pick = rng.random() * total
+        for kind, bound in zip(kinds, cumulative):
+            if pick < bound:
+                break
+        piece = fragment(kind)
+        if line_length > 60 and not piece.endswith('\n'):
+            piece = '\n' + piece
+            line_length = 0
+        piece += ' '
+        parts.append(piece)
+        length += len(piece)
+        line_length = 0 if '\n' in piece else line_length + len(piece)
+    return ''.join(parts)[:size]
+
+def benchmark_cases(analyzer):
+    """(name, function of the text) for every scanning path worth timing"""
+    cases = []
+    for engine in LexicalAnalyzer.ENGINES:
+        engine_analyzer = (analyzer if engine == analyzer.engine
+                           else LexicalAnalyzer(engine, language=analyzer.language))
+        cases.append((f'tokenize[{engine}]', engine_analyzer.tokenize))
+    cases.append(('tokenize_buffer', analyzer.tokenize_buffer))
+    cases.append(('iter_tokens', lambda text: sum(1 for _ in analyzer.iter_tokens(io.StringIO(text)))))
+    return cases
+
+def time_case(function, text, warmup, repeat):
+    """Best and mean wall time of function(text) plus the result of the last run"""
+    result = None
+    for _ in range(warmup):
+        result = function(text)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(text)
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times), result
+
+def peak_memory(function, text):
+    """Peak traced allocation of one untimed run (tracemalloc slows the code down)"""
+    tracemalloc.start()
+    try:
+        function(text)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmarks(text, warmup=1, repeat=3, memory=True, analyzer=None):
+    """Time every benchmark case plus classify_tokens over text"""
+    analyzer = analyzer or LexicalAnalyzer()
+    size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+    tokens = analyzer.tokenize_buffer(text)
+    token_count = len(tokens)
+    results = []
+
+    cases = benchmark_cases(analyzer)
+    cases.append(('classify_tokens', lambda _: analyzer.classify_tokens(tokens)))
+
+    for name, function in cases:
+        best, mean, _ = time_case(function, text, warmup, repeat)
+        entry = {
+            'name': name,
+            'best_s': round(best, 6),
+            'mean_s': round(mean, 6),
+            'mb_per_s': round(size_mb / best, 3) if best else None,
+            'tokens_per_s': round(token_count / best) if best else None,
+        }
+        if memory:
+            entry['peak_bytes'] = peak_memory(function, text)
+        results.append(entry)
+    return {'chars': len(text), 'mb': round(size_mb, 3), 'tokens': token_count, 'results': results}
+
+def measure_import(module='unam_lexer', repeat=3):
+    """Best-of-repeat import time of module in a fresh interpreter, and the GUI modules it loaded"""
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "elapsed = time.perf_counter() - start\n"
+            "print(elapsed, *sorted(m for m in sys.modules if m.split('.')[0] == 'tkinter' "
+            "or m == 'unam_lexer.gui'))")
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    times = []
+    gui_modules = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                capture_output=True, text=True).stdout.split()
+        times.append(float(output[0]))
+        gui_modules = output[1:]
+    return {'module': module, 'seconds': round(min(times), 6), 'gui_modules': gui_modules}
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Names of the cases whose tokens/s dropped more than tolerance below the baseline"""
+    previous = {entry['name']: entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in report['results']:
+        old = previous.get(entry['name'])
+        if old and old.get('tokens_per_s') and entry['tokens_per_s'] is not None:
+            if entry['tokens_per_s'] < old['tokens_per_s'] * (1 - tolerance):
+                regressions.append(entry['name'])
+    imported = report.get('import')
+    if imported and imported['gui_modules']:
+        regressions.append('import')
+    return regressions
+
+def run_bench(args):
+    size = parse_size(args.size)
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            text = f.read()
+        corpus = {'input': args.input}
+    else:
+        text = generate_corpus(size, args.mix, args.seed)
+        corpus = {'mix': args.mix, 'seed': args.seed, 'size': size}
+
+    report = run_benchmarks(text, args.warmup, args.repeat, not args.no_memory)
+    report['import'] = measure_import()
+    report['corpus'] = corpus
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        report['regressions'] = regressions
+        if regressions:
+            print(f"Regression (> {args.tolerance:.0%} slower): {', '.join(regressions)}",
+                  file=sys.stderr)
+            status = 1
+
+    output = json.dumps(report, indent=2)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    print(output)
+    return status
+
+def run_corpus(args):
+    text = generate_corpus(parse_size(args.size), args.mix, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"Wrote {len(text)} chars ({args.mix}, seed {args.seed}) to {args.output}", file=sys.stderr)
+    return 0
+
+def run_profile(args):
+    """Profile the lexer on files and print the report"""
+    analyzer = LexicalAnalyzer(language=args.language)
+    profile = analyzer.enable_profiling()
+    extensions = tuple(ext if ext.startswith('.') else '.' + ext for ext in language_extensions(args))
+    for root in args.paths:
+        for path in collect_source_files(root, tuple(ext.lower() for ext in extensions)):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    analyzer.tokenize(f.read())
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"error: {path}: {e}", file=sys.stderr)
+    analyzer.disable_profiling()
+
+    print(profile.render_report(args.top), end='')
+    if args.json:
+        profile.write_json(args.json)
+    if args.pstats:
+        profile.write_pstats(args.pstats)
+    if args.folded:
+        profile.write_folded(args.folded)
+    return 0
+
+
+def run_languages(args):
+    """List the built-in language profiles, or print one as a profile file"""
+    if args.show:
+        print(json.dumps(LanguageProfile.get(args.show).to_dict(), indent=2, ensure_ascii=False))
+        return 0
+    for name in LANGUAGE_PROFILES:
+        language = LanguageProfile.get(name)
+        default = " (default)" if name == DEFAULT_LANGUAGE else ""
+        print(f"{name:<8} {language.spec_hash()}  {' '.join(language.extensions):<28} "
+              f"{language.description}{default}")
+    return 0
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Lexical Analyzer - Compilers")
+    commands = parser.add_subparsers(dest='command')
+
+    lex = commands.add_parser('lex', help="lex a file or directory tree headlessly")
+    lex.add_argument('path', help="source file or directory to walk")
+    lex.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                     help="number of worker processes (default: CPU count)")
+    lex.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl',
+                     help="output format (default: jsonl)")
+    lex.add_argument('--mode', choices=('counts', 'classify', 'tokens'), default='counts',
+                     help="emit per-type counts, the token classification or the "
+                          "full token stream per file")
+    lex.add_argument('--language', '-l', help="language profile name or profile JSON file "
+                                              f"(default: {DEFAULT_LANGUAGE})")
+    lex.add_argument('--ext', nargs='+',
+                     help="file extensions to lex (default: the language's, else .txt .c .h)")
+    lex.add_argument('--output', '-o', help="write results to this file instead of stdout")
+    lex.add_argument('--cache-dir', help="reuse token results stored in this directory "
+                                         "for files whose content did not change")
+    lex.add_argument('--mmap', action='store_true',
+                     help="memory-map each file and scan its UTF-8 bytes directly "
+                          "(for very large inputs; bypasses --cache-dir)")
+    lex.add_argument('--split', action='store_true',
+                     help="lex each file in parallel chunks on --jobs workers instead of "
+                          "one file per worker (for a few huge files)")
+    lex.add_argument('--binary', choices=('skip', 'flag', 'lex'), default='skip',
+                     help="files that look binary or not UTF-8 (e.g. UTF-16): leave them out "
+                          "(default), lex them but mark the result, or lex without checking")
+    lex.add_argument('--max-unknown', type=int, metavar='N',
+                     help="give up on a file after N runs of unrecognized input "
+                          "(with --split, per chunk)")
+
+    export = commands.add_parser('export', help="lex source trees into a columnar token table")
+    export.add_argument('paths', nargs='+', help="source files or directories")
+    export.add_argument('--output', '-o', required=True,
+                        help="file to write (.lxt token table, .npz or .parquet)")
+    export.add_argument('--format', choices=('table', 'npz', 'parquet'), default='table',
+                        help="token table (default), NumPy .npz (needs numpy) or "
+                             "Parquet (needs pyarrow)")
+    export.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    export.add_argument('--ext', nargs='+',
+                        help="file extensions to lex (default: the language's, else .txt .c .h)")
+    export.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: CPU count)")
+
+    stats = commands.add_parser('stats', help="aggregate a token table or source trees")
+    stats.add_argument('paths', nargs='+', help="a .lxt token table, or source files/directories")
+    stats.add_argument('--types', nargs='+', default=['IDENTIFIER'],
+                       help="token types for the top values and per-line counts "
+                            "(default: IDENTIFIER)")
+    stats.add_argument('--top', type=int, default=10, help="values and files to list")
+    stats.add_argument('--file', help="report on this file of the table only, with per-line counts")
+    stats.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    stats.add_argument('--ext', nargs='+',
+                       help="file extensions to lex (default: the language's, else .txt .c .h)")
+
+    deps = commands.add_parser('deps', help="resolve #include and write the dependency graph")
+    deps.add_argument('paths', nargs='+', help="source files or directories")
+    deps.add_argument('--include', '-I', action='append', default=[], metavar='DIR',
+                      help="include search path (repeatable)")
+    deps.add_argument('--isystem', action='append', default=[], metavar='DIR',
+                      help="system include path, searched after -I (repeatable)")
+    deps.add_argument('--format', choices=('json', 'dot', 'make'), default='json',
+                      help="JSON graph with per-unit totals (default), Graphviz DOT or "
+                           "make rules")
+    deps.add_argument('--output', '-o', help="write the graph to this file instead of stdout")
+    deps.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    deps.add_argument('--ext', nargs='+',
+                      help="file extensions to scan (default: the language's, else .txt .c .h); "
+                           "files without a header extension are translation units")
+    deps.add_argument('--cache-dir', help="reuse token results stored in this directory")
+    deps.add_argument('--warn-missing', action='store_true',
+                      help="report includes that cannot be resolved")
+
+    index = commands.add_parser('index', help="create or update the token index of source trees")
+    index.add_argument('paths', nargs='+', help="source files or directories to index")
+    index.add_argument('--index', default=DEFAULT_INDEX, help=f"index file (default: {DEFAULT_INDEX})")
+    index.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                       help="number of worker processes (default: CPU count)")
+    index.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    index.add_argument('--ext', nargs='+',
+                       help="file extensions to index (default: the language's, else .txt .c .h)")
+
+    lookup = commands.add_parser('lookup', help="find where a token value occurs, using the index")
+    lookup.add_argument('term', help="token value, or the start of one with --prefix")
+    lookup.add_argument('--index', default=DEFAULT_INDEX, help=f"index file (default: {DEFAULT_INDEX})")
+    lookup.add_argument('--prefix', action='store_true', help="match every value starting with term")
+    lookup.add_argument('--type', nargs='+', help="only these token types, e.g. IDENTIFIER KEYWORD")
+    lookup.add_argument('--limit', type=int, help="stop after this many occurrences")
+    lookup.add_argument('--counts', action='store_true',
+                        help="list matching values with occurrence and file counts instead")
+    lookup.add_argument('--format', choices=('text', 'jsonl'), default='text',
+                        help="file:line:column lines (default) or JSON lines")
+    lookup.add_argument('--language', '-l', help="language profile the index was built with")
+
+    bench = commands.add_parser('bench', help="time the lexer on a synthetic corpus or a file")
+    bench.add_argument('--size', default='1MB', help="corpus size, e.g. 512K or 4MB (default: 1MB)")
+    bench.add_argument('--mix', choices=sorted(CORPUS_MIXES), default='balanced',
+                       help="token mix of the generated corpus")
+    bench.add_argument('--seed', type=int, default=0, help="corpus random seed")
+    bench.add_argument('--input', help="benchmark this file instead of a generated corpus")
+    bench.add_argument('--warmup', type=int, default=1, help="untimed runs per case")
+    bench.add_argument('--repeat', type=int, default=3, help="timed runs per case")
+    bench.add_argument('--no-memory', action='store_true', help="skip the peak memory runs")
+    bench.add_argument('--save', help="also write the JSON report to this file")
+    bench.add_argument('--baseline', help="JSON report to compare tokens/s against")
+    bench.add_argument('--tolerance', type=float, default=0.10,
+                       help="allowed slowdown against the baseline (default: 0.10)")
+
+    prof = commands.add_parser('profile', help="show where the lexer spends its time")
+    prof.add_argument('paths', nargs='+', help="source files or directories to profile")
+    prof.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    prof.add_argument('--ext', nargs='+',
+                      help="file extensions to profile in directories "
+                           "(default: the language's, else .txt .c .h)")
+    prof.add_argument('--top', type=int, default=10, help="UNKNOWN hotspots to list")
+    prof.add_argument('--json', help="write the profile as JSON to this file")
+    prof.add_argument('--pstats', help="write a pstats/cProfile dump (snakeviz, pstats) to this file")
+    prof.add_argument('--folded', help="write folded stacks for flamegraph.pl/speedscope to this file")
+
+    serve = commands.add_parser('serve', help="run a long-lived lexer server for editors and CI jobs")
+    where = serve.add_mutually_exclusive_group()
+    where.add_argument('--socket', help="listen on this Unix domain socket (JSON Lines protocol)")
+    where.add_argument('--port', type=int, default=8765,
+                       help="listen for HTTP on this port (default: 8765; 0 picks a free one)")
+    serve.add_argument('--host', default='127.0.0.1', help="HTTP address (default: 127.0.0.1)")
+    serve.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                       help="worker processes for large texts (default: CPU count)")
+    serve.add_argument('--language', '-l', help="default language profile for requests")
+    serve.add_argument('--max-pending', type=int, default=256,
+                       help="requests in flight before clients wait or get 503 (default: 256)")
+    serve.add_argument('--batch-size', type=int, default=32,
+                       help="most requests sent to a worker at once (default: 32)")
+    serve.add_argument('--batch-wait', type=float, default=2.0,
+                       help="milliseconds to wait for a batch to fill (default: 2)")
+    serve.add_argument('--verbose', '-v', action='store_true', help="log HTTP requests")
+    serve.add_argument('--watch', action='append', metavar='DIR',
+                       help="keep the token counts of this tree current and answer the 'watch' "
+                            "op / GET /watch with them (repeatable)")
+
+    watch = commands.add_parser('watch', help="keep the token counts of source trees current "
+                                              "as files change")
+    watch.add_argument('paths', nargs='+', help="source files or directories to watch")
+    watch.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                       help="worker processes that re-lex changed files (default: CPU count)")
+    watch.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    watch.add_argument('--ext', nargs='+',
+                       help="file extensions to watch (default: the language's, else .txt .c .h)")
+    watch.add_argument('--interval', type=float, default=1.0,
+                       help="seconds between checks when polling (default: 1)")
+    watch.add_argument('--poll', action='store_true',
+                       help="poll file signatures even where inotify is available")
+    watch.add_argument('--format', choices=('text', 'jsonl'), default='text',
+                       help="a summary line per update on stderr (default), or the whole "
+                            "state as a JSON line per update on stdout")
+    watch.add_argument('--top', type=int, default=10,
+                       help="files with the most tokens to include in jsonl states (default: 10)")
+    watch.add_argument('--once', action='store_true',
+                       help="report the initial scan and exit")
+
+    diff = commands.add_parser('diff', help="compare two versions of a source file token by token, "
+                                            "ignoring whitespace and comments")
+    diff.add_argument('old', help="original file")
+    diff.add_argument('new', help="changed file")
+    diff.add_argument('--language', '-l', help="language profile name or profile JSON file")
+    diff.add_argument('--format', choices=('text', 'json'), default='text',
+                      help="hunks with line:column anchors on both sides (default) or one "
+                           "JSON document")
+    diff.add_argument('--minimal', action='store_true',
+                      help="find the shortest edit script for large inputs too, even where "
+                           "that is slow (the default up to 10000 differing tokens)")
+    diff.add_argument('--max-tokens', type=int, default=50, metavar='N',
+                      help="token values to print per side of a hunk in text output "
+                           "(default: 50)")
+
+    languages = commands.add_parser('languages', help="list the language profiles")
+    languages.add_argument('--show', metavar='NAME',
+                           help="print a profile as JSON (a starting point for a profile file)")
+
+    corpus = commands.add_parser('corpus', help="write a synthetic corpus to a file")
+    corpus.add_argument('output', help="file to write")
+    corpus.add_argument('--size', default='1MB', help="corpus size, e.g. 512K or 4MB")
+    corpus.add_argument('--mix', choices=sorted(CORPUS_MIXES), default='balanced')
+    corpus.add_argument('--seed', type=int, default=0)
+    return parser
+
+def main(argv=None):
+    try:
+        status = run_command(argv)
+        # Flush here so a closed pipe is caught below, not at interpreter exit
+        sys.stdout.flush()
+        return status
+    except BrokenPipeError:
+        # The reader went away (e.g. output piped into head): stop quietly
+        # like other Unix tools; point stdout at devnull so the final flush
+        # at exit does not fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+def run_command(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if getattr(args, 'language', None):
+        try:
+            LanguageProfile.get(args.language)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+    if args.command == 'lex':
+        if args.jobs < 1:
+            print("error: --jobs must be at least 1", file=sys.stderr)
+            return 2
+        if args.max_unknown is not None and args.max_unknown < 0:
+            print("error: --max-unknown must not be negative", file=sys.stderr)
+            return 2
+        if not check_roots([args.path]):
+            return 2
+        return run_batch(args)
+    if args.command == 'export':
+        if args.jobs < 1:
+            print("error: --jobs must be at least 1", file=sys.stderr)
+            return 2
+        if not check_roots(args.paths):
+            return 2
+        return run_export(args)
+    if args.command == 'stats':
+        if not check_roots(args.paths):
+            return 2
+        try:
+            return run_stats(args)
+        except (OSError, ValueError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+    if args.command == 'deps':
+        if not check_roots(args.paths):
+            return 2
+        return run_deps(args)
+    if args.command == 'index':
+        if args.jobs < 1:
+            print("error: --jobs must be at least 1", file=sys.stderr)
+            return 2
+        if not check_roots(args.paths):
+            return 2
+    if args.command in ('index', 'lookup'):
+        try:
+            return run_index(args) if args.command == 'index' else run_lookup(args)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+    if args.command == 'bench':
+        return run_bench(args)
+    if args.command == 'corpus':
+        return run_corpus(args)
+    if args.command == 'profile':
+        if not check_roots(args.paths):
+            return 2
+        return run_profile(args)
+    if args.command == 'languages':
+        return run_languages(args)
+    if args.command == 'serve':
+        if args.workers < 1 or args.max_pending < 1 or args.batch_size < 1:
+            print("error: --workers, --max-pending and --batch-size must be at least 1",
+                  file=sys.stderr)
+            return 2
+        return run_serve(args)
+    if args.command == 'watch':
+        if args.jobs < 1 or args.interval <= 0:
+            print("error: --jobs must be at least 1 and --interval positive", file=sys.stderr)
+            return 2
+        if not check_roots(args.paths):
+            return 2
+        return run_watch(args)
+    if args.command == 'diff':
+        if args.max_tokens < 0:
+            print("error: --max-tokens must not be negative", file=sys.stderr)
+            return 2
+        return run_diff(args)
+
+    # Tk is only imported here, so headless commands and library use never load it
+    import tkinter as tk
+    from .gui import LexicalAnalyzerGUI
+
+    root = tk.Tk()
+    
+    # Set icon (optional)
+    try:
+        root.iconbitmap('icon.ico')
+    except:
+        pass
+    
+    app = LexicalAnalyzerGUI(root)
+    root.mainloop()
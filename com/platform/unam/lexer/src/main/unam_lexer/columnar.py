@@ -0,0 +1,247 @@
+"""Columnar token tables: export and bulk aggregation over many files"""
+
+import sys
+import json
+import struct
+import heapq
+from array import array
+from collections import Counter
+from itertools import compress, islice, repeat
+
+from .tokens import TokenBuffer
+
+class TokenTable:
+    """The tokens of one or many files as parallel columns.
+
+    file indexes self.files, type indexes self.type_names, value indexes
+    self.values (every distinct token text once) and start/end/line/column
+    locate the token in its file. The rows of a file are contiguous, from
+    file_offsets[i] to file_offsets[i + 1].
+
+    The aggregations only touch the raw arrays through C-level primitives
+    (bytes.count/translate, itertools.compress, Counter), so they stay fast
+    on corpus-sized tables without NumPy; to_numpy/to_arrow hand the same
+    columns to NumPy or Arrow when those are installed.
+    """
+
+    MAGIC = b'LXCT'
+    VERSION = 1
+    # magic, version, big-endian flag, row count, size of the JSON dictionary block
+    HEADER = struct.Struct('<4sBBQQ')
+    COLUMNS = (('file', 'I'), ('type', 'B'), ('start', 'q'), ('end', 'q'),
+               ('line', 'I'), ('column', 'I'), ('value', 'I'))
+
+    def __init__(self):
+        self.files = []
+        self.file_offsets = array('Q', [0])
+        self.type_names = TokenBuffer.TYPE_NAMES
+        self.values = []
+        self.value_ids = {}
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.type)
+
+    def add(self, path, buffer):
+        """Append the tokens of a TokenBuffer read from path"""
+        if self.type_names is not TokenBuffer.TYPE_NAMES:
+            raise ValueError("only tables built in this process can be extended")
+        count = len(buffer)
+        self.file.extend(repeat(len(self.files), count))
+        self.files.append(path)
+        self.file_offsets.append(self.file_offsets[-1] + count)
+        self.type.extend(buffer.type_codes)
+        self.start.extend(buffer.starts)
+        self.end.extend(buffer.ends)
+        self.line.extend(buffer.lines)
+        self.column.extend(buffer.columns)
+
+        # Intern the values: setdefault hands out the next id to unseen texts
+        ids = self.value_ids
+        texts = map(buffer.source.__getitem__, map(slice, buffer.starts, buffer.ends))
+        self.value.extend(ids.setdefault(text, len(ids)) for text in texts)
+        self.values.extend(islice(ids, len(self.values), None))
+
+    def merge(self, other):
+        """Append the rows of another table (e.g. built in a worker process)"""
+        base = len(self.files)
+        ids = self.value_ids
+        remap = array('I', (ids.setdefault(text, len(ids)) for text in other.values))
+        self.values.extend(islice(ids, len(self.values), None))
+        types = bytes(map(self.type_code, other.type_names))
+
+        self.files.extend(other.files)
+        offset = self.file_offsets[-1]
+        self.file_offsets.extend(offset + end for end in islice(other.file_offsets, 1, None))
+        self.file.extend(index + base for index in other.file)
+        self.type.frombytes(bytes(other.type).translate(types.ljust(256, b'\0')))
+        self.start.extend(other.start)
+        self.end.extend(other.end)
+        self.line.extend(other.line)
+        self.column.extend(other.column)
+        self.value.extend(map(remap.__getitem__, other.value))
+
+    def type_code(self, name):
+        """Code of a type name in self.type_names, adding the name if it is new.
+
+        A table built in this process shares the interned TokenBuffer codes;
+        a loaded one has the type list of its file and grows that instead.
+        """
+        if self.type_names is TokenBuffer.TYPE_NAMES:
+            return TokenBuffer.intern_type(name)
+        try:
+            return self.type_names.index(name)
+        except ValueError:
+            if len(self.type_names) > 255:
+                raise ValueError("Too many token types for a token table") from None
+            self.type_names.append(name)
+            return len(self.type_names) - 1
+
+    @classmethod
+    def from_files(cls, paths, analyzer):
+        table = cls()
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                table.add(path, analyzer.tokenize_buffer(f.read()))
+        return table
+
+    def nbytes(self):
+        """Memory used by the columns (the value dictionary is not counted)"""
+        return sum(getattr(self, name).itemsize * len(self) for name, _ in self.COLUMNS)
+
+    # -- file format ------------------------------------------------------------
+
+    def save(self, path):
+        """Header, a JSON block with the dictionaries, then the raw columns"""
+        dictionaries = json.dumps({'types': list(self.type_names), 'files': self.files,
+                                   'offsets': list(self.file_offsets), 'values': self.values},
+                                  ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, sys.byteorder == 'big',
+                                     len(self), len(dictionaries)))
+            f.write(dictionaries)
+            for name, _ in self.COLUMNS:
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, big_endian, count, size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path}: not a token table file")
+        pos = cls.HEADER.size
+        dictionaries = json.loads(data[pos:pos + size].decode('utf-8'))
+        pos += size
+
+        table = cls()
+        table.type_names = dictionaries['types']
+        table.files = dictionaries['files']
+        table.file_offsets = array('Q', dictionaries['offsets'])
+        table.values = dictionaries['values']
+        table.value_ids = {text: i for i, text in enumerate(table.values)}
+        for name, _ in cls.COLUMNS:
+            column = getattr(table, name)
+            end = pos + column.itemsize * count
+            if end > len(data):
+                raise ValueError(f"{path}: truncated token table file")
+            column.frombytes(data[pos:end])
+            pos = end
+            if big_endian != (sys.byteorder == 'big'):
+                column.byteswap()
+        return table
+
+    def to_numpy(self):
+        """(structured array of the columns, values list); needs NumPy"""
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("to_numpy needs NumPy (pip install numpy)") from None
+        rows = np.empty(len(self), dtype=[(name, typecode if typecode != 'q' else 'i8')
+                                          for name, typecode in self.COLUMNS])
+        for name, _ in self.COLUMNS:
+            rows[name] = np.frombuffer(getattr(self, name), dtype=rows.dtype[name])
+        return rows, self.values
+
+    def to_arrow(self):
+        """pyarrow Table with dictionary-encoded file, type and value columns; needs pyarrow"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("to_arrow needs pyarrow (pip install pyarrow)") from None
+        columns = {
+            'file': pa.DictionaryArray.from_arrays(pa.array(self.file, pa.uint32()),
+                                                   pa.array(self.files, pa.string())),
+            'type': pa.DictionaryArray.from_arrays(pa.array(self.type, pa.uint8()),
+                                                   pa.array(list(self.type_names), pa.string())),
+            'start': pa.array(self.start, pa.int64()),
+            'end': pa.array(self.end, pa.int64()),
+            'line': pa.array(self.line, pa.uint32()),
+            'column': pa.array(self.column, pa.uint32()),
+            'value': pa.DictionaryArray.from_arrays(pa.array(self.value, pa.uint32()),
+                                                    pa.array(self.values, pa.string())),
+        }
+        return pa.table(columns)
+
+    def write_parquet(self, path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("write_parquet needs pyarrow (pip install pyarrow)") from None
+        pq.write_table(self.to_arrow(), path)
+
+    # -- aggregation --------------------------------------------------------------
+
+    def rows_of(self, file=None):
+        """Row range (first, last) of one file (path or index), or of the whole table"""
+        if file is None:
+            return 0, len(self)
+        index = self.files.index(file) if isinstance(file, str) else file
+        return self.file_offsets[index], self.file_offsets[index + 1]
+
+    def type_mask(self, types, first=0, last=None):
+        """bytes with 1 where the row's type is one of types, else 0"""
+        selected = set(types)
+        table = bytes(name in selected for name in self.type_names).ljust(256, b'\0')
+        return self.type[first:last].tobytes().translate(table)
+
+    def type_histogram(self, file=None):
+        """{type name: token count} over one file or the whole table"""
+        first, last = self.rows_of(file)
+        codes = self.type[first:last].tobytes()
+        names = self.type_names
+        return {names[code]: count for code, count in sorted(Counter(codes).items())}
+
+    def file_histograms(self):
+        """{path: {type name: token count}} for every file"""
+        return {path: self.type_histogram(i) for i, path in enumerate(self.files)}
+
+    def line_counts(self, types=None, file=None):
+        """Counter {line: tokens} of one file; with types, only those token types"""
+        if file is None and len(self.files) != 1:
+            raise ValueError("line_counts needs a file when the table holds several")
+        first, last = self.rows_of(file if file is not None else 0)
+        lines = self.line[first:last]
+        if types is None:
+            return Counter(lines)
+        return Counter(compress(lines, self.type_mask(types, first, last)))
+
+    def top_values(self, types=('IDENTIFIER',), k=10, file=None):
+        """The k most frequent token texts of the given types, as (value, count)"""
+        first, last = self.rows_of(file)
+        ids = Counter(compress(self.value[first:last], self.type_mask(types, first, last)))
+        values = self.values
+        return [(values[i], count) for i, count in heapq.nlargest(k, ids.items(), key=lambda e: e[1])]
+
+    def summary(self, types=('IDENTIFIER',), k=10):
+        """JSON-ready overview: totals, type histogram, top values, busiest files"""
+        per_file = Counter(compress(self.file, self.type_mask(types)))
+        return {
+            'files': len(self.files),
+            'tokens': len(self),
+            'distinct_values': len(self.values),
+            'types': self.type_histogram(),
+            'top_values': self.top_values(types, k),
+            'top_files': [(self.files[i], count) for i, count in per_file.most_common(k)],
+        }
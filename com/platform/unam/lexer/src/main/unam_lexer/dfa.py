@@ -0,0 +1,588 @@
+"""Lexer DFA compiled from the token patterns"""
+
+import re
+import sys
+import struct
+import tempfile
+import os
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+MAX_CODEPOINT = 0x10FFFF
+
+class PatternSyntaxError(ValueError):
+    """A token pattern uses regex syntax the DFA compiler does not support"""
+
+class CharSet:
+    """A set of code points as sorted, disjoint, inclusive (lo, hi) intervals"""
+    __slots__ = ('intervals',)
+
+    # All code points as one string, built on first use to expand \d, \s, \w
+    # exactly the way the re module does
+    _all_chars = None
+
+    def __init__(self, intervals=()):
+        merged = []
+        for lo, hi in sorted(intervals):
+            if merged and lo <= merged[-1][1] + 1:
+                if hi > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        self.intervals = tuple(merged)
+
+    @classmethod
+    def of(cls, ch):
+        return cls([(ord(ch), ord(ch))])
+
+    @classmethod
+    def from_regex(cls, escape):
+        """Code points matched by a one-char regex such as \\d or \\s"""
+        if cls._all_chars is None:
+            cls._all_chars = ''.join(map(chr, range(MAX_CODEPOINT + 1)))
+        intervals = []
+        for m in re.finditer(escape + '+', cls._all_chars):
+            intervals.append((m.start(), m.end() - 1))
+        return cls(intervals)
+
+    def union(self, other):
+        return CharSet(self.intervals + other.intervals)
+
+    def complement(self):
+        result = []
+        start = 0
+        for lo, hi in self.intervals:
+            if lo > start:
+                result.append((start, lo - 1))
+            start = hi + 1
+        if start <= MAX_CODEPOINT:
+            result.append((start, MAX_CODEPOINT))
+        return CharSet(result)
+
+    def to_regex(self):
+        """Regex character class matching exactly these code points ('(?!)' if empty)"""
+        if not self.intervals:
+            return '(?!)'
+        parts = []
+        for lo, hi in self.intervals:
+            parts.append(re.escape(chr(lo)) if lo == hi else f'{re.escape(chr(lo))}-{re.escape(chr(hi))}')
+        return '[' + ''.join(parts) + ']'
+
+    def contains(self, code):
+        for lo, hi in self.intervals:
+            if code < lo:
+                return False
+            if code <= hi:
+                return True
+        return False
+
+class PatternParser:
+    """Parse the regex subset used by token patterns into a Thompson NFA.
+
+    Supported: literals, escapes, '.', [classes] with ranges and negation,
+    (groups), (?:groups), '|', and the *, +, ? quantifiers. A lazy
+    quantifier makes the whole pattern match the shortest possible text,
+    which is what '/\\*.*?\\*/' needs.
+    """
+
+    ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', '0': '\0'}
+    CLASS_ESCAPES = {'d': r'\d', 's': r'\s', 'w': r'\w', 'D': r'\D', 'S': r'\S', 'W': r'\W'}
+
+    def __init__(self, nfa, pattern, dotall=False):
+        self.nfa = nfa
+        self.pattern = pattern
+        self.pos = 0
+        self.dotall = dotall
+        self.lazy = False
+
+    def parse(self):
+        """(start, end) NFA states of the whole pattern"""
+        fragment = self.parse_alternation()
+        if self.pos != len(self.pattern):
+            raise PatternSyntaxError(f"Unexpected '{self.pattern[self.pos]}' in {self.pattern!r}")
+        return fragment
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def next(self):
+        if self.pos >= len(self.pattern):
+            raise PatternSyntaxError(f"Unexpected end of {self.pattern!r}")
+        ch = self.pattern[self.pos]
+        self.pos += 1
+        return ch
+
+    def parse_alternation(self):
+        branches = [self.parse_concatenation()]
+        while self.peek() == '|':
+            self.pos += 1
+            branches.append(self.parse_concatenation())
+        if len(branches) == 1:
+            return branches[0]
+        start, end = self.nfa.new_state(), self.nfa.new_state()
+        for b_start, b_end in branches:
+            self.nfa.add_epsilon(start, b_start)
+            self.nfa.add_epsilon(b_end, end)
+        return start, end
+
+    def parse_concatenation(self):
+        start = end = self.nfa.new_state()
+        while self.peek() not in (None, '|', ')'):
+            f_start, f_end = self.parse_repeat()
+            self.nfa.add_epsilon(end, f_start)
+            end = f_end
+        return start, end
+
+    def parse_repeat(self):
+        f_start, f_end = self.parse_atom()
+        quantifier = self.peek()
+        if quantifier not in ('*', '+', '?'):
+            return f_start, f_end
+        self.pos += 1
+        if self.peek() == '?':
+            self.pos += 1
+            self.lazy = True
+        start, end = self.nfa.new_state(), self.nfa.new_state()
+        self.nfa.add_epsilon(start, f_start)
+        self.nfa.add_epsilon(f_end, end)
+        if quantifier in ('*', '?'):
+            self.nfa.add_epsilon(start, end)
+        if quantifier in ('*', '+'):
+            self.nfa.add_epsilon(f_end, f_start)
+        return start, end
+
+    def parse_atom(self):
+        ch = self.next()
+        if ch == '(':
+            if self.pattern.startswith('?:', self.pos):
+                self.pos += 2
+            elif self.peek() == '?':
+                raise PatternSyntaxError(f"Unsupported group in {self.pattern!r}")
+            fragment = self.parse_alternation()
+            if self.next() != ')':
+                raise PatternSyntaxError(f"Missing ')' in {self.pattern!r}")
+            return fragment
+        if ch == '[':
+            return self.char_fragment(self.parse_class())
+        if ch == '.':
+            chars = CharSet([(0, MAX_CODEPOINT)]) if self.dotall else CharSet.of('\n').complement()
+            return self.char_fragment(chars)
+        if ch == '\\':
+            return self.char_fragment(self.parse_escape())
+        if ch in '*+?)':
+            raise PatternSyntaxError(f"Unexpected '{ch}' in {self.pattern!r}")
+        if ch in '^${':
+            raise PatternSyntaxError(f"Unsupported '{ch}' in {self.pattern!r}")
+        return self.char_fragment(CharSet.of(ch))
+
+    def parse_escape(self):
+        ch = self.next()
+        if ch in self.CLASS_ESCAPES:
+            return CharSet.from_regex(self.CLASS_ESCAPES[ch])
+        if ch in self.ESCAPES:
+            return CharSet.of(self.ESCAPES[ch])
+        if ch.isalnum():
+            raise PatternSyntaxError(f"Unsupported escape '\\{ch}' in {self.pattern!r}")
+        return CharSet.of(ch)
+
+    def parse_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.pos += 1
+        chars = CharSet()
+        first = True
+        while True:
+            ch = self.next()
+            if ch == ']' and not first:
+                break
+            first = False
+            if ch == '\\':
+                item = self.parse_escape()
+                if len(item.intervals) != 1 or item.intervals[0][0] != item.intervals[0][1]:
+                    chars = chars.union(item)
+                    continue
+                lo = item.intervals[0][0]
+            else:
+                lo = ord(ch)
+            # Range like a-z (a '-' right before ']' is a literal)
+            if self.peek() == '-' and self.pos + 1 < len(self.pattern) and self.pattern[self.pos + 1] != ']':
+                self.pos += 1
+                ch = self.next()
+                hi = self.parse_escape().intervals[0][0] if ch == '\\' else ord(ch)
+                chars = chars.union(CharSet([(lo, hi)]))
+            else:
+                chars = chars.union(CharSet([(lo, lo)]))
+        return chars.complement() if negate else chars
+
+    def char_fragment(self, chars):
+        start, end = self.nfa.new_state(), self.nfa.new_state()
+        self.nfa.add_edge(start, chars, end)
+        return start, end
+
+class NFA:
+    """Thompson NFA shared by all token patterns"""
+
+    def __init__(self):
+        self.epsilon = []   # state -> list of states
+        self.edges = []     # state -> list of (charset index, state)
+        self.charsets = []
+        self.charset_ids = {}
+
+    def new_state(self):
+        self.epsilon.append([])
+        self.edges.append([])
+        return len(self.epsilon) - 1
+
+    def add_epsilon(self, source, target):
+        self.epsilon[source].append(target)
+
+    def add_edge(self, source, chars, target):
+        index = self.charset_ids.get(chars.intervals)
+        if index is None:
+            index = len(self.charsets)
+            self.charsets.append(chars)
+            self.charset_ids[chars.intervals] = index
+        self.edges[source].append((index, target))
+
+    def closure(self, states):
+        stack = list(states)
+        seen = set(states)
+        while stack:
+            for target in self.epsilon[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+def start_chars(token_patterns, dotall_patterns=()):
+    """CharSet of the chars a match of any of the patterns can start with.
+
+    Only the NFA is built, not the DFA, so this is cheap enough to call
+    for the master pattern engine too.
+    """
+    nfa = NFA()
+    starts = [PatternParser(nfa, pattern, dotall=name in dotall_patterns).parse()[0]
+              for name, pattern in token_patterns]
+    intervals = []
+    for state in nfa.closure(starts):
+        for charset, _ in nfa.edges[state]:
+            intervals.extend(nfa.charsets[charset].intervals)
+    # The all-code-points string is only needed while parsing
+    CharSet._all_chars = None
+    return CharSet(intervals)
+
+class LexerDFA:
+    """Minimized DFA over character classes, with maximal-munch scanning.
+
+    State 0 is the dead state and state 1 the start state. Every code
+    point maps to a character class (a table for Latin-1, intervals
+    above it) and transitions[state * class_count + cls] is the next
+    state. accepts[state] is the index of the highest-priority pattern
+    accepted there, or -1.
+    """
+
+    MAGIC = b'LXDF'
+    VERSION = 1
+    # magic, version, state count, class count, pattern count, high interval count
+    HEADER = struct.Struct('<4sBIIII')
+    TABLE_SIZE = 256
+
+    def __init__(self, pattern_names, class_count, low_classes, high_starts, high_classes,
+                 transitions, accepts):
+        self.pattern_names = pattern_names
+        self.class_count = class_count
+        self.low_classes = low_classes      # bytes: class of code points < TABLE_SIZE
+        self.high_starts = high_starts      # array('I'): interval starts >= TABLE_SIZE
+        self.high_classes = high_classes    # array('H'): class of each such interval
+        self.transitions = transitions      # array('I')
+        self.accepts = accepts              # array('b')
+        self.build_run_skips()
+
+    # -- building ---------------------------------------------------------------
+
+    @classmethod
+    def compile(cls, token_patterns, dotall_patterns=()):
+        """Build the minimized DFA for [(name, pattern)] in priority order"""
+        nfa = NFA()
+        start = nfa.new_state()
+        accept_of = {}      # NFA accept state -> pattern index
+        owner = []          # pattern index of each NFA state
+        shortest = set()    # patterns with a lazy quantifier
+        for index, (name, pattern) in enumerate(token_patterns):
+            first_state = len(nfa.epsilon)
+            parser = PatternParser(nfa, pattern, dotall=name in dotall_patterns)
+            p_start, p_end = parser.parse()
+            nfa.add_epsilon(start, p_start)
+            accept_of[p_end] = index
+            owner.extend([index] * (len(nfa.epsilon) - first_state))
+            if parser.lazy:
+                shortest.add(index)
+        owner.insert(0, -1)
+
+        class_count, classes_of_charset, low_classes, high_starts, high_classes = \
+            cls.partition_alphabet(nfa.charsets)
+
+        # Subset construction
+        def accepted(subset):
+            found = [accept_of[s] for s in subset if s in accept_of]
+            return min(found) if found else -1
+
+        def settle(subset):
+            # A lazy pattern stops at its first accept: drop its other states
+            done = {accept_of[s] for s in subset if s in accept_of and accept_of[s] in shortest}
+            if done:
+                subset = frozenset(s for s in subset if owner[s] not in done or s in accept_of)
+            return subset
+
+        start_set = settle(nfa.closure([start]))
+        subsets = {frozenset(): 0, start_set: 1}
+        order = [frozenset(), start_set]
+        table = []
+        i = 0
+        while i < len(order):
+            subset = order[i]
+            row = [0] * class_count
+            if subset:
+                moves = [set() for _ in range(class_count)]
+                for state in subset:
+                    for charset, target in nfa.edges[state]:
+                        for c in classes_of_charset[charset]:
+                            moves[c].add(target)
+                for c, targets in enumerate(moves):
+                    if targets:
+                        target_set = settle(nfa.closure(targets))
+                        index = subsets.get(target_set)
+                        if index is None:
+                            index = len(order)
+                            subsets[target_set] = index
+                            order.append(target_set)
+                        row[c] = index
+            table.append(row)
+            i += 1
+        accepts = [accepted(subset) for subset in order]
+
+        table, accepts = cls.minimize(table, accepts)
+        # The all-code-points string is only needed while compiling
+        CharSet._all_chars = None
+        return cls([name for name, _ in token_patterns], class_count, low_classes,
+                   high_starts, high_classes,
+                   array('I', [t for row in table for t in row]), array('b', accepts))
+
+    @classmethod
+    def partition_alphabet(cls, charsets):
+        """Split all code points into classes no charset tells apart"""
+        points = {0, MAX_CODEPOINT + 1, cls.TABLE_SIZE}
+        for chars in charsets:
+            for lo, hi in chars.intervals:
+                points.add(lo)
+                points.add(hi + 1)
+        points = sorted(points)
+
+        signature_class = {}
+        interval_classes = []
+        for lo in points[:-1]:
+            signature = tuple(chars.contains(lo) for chars in charsets)
+            interval_classes.append(signature_class.setdefault(signature, len(signature_class)))
+        class_count = len(signature_class)
+
+        classes_of_charset = [set() for _ in charsets]
+        for signature, c in signature_class.items():
+            for index, member in enumerate(signature):
+                if member:
+                    classes_of_charset[index].add(c)
+
+        low = bytearray(cls.TABLE_SIZE)
+        high_starts = array('I')
+        high_classes = array('H')
+        for k, lo in enumerate(points[:-1]):
+            hi = points[k + 1]
+            if lo < cls.TABLE_SIZE:
+                low[lo:min(hi, cls.TABLE_SIZE)] = bytes([interval_classes[k]]) * (min(hi, cls.TABLE_SIZE) - lo)
+            else:
+                high_starts.append(lo)
+                high_classes.append(interval_classes[k])
+        if class_count > 255:
+            raise PatternSyntaxError("Too many character classes")
+        return class_count, [sorted(c) for c in classes_of_charset], bytes(low), high_starts, high_classes
+
+    @staticmethod
+    def minimize(table, accepts):
+        """Moore partition refinement; keeps 0 as dead and 1 as start"""
+        block = list(accepts)
+        while True:
+            signatures = {}
+            new_block = []
+            for state, row in enumerate(table):
+                signature = (block[state],) + tuple(block[t] for t in row)
+                new_block.append(signatures.setdefault(signature, len(signatures)))
+            if len(signatures) == len(set(block)):
+                break
+            block = new_block
+
+        # Renumber so the dead state stays 0 and the start state 1
+        numbering = {block[0]: 0, block[1]: 1}
+        for b in block:
+            numbering.setdefault(b, len(numbering))
+        size = len(numbering)
+        new_table = [None] * size
+        new_accepts = [-1] * size
+        for state, row in enumerate(table):
+            n = numbering[block[state]]
+            if new_table[n] is None:
+                new_table[n] = [numbering[block[t]] for t in row]
+                new_accepts[n] = accepts[state]
+        return new_table, new_accepts
+
+    def build_run_skips(self):
+        """Compiled [chars]* for states that loop on themselves (the fast path)"""
+        count = self.class_count
+        self.run_skips = [None] * (len(self.transitions) // count)
+        class_chars = [[] for _ in range(count)]
+        for code, c in enumerate(self.low_classes):
+            class_chars[c].append((code, code))
+        bounds = list(self.high_starts) + [MAX_CODEPOINT + 1]
+        for k, c in enumerate(self.high_classes):
+            class_chars[c].append((bounds[k], bounds[k + 1] - 1))
+
+        def chars_of(classes):
+            return CharSet([interval for c in classes for interval in class_chars[c]])
+
+        for state in range(1, len(self.run_skips)):
+            loops = [c for c in range(count) if self.transitions[state * count + c] == state]
+            if loops:
+                self.run_skips[state] = re.compile(chars_of(loops).to_regex() + '*', re.DOTALL).match
+        # Chars no token starts with: a run of them is skipped as one unknown segment
+        dead = [c for c in range(count) if self.transitions[count + c] == 0]
+        self.dead_skip = re.compile(chars_of(dead).to_regex() + '*', re.DOTALL).match
+
+    # -- serialization ------------------------------------------------------------
+
+    def save(self, path):
+        names = '\n'.join(self.pattern_names).encode('utf-8')
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, len(self.accepts), self.class_count,
+                                  len(names), len(self.high_starts))
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(names)
+            f.write(self.low_classes)
+            # Always little-endian on disk
+            for column in (self.high_starts, self.high_classes, self.transitions, self.accepts):
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, states, class_count, names_size, high_count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("not a lexer DFA file")
+        pos = cls.HEADER.size
+        names = data[pos:pos + names_size].decode('utf-8').split('\n')
+        pos += names_size
+        low_classes = data[pos:pos + cls.TABLE_SIZE]
+        pos += cls.TABLE_SIZE
+        columns = []
+        for typecode, count in (('I', high_count), ('H', high_count),
+                                ('I', states * class_count), ('b', states)):
+            column = array(typecode)
+            size = column.itemsize * count
+            if pos + size > len(data):
+                raise ValueError("truncated lexer DFA file")
+            column.frombytes(data[pos:pos + size])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns.append(column)
+            pos += size
+        return cls(names, class_count, low_classes, *columns)
+
+    # -- scanning -----------------------------------------------------------------
+
+    def class_of(self, code):
+        return self.high_classes[bisect_left(self.high_starts, code + 1) - 1]
+
+    def scan(self, text, fast_path=True):
+        """Yield (pattern index or -1 for no match, start, end) segments covering text.
+
+        Maximal munch: each segment is the longest prefix accepted by any
+        pattern, ties going to the earlier pattern, and consecutive chars
+        where no pattern matches form one -1 segment. States that already
+        failed to reach an accept from a position are remembered, so
+        repeated unclosed comments or strings stay linear. With fast_path,
+        runs of characters a state loops on are skipped with one regex
+        character-class call instead of one table step per character.
+        """
+        transitions = self.transitions
+        accepts = self.accepts
+        low = self.low_classes
+        low_size = self.TABLE_SIZE
+        count = self.class_count
+        run_skips = self.run_skips if fast_path else [None] * len(self.run_skips)
+        class_of = self.class_of
+        length = len(text)
+        dead = {}          # state -> sorted (first, last) position runs known to never accept
+        dead_until = -1
+        pending = []
+        dead_skip = self.dead_skip
+        unknown_start = -1
+        pos = 0
+
+        while pos < length:
+            if dead and pos > dead_until:
+                dead.clear()
+            state = 1
+            i = pos
+            best = -1
+            best_end = pos
+            del pending[:]
+
+            while i < length:
+                code = ord(text[i])
+                state = transitions[state * count + (low[code] if code < low_size else class_of(code))]
+                if not state:
+                    break
+                i += 1
+                if dead:
+                    runs = dead.get(state)
+                    if runs:
+                        k = bisect_right(runs, (i, length)) - 1
+                        if k >= 0 and runs[k][1] >= i:
+                            break
+                entered = i
+                skip = run_skips[state]
+                if skip is not None:
+                    i = skip(text, i).end()
+                accepted = accepts[state]
+                if accepted >= 0:
+                    best = accepted
+                    best_end = i
+                    if pending:
+                        del pending[:]
+                else:
+                    pending.append((state, entered, i))
+
+            # Everything visited after the last accept leads nowhere
+            if pending:
+                for state, first, last in pending:
+                    insort(dead.setdefault(state, []), (first, last))
+                    if last > dead_until:
+                        dead_until = last
+
+            if best < 0:
+                # Unrecognized input: extend the current unknown segment
+                if unknown_start < 0:
+                    unknown_start = pos
+                pos = dead_skip(text, pos + 1).end() if fast_path else pos + 1
+            else:
+                if unknown_start >= 0:
+                    yield -1, unknown_start, pos
+                    unknown_start = -1
+                yield best, pos, best_end
+                pos = best_end
+
+        if unknown_start >= 0:
+            yield -1, unknown_start, length
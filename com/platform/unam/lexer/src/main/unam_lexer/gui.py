@@ -0,0 +1,1345 @@
+"""Tkinter interface; the only module that imports tkinter"""
+
+import queue
+import threading
+import tkinter as tk
+import os
+from tkinter import ttk, filedialog, messagebox, scrolledtext
+from array import array
+
+from .analyzer import AnalysisJob, IncrementalLexer, LexicalAnalyzer, TokenCache
+from .tokens import LexerProfile
+from .tokendiff import TokenDiff
+
+class VirtualTokenTable:
+    """Token table that only materializes the rows currently on screen.
+
+    The Treeview holds one item per visible row; scrolling rewrites their
+    values from the token source (a TokenBuffer or IncrementalLexer), so
+    the widget size does not depend on the number of tokens. Sorting and
+    jump-to-line work on the source and an index permutation.
+    """
+
+    COLUMNS = ('Type', 'Value', 'Line', 'Column')
+    ROW_HEIGHT = 20
+
+    def __init__(self, parent, colors):
+        self.source = None
+        self.count = None          # rows of the source that may be shown, None = all
+        self.order = None          # index permutation when sorted, None = token order
+        self.sort_column = None
+        self.sort_reverse = False
+        self.first = 0             # index (in display order) of the top row
+        self.slots = []            # Treeview item ids, one per visible row
+
+        self.v_scrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.on_scroll)
+        self.v_scrollbar.pack(side='right', fill='y')
+
+        h_scrollbar = ttk.Scrollbar(parent, orient='horizontal')
+        h_scrollbar.pack(side='bottom', fill='x')
+
+        self.tree = ttk.Treeview(parent, columns=self.COLUMNS, show='headings',
+                                 xscrollcommand=h_scrollbar.set,
+                                 height=15)
+        for col in self.COLUMNS:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=150, anchor='center')
+        self.tree.pack(fill='both', expand=True)
+        h_scrollbar.config(command=self.tree.xview)
+
+        self.tree.tag_configure('oddrow', background=colors['bg_tertiary'])
+        self.tree.tag_configure('evenrow', background=colors['bg_primary'])
+
+        # Scrolling is handled here, the Treeview itself never scrolls
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_by(-1 if e.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_by(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_by(1, 'units'))
+        self.tree.bind('<Prior>', lambda e: self.scroll_by(-1, 'pages'))
+        self.tree.bind('<Next>', lambda e: self.scroll_by(1, 'pages'))
+        self.tree.bind('<Home>', lambda e: self.show_index(0))
+        self.tree.bind('<End>', lambda e: self.show_index(self.total()))
+
+    def total(self):
+        if self.source is None:
+            return 0
+        return len(self.source) if self.count is None else self.count
+
+    def visible_rows(self):
+        return len(self.slots)
+
+    def set_source(self, source, count=None):
+        """Show a new token result, keeping the current sort column.
+
+        count limits the rows shown while the source is still being filled.
+        """
+        self.source = source
+        self.count = count
+        self.order = None
+        if self.sort_column is not None:
+            self.apply_sort()
+        self.first = 0
+        self.refresh()
+
+    def extend_to(self, count):
+        """More rows of a source that is being filled are ready"""
+        self.count = count
+        if self.order is not None:
+            self.apply_sort()
+        self.refresh()
+
+    def clear(self):
+        self.source = None
+        self.count = None
+        self.order = None
+        self.first = 0
+        self.refresh()
+
+    def on_resize(self, event):
+        style_height = ttk.Style().lookup('Treeview', 'rowheight')
+        row_height = int(style_height) if style_height else self.ROW_HEIGHT
+        # Leave room for the heading row
+        wanted = max(1, event.height // row_height - 1)
+        while len(self.slots) < wanted:
+            self.slots.append(self.tree.insert('', 'end', values=('', '', '', '')))
+        while len(self.slots) > wanted:
+            self.tree.delete(self.slots.pop())
+        self.refresh()
+
+    def on_scroll(self, action, *args):
+        if action == 'moveto':
+            self.show_index(int(float(args[0]) * self.total()))
+        elif action == 'scroll':
+            self.scroll_by(int(args[0]), args[1])
+
+    def scroll_by(self, amount, what):
+        step = max(1, self.visible_rows() - 1) if what == 'pages' else 3
+        self.show_index(self.first + amount * step)
+        return 'break'
+
+    def show_index(self, index):
+        last_top = max(0, self.total() - self.visible_rows())
+        self.first = max(0, min(index, last_top))
+        self.refresh()
+        return 'break'
+
+    def refresh(self):
+        """Rewrite the visible slots from the source"""
+        total = self.total()
+        count = self.visible_rows()
+        if self.source is None or not total:
+            rows = []
+        elif self.order is None:
+            rows = self.source.row_range(self.first, self.first + count)
+        else:
+            rows = [self.source.row_at(i) for i in self.order[self.first:self.first + count]]
+
+        for n, item in enumerate(self.slots):
+            if n < len(rows):
+                index = self.first + n
+                tag = 'evenrow' if index % 2 == 0 else 'oddrow'
+                self.tree.item(item, values=rows[n], tags=(tag,))
+            else:
+                self.tree.item(item, values=('', '', '', ''), tags=())
+
+        if total:
+            self.v_scrollbar.set(self.first / total, min(1.0, (self.first + count) / total))
+        else:
+            self.v_scrollbar.set(0.0, 1.0)
+
+    def sort_by(self, column):
+        """Sort by a column; clicking the same heading again reverses the order"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.apply_sort()
+        self.first = 0
+        self.refresh()
+
+    def apply_sort(self):
+        if self.source is None:
+            return
+        column = self.COLUMNS.index(self.sort_column)
+        total = self.total()
+        if column == 2:
+            # Tokens are already in line order
+            order = range(total - 1, -1, -1) if self.sort_reverse else range(total)
+        else:
+            keys = [row[column] for row in self.source.row_range(0, total)]
+            order = sorted(range(total), key=keys.__getitem__, reverse=self.sort_reverse)
+        self.order = array('I', order)
+
+    def jump_to_line(self, line):
+        """Scroll to the first token on or after line; returns False if none"""
+        if self.source is None:
+            return False
+        index = self.source.index_of_line(line)
+        if index >= self.total():
+            return False
+        if self.order is not None:
+            index = self.order.index(index)
+        self.show_index(index)
+        # Highlight the row if it made it to the top of the window
+        if self.slots and self.first == index:
+            self.tree.selection_set(self.slots[0])
+        return True
+
+class SyntaxHighlighter:
+    """Colors the code editor by token type, one viewport at a time.
+
+    Only the visible lines plus MARGIN lines around them are tagged, and
+    again whenever the view moves. For every line the highlighter keeps
+    where lexing can resume: the line start itself, or the start of the
+    comment or literal spanning over it. Retagging starts from there and
+    an edit only forgets the states from the edited line down.
+    """
+
+    # Lines tagged above and below the visible ones
+    MARGIN = 50
+    # Lines fetched from the widget at once, doubled while a token runs past them
+    WINDOW_LINES = 256
+    # ms to wait after the last edit, and to coalesce scroll events
+    EDIT_DELAY = 150
+    SCROLL_DELAY = 20
+
+    # Token type -> Tk tag
+    TAGS = {
+        'KEYWORD': 'tok_keyword',
+        'INT_CONSTANT': 'tok_constant',
+        'FLOAT_CONSTANT': 'tok_constant',
+        'STRING_LITERAL': 'tok_literal',
+        'CHAR_LITERAL': 'tok_literal',
+        'COMMENT_SINGLE': 'tok_comment',
+        'COMMENT_MULTI': 'tok_comment',
+        'OPERATOR': 'tok_operator',
+        'UNKNOWN': 'tok_unknown',
+    }
+    SPANNING_TYPES = LexicalAnalyzer.SPANNING_TYPES
+
+    def __init__(self, root, editor, analyzer, colors):
+        self.root = root
+        self.editor = editor
+        self.analyzer = analyzer
+        # Resume point (line, column) of each line, index 0 = line 1
+        self.resume_lines = array('I')
+        self.resume_columns = array('I')
+        self.tagged = None         # (first, last) lines tagged since the last edit
+        self.edit_line = None      # topmost line touched by the pending edit
+        self.after_id = None
+
+        # Line states come from the analyzer's pattern of line-spanning tokens
+        self.state_pattern = analyzer.state_pattern
+
+        editor.tag_configure('tok_keyword', foreground=colors['accent'],
+                             font=('Consolas', 11, 'bold'))
+        editor.tag_configure('tok_constant', foreground=colors['warning'])
+        editor.tag_configure('tok_literal', foreground=colors['success'])
+        editor.tag_configure('tok_comment', foreground='#718096',
+                             font=('Consolas', 11, 'italic'))
+        editor.tag_configure('tok_operator', foreground=colors['accent_hover'])
+        editor.tag_configure('tok_unknown', foreground=colors['error'], underline=True)
+        editor.tag_raise('sel')
+
+        # Where an edit starts must be known before it happens (a paste
+        # leaves the cursor at the end of the pasted text)
+        for sequence in ('<KeyPress>', '<<Paste>>', '<<Cut>>', '<<Clear>>', '<<PasteSelection>>'):
+            editor.bind(sequence, self.note_edit_point, add='+')
+
+    def note_edit_point(self, event=None):
+        line = int(self.editor.index('insert').split('.')[0])
+        if self.editor.tag_ranges('sel'):
+            line = min(line, int(self.editor.index('sel.first').split('.')[0]))
+        if self.edit_line is None or line < self.edit_line:
+            self.edit_line = line
+
+    def on_edit(self):
+        """The text changed: forget the states below the edit, retag when typing pauses"""
+        line = int(self.editor.index('insert').split('.')[0])
+        if self.edit_line is not None:
+            line = min(line, self.edit_line)
+        self.edit_line = None
+        self.forget_states(line - 1)
+        self.tagged = None
+        self.schedule(self.EDIT_DELAY, restart=True)
+
+    def invalidate(self):
+        """The whole text was replaced"""
+        self.edit_line = None
+        self.forget_states(0)
+        self.tagged = None
+        self.schedule(self.SCROLL_DELAY, restart=True)
+
+    def on_view_change(self, event=None):
+        self.schedule(self.SCROLL_DELAY)
+
+    def schedule(self, delay, restart=False):
+        if self.after_id is not None:
+            if not restart:
+                return
+            self.root.after_cancel(self.after_id)
+        self.after_id = self.root.after(delay, self.highlight_view)
+
+    def forget_states(self, line):
+        """Keep the states of lines 1..line only"""
+        del self.resume_lines[line:]
+        del self.resume_columns[line:]
+
+    def line_count(self):
+        return int(self.editor.index('end-1c').split('.')[0])
+
+    def segments(self, line, column, match, stop_line):
+        """Yield (type, value, line, column) from a resume point to stop_line.
+
+        Text is fetched from the widget a window of lines at a time; when
+        a comment or literal may run past the window it is fetched again
+        from the token start with a window twice as big.
+        """
+        window = self.WINDOW_LINES
+        last_line = self.line_count()
+        while True:
+            end_line = min(line + window, last_line)
+            at_eof = end_line >= last_line
+            text = self.editor.get(f'{line}.{column}', 'end-1c' if at_eof else f'{end_line}.0')
+            length = len(text)
+            pos = 0
+            while pos < length:
+                if line > stop_line:
+                    return
+                m = match(text, pos)
+                if m is None:
+                    tt = 'UNKNOWN'
+                    end = self.analyzer.unknown_pattern.match(text, pos).end()
+                else:
+                    tt = m.lastgroup
+                    end = m.end()
+                if not at_eof and self.may_need_more(text, pos, end, tt):
+                    break
+                value = text[pos:end]
+                yield tt, value, line, column
+                newlines = value.count('\n')
+                if newlines:
+                    line += newlines
+                    column = len(value) - value.rfind('\n') - 1
+                else:
+                    column += end - pos
+                pos = end
+            if at_eof:
+                return
+            if pos == 0:
+                window *= 2
+
+    def may_need_more(self, text, pos, end, tt):
+        """Whether the token at pos could match differently with more text"""
+        if end == len(text):
+            return tt in self.SPANNING_TYPES
+        ch = text[pos]
+        if ch == '"':
+            return tt != 'STRING_LITERAL'
+        if ch == '/':
+            return text.startswith('/*', pos) and tt != 'COMMENT_MULTI'
+        if ch == "'":
+            return tt != 'CHAR_LITERAL' and len(text) - pos <= self.analyzer.STREAM_MARGIN + 1
+        return False
+
+    def ensure_states(self, upto):
+        """Compute the resume points of lines up to upto, from the last one known"""
+        known = len(self.resume_lines)
+        if known >= upto:
+            return
+        if known == 0:
+            self.resume_lines.append(1)
+            self.resume_columns.append(0)
+            known = 1
+        lines = self.resume_lines
+        columns = self.resume_columns
+        line = lines[-1]
+        column = columns[-1]
+        window = self.WINDOW_LINES
+        last_line = self.line_count()
+
+        # Same windowing as segments(), with finditer doing the scanning
+        while len(lines) < upto:
+            end_line = min(line + window, last_line)
+            at_eof = end_line >= last_line
+            text = self.editor.get(f'{line}.{column}', 'end-1c' if at_eof else f'{end_line}.0')
+            pos = 0
+            for m in self.state_pattern.finditer(text):
+                tt = m.lastgroup
+                start, end = m.span()
+                if tt != 'BULK' and not at_eof and self.may_need_more(text, start, end, tt):
+                    break
+                newlines = text.count('\n', start, end)
+                if newlines:
+                    if tt == 'BULK' or tt == 'OTHER':
+                        # Every line start in between is a token boundary
+                        first = max(line, len(lines)) + 1
+                        lines.extend(range(first, line + newlines + 1))
+                        columns.extend(bytes(line + newlines + 1 - first))
+                    else:
+                        last_newline = text.rfind('\n', 0, start)
+                        token_column = start - last_newline - 1 if last_newline >= 0 else column + start
+                        for k in range(1, newlines + 1):
+                            if line + k <= len(lines):
+                                continue
+                            if k == newlines and text[end - 1] == '\n':
+                                lines.append(line + k)
+                                columns.append(0)
+                            else:
+                                # Line starts inside this token: resume from its start
+                                lines.append(line)
+                                columns.append(token_column)
+                    line += newlines
+                pos = end
+            if at_eof:
+                break
+            if pos == 0:
+                window *= 2
+                continue
+            last_newline = text.rfind('\n', 0, pos)
+            column = pos - last_newline - 1 if last_newline >= 0 else column + pos
+
+    def visible_lines(self):
+        first = int(self.editor.index('@0,0').split('.')[0])
+        last = int(self.editor.index(f'@0,{self.editor.winfo_height()}').split('.')[0])
+        return first, last
+
+    def highlight_view(self):
+        """Tag the tokens of the visible lines plus MARGIN"""
+        self.after_id = None
+        first_visible, last_visible = self.visible_lines()
+        if self.tagged and self.tagged[0] <= first_visible and last_visible <= self.tagged[1]:
+            return
+        first = max(1, first_visible - self.MARGIN)
+        last = min(self.line_count(), last_visible + self.MARGIN)
+
+        self.ensure_states(first)
+        keywords = self.analyzer.keywords
+        tags = self.TAGS
+        ranges = {tag: [] for tag in set(tags.values())}
+        for tt, value, line, column in self.segments(self.resume_lines[first - 1],
+                                                     self.resume_columns[first - 1],
+                                                     self.analyzer.master_pattern.match, last):
+            if tt == 'IDENTIFIER' and value in keywords:
+                tt = 'KEYWORD'
+            tag = tags.get(tt)
+            if tag is None:
+                continue
+            newlines = value.count('\n')
+            if newlines:
+                end = f'{line + newlines}.{len(value) - value.rfind(chr(10)) - 1}'
+            else:
+                end = f'{line}.{column + len(value)}'
+            ranges[tag].extend((f'{line}.{column}', end))
+
+        for tag, indices in ranges.items():
+            self.editor.tag_remove(tag, f'{first}.0', f'{last + 1}.0')
+            if indices:
+                self.editor.tag_add(tag, *indices)
+        self.tagged = (first, last)
+
+class LexicalAnalyzerGUI:
+    # Edits up to this many characters are re-lexed in place, bigger
+    # changes (or the first analysis) run on a worker thread
+    INCREMENTAL_LIMIT = 64 * 1024
+    # How often (ms) the GUI polls a running analysis for progress
+    POLL_INTERVAL = 50
+    # Delay (ms) that coalesces scroll and edit events into one gutter redraw
+    GUTTER_DELAY = 15
+    # Hunks listed (and highlighted) in the Token Diff tab
+    DIFF_HUNK_LIMIT = 2000
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Lexical Analyzer - Compilers")
+        self.root.geometry("1200x800")
+        self.root.configure(bg="#0f1419")
+        
+        # Initialize analyzer and CFG
+        self.analyzer = LexicalAnalyzer()
+        # Keeps the last token stream so re-analysis only re-lexes edits
+        self.incremental = IncrementalLexer(self.analyzer)
+        # Reloaded files and unchanged code are answered from here
+        self.token_cache = TokenCache(self.analyzer)
+        # Background analysis in progress, if any
+        self.analysis_job = None
+        # Pending gutter redraw (after id), if any
+        self.gutter_after = None
+        # Last LexerProfile shown in the Performance tab, and the run in progress
+        self.profile = None
+        self.profile_results = None
+        # Last TokenDiff shown in the Token Diff tab, and the run in progress
+        self.diff = None
+        self.diff_results = None
+        # self.cfg = CFGModel()
+        
+        # Setup theme
+        self.setup_theme()
+        
+        # Setup interface
+        self.setup_ui()
+        
+        # Create sample file
+        self.create_sample_file()
+    
+    def setup_theme(self):
+        # Modern blue theme colors
+        self.colors = {
+            'bg_primary': '#d9e6f2',      # Light bluish gray (main app background, a bit darker)
+            'bg_secondary': '#c0d4e8',    # Medium-light blue (panels / code background, darker for contrast)
+            'bg_tertiary': '#a9c3db',     # Mid blue-gray (interactive elements, buttons, hovers)
+            'accent': '#2b6cb0',          # Calm medium blue (accents)
+            'accent_hover': '#2c5282',    # Deeper muted blue (hover)
+            'text_primary': '#1a202c',    # Almost black-gray (primary text)
+            'text_secondary': '#2d3748',  # Dark gray-blue (secondary text)
+            'success': '#2f855a',         # Balanced green (success)
+            'warning': '#b7791f',         # Warm golden brown (warning)
+            'error': '#c53030'            # Softer deep red (error)
+        }
+
+
+
+        
+        # Configure ttk style
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        # Buttons
+        style.configure('Modern.TButton',
+                       background=self.colors['accent'],
+                       foreground='white',
+                       borderwidth=0,
+                       focuscolor='none',
+                       font=('Segoe UI', 10, 'bold'))
+        
+        style.map('Modern.TButton',
+                 background=[('active', self.colors['accent_hover']),
+                           ('pressed', self.colors['accent_hover'])])
+        
+        # Frame
+        style.configure('Modern.TFrame',
+                       background=self.colors['bg_secondary'],
+                       borderwidth=1,
+                       relief='solid',
+                       bordercolor=self.colors['bg_tertiary'])
+        
+        # Notebook (tabs)
+        style.configure('Modern.TNotebook',
+                       background=self.colors['bg_primary'],
+                       borderwidth=0)
+        
+        style.configure('Modern.TNotebook.Tab',
+                       background=self.colors['bg_tertiary'],
+                       foreground=self.colors['text_secondary'],
+                       padding=[20, 10],
+                       font=('Segoe UI', 10))
+        
+        style.map('Modern.TNotebook.Tab',
+                 background=[('selected', self.colors['accent']),
+                           ('active', self.colors['accent_hover'])],
+                 foreground=[('selected', 'white'),
+                           ('active', 'white')])
+    
+    def setup_ui(self):
+        # Header
+        self.create_header()
+        
+        # Main content with tabs
+        self.create_main_content()
+    
+    def create_header(self):
+        header_frame = tk.Frame(self.root, bg=self.colors['bg_secondary'], height=80)
+        header_frame.pack(fill='x', padx=0, pady=0)
+        header_frame.pack_propagate(False)
+        
+        # Main title
+        title_label = tk.Label(header_frame, 
+                              text="🔍 Lexical Analyzer",
+                              font=('Segoe UI', 24, 'bold'),
+                              fg=self.colors['text_primary'],
+                              bg=self.colors['bg_secondary'])
+        title_label.pack(side='left', padx=30, pady=20)
+        
+        # Subtitle
+        subtitle_label = tk.Label(header_frame,
+                                 text="Compilers - Token Analysis",
+                                 font=('Segoe UI', 12),
+                                 fg=self.colors['text_secondary'],
+                                 bg=self.colors['bg_secondary'])
+        subtitle_label.pack(side='left', padx=(0, 30), pady=(30, 10))
+    
+    def create_main_content(self):
+        # Notebook for tabs
+        self.notebook = ttk.Notebook(self.root, style='Modern.TNotebook')
+        self.notebook.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        # Tab 1: Code editor
+        self.create_editor_tab()
+        
+        # Tab 2: Token analysis
+        self.create_analysis_tab()
+        
+        # Tab 3: Token classification
+        self.create_classification_tab()
+        
+        # Tab 4: Lexer performance
+        self.create_performance_tab()
+        
+        # Tab 5: Token diff
+        self.create_diff_tab()
+        
+        # Tab 6: CFG Grammar
+        # self.create_grammar_tab()
+    
+    def create_editor_tab(self):
+        editor_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+        self.notebook.add(editor_frame, text="📝 Code Editor")
+        
+        # Frame for buttons
+        button_frame = tk.Frame(editor_frame, bg=self.colors['bg_secondary'])
+        button_frame.pack(fill='x', padx=20, pady=20)
+        
+        # Action buttons
+        ttk.Button(button_frame, text="📁 Open File", 
+                  command=self.load_file, 
+                  style='Modern.TButton').pack(side='left', padx=(0, 10))
+        
+        ttk.Button(button_frame, text="📄 Example", 
+                  command=self.load_sample, 
+                  style='Modern.TButton').pack(side='left', padx=10)
+        
+        ttk.Button(button_frame, text="🗑️ Clear", 
+                  command=self.clear_editor, 
+                  style='Modern.TButton').pack(side='left', padx=10)
+        
+        self.analyze_button = ttk.Button(button_frame, text="🔍 Analyze", 
+                                         command=self.analyze_code, 
+                                         style='Modern.TButton')
+        self.analyze_button.pack(side='right', padx=(10, 0))
+        
+        self.cancel_button = ttk.Button(button_frame, text="⏹ Cancel", 
+                                        command=self.cancel_analysis, 
+                                        style='Modern.TButton')
+        self.cancel_button.pack(side='right', padx=10)
+        self.cancel_button.state(['disabled'])
+        
+        # Text editor with line numbers
+        editor_container = tk.Frame(editor_frame, bg=self.colors['bg_secondary'])
+        editor_container.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        # Frame for line numbers
+        line_frame = tk.Frame(editor_container, bg=self.colors['bg_tertiary'], width=50)
+        line_frame.pack(side='left', fill='y')
+        line_frame.pack_propagate(False)
+        
+        # Only the numbers of the visible lines are drawn on this canvas
+        self.line_numbers = tk.Canvas(line_frame,
+                                      bg=self.colors['bg_tertiary'],
+                                      border=0,
+                                      highlightthickness=0)
+        self.line_numbers.pack(fill='both', expand=True)
+        
+        # Main editor
+        self.code_editor = scrolledtext.ScrolledText(editor_container,
+                                                    font=('Consolas', 11),
+                                                    bg=self.colors['bg_primary'],
+                                                    fg=self.colors['text_primary'],
+                                                    insertbackground=self.colors['accent'],
+                                                    selectbackground=self.colors['accent'],
+                                                    selectforeground='white',
+                                                    wrap='none',
+                                                    border=0,
+                                                    highlightthickness=1,
+                                                    highlightcolor=self.colors['accent'],
+                                                    highlightbackground=self.colors['bg_tertiary'])
+        self.code_editor.pack(side='right', fill='both', expand=True)
+        
+        # Token colors, applied to the visible lines only
+        self.highlighter = SyntaxHighlighter(self.root, self.code_editor, self.analyzer, self.colors)
+        
+        # Redraw the gutter and the colors when the view scrolls, the text
+        # changes or the editor is resized
+        self.code_editor.configure(yscrollcommand=self.on_editor_yview)
+        self.code_editor.bind('<<Modified>>', self.on_editor_modified)
+        self.code_editor.bind('<Configure>', self.update_line_numbers)
+        self.code_editor.bind('<Configure>', self.highlighter.on_view_change, add='+')
+        
+        # Initial line numbers
+        self.update_line_numbers()
+    
+    def create_analysis_tab(self):
+        analysis_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+        self.notebook.add(analysis_frame, text="📊 Token Analysis")
+        
+        # Upper frame for statistics
+        stats_frame = tk.Frame(analysis_frame, bg=self.colors['bg_secondary'], height=100)
+        stats_frame.pack(fill='x', padx=20, pady=20)
+        stats_frame.pack_propagate(False)
+        
+        # Statistics labels
+        self.total_tokens_label = tk.Label(stats_frame,
+                                          text="Total Tokens: 0",
+                                          font=('Segoe UI', 14, 'bold'),
+                                          fg=self.colors['accent'],
+                                          bg=self.colors['bg_secondary'])
+        self.total_tokens_label.pack(side='left', padx=30, pady=30)
+        
+        self.analysis_status = tk.Label(stats_frame,
+                                       text="Status: Ready for analysis",
+                                       font=('Segoe UI', 12),
+                                       fg=self.colors['text_secondary'],
+                                       bg=self.colors['bg_secondary'])
+        self.analysis_status.pack(side='left', padx=30, pady=30)
+        
+        self.analysis_progress = ttk.Progressbar(stats_frame, orient='horizontal',
+                                                 length=150, mode='determinate',
+                                                 maximum=100)
+        self.analysis_progress.pack(side='left', padx=10, pady=30)
+        
+        # Jump to line
+        ttk.Button(stats_frame, text="Go",
+                  command=self.jump_to_line,
+                  style='Modern.TButton').pack(side='right', padx=(5, 30), pady=30)
+        
+        self.jump_line_entry = tk.Entry(stats_frame, width=8,
+                                        font=('Consolas', 11),
+                                        bg=self.colors['bg_primary'],
+                                        fg=self.colors['text_primary'])
+        self.jump_line_entry.pack(side='right', pady=30)
+        self.jump_line_entry.bind('<Return>', lambda e: self.jump_to_line())
+        
+        tk.Label(stats_frame,
+                 text="Line:",
+                 font=('Segoe UI', 12),
+                 fg=self.colors['text_secondary'],
+                 bg=self.colors['bg_secondary']).pack(side='right', padx=5, pady=30)
+        
+        # Token table (only the visible rows exist as Treeview items)
+        table_frame = tk.Frame(analysis_frame, bg=self.colors['bg_secondary'])
+        table_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        self.token_table = VirtualTokenTable(table_frame, self.colors)
+    
+    def create_classification_tab(self):
+        classification_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+        self.notebook.add(classification_frame, text="🏷️ Token Classification")
+        
+        # Main container with scrollbar
+        main_container = tk.Frame(classification_frame, bg=self.colors['bg_secondary'])
+        main_container.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        # Scrollable text area
+        self.classification_text = scrolledtext.ScrolledText(main_container,
+                                                           font=('Consolas', 11),
+                                                           bg=self.colors['bg_primary'],
+                                                           fg=self.colors['text_primary'],
+                                                           wrap='word',
+                                                           state='disabled',
+                                                           border=0,
+                                                           highlightthickness=1,
+                                                           highlightcolor=self.colors['accent'],
+                                                           highlightbackground=self.colors['bg_tertiary'])
+        self.classification_text.pack(fill='both', expand=True)
+    
+    def create_performance_tab(self):
+        performance_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+        self.notebook.add(performance_frame, text="⏱ Performance")
+        
+        # Frame for buttons
+        button_frame = tk.Frame(performance_frame, bg=self.colors['bg_secondary'])
+        button_frame.pack(fill='x', padx=20, pady=20)
+        
+        self.profile_button = ttk.Button(button_frame, text="⏱ Profile Code", 
+                                         command=self.profile_code, 
+                                         style='Modern.TButton')
+        self.profile_button.pack(side='left', padx=(0, 10))
+        
+        ttk.Button(button_frame, text="💾 JSON", 
+                  command=lambda: self.export_profile('json'), 
+                  style='Modern.TButton').pack(side='right', padx=(10, 0))
+        
+        ttk.Button(button_frame, text="💾 pstats", 
+                  command=lambda: self.export_profile('pstats'), 
+                  style='Modern.TButton').pack(side='right', padx=10)
+        
+        ttk.Button(button_frame, text="💾 Flamegraph", 
+                  command=lambda: self.export_profile('folded'), 
+                  style='Modern.TButton').pack(side='right', padx=10)
+        
+        # Report area
+        self.performance_text = scrolledtext.ScrolledText(performance_frame,
+                                                          font=('Consolas', 11),
+                                                          bg=self.colors['bg_primary'],
+                                                          fg=self.colors['text_primary'],
+                                                          wrap='none',
+                                                          state='disabled',
+                                                          border=0,
+                                                          highlightthickness=1,
+                                                          highlightcolor=self.colors['accent'],
+                                                          highlightbackground=self.colors['bg_tertiary'])
+        self.performance_text.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+    
+    def create_diff_tab(self):
+        diff_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+        self.notebook.add(diff_frame, text="⇄ Token Diff")
+        
+        # Frame for buttons
+        button_frame = tk.Frame(diff_frame, bg=self.colors['bg_secondary'])
+        button_frame.pack(fill='x', padx=20, pady=20)
+        
+        ttk.Button(button_frame, text="📁 Old File", 
+                  command=lambda: self.load_diff_file('old'), 
+                  style='Modern.TButton').pack(side='left', padx=(0, 10))
+        
+        ttk.Button(button_frame, text="📁 New File", 
+                  command=lambda: self.load_diff_file('new'), 
+                  style='Modern.TButton').pack(side='left', padx=10)
+        
+        ttk.Button(button_frame, text="📝 Editor as New", 
+                  command=self.copy_editor_to_diff, 
+                  style='Modern.TButton').pack(side='left', padx=10)
+        
+        self.diff_button = ttk.Button(button_frame, text="⇄ Compare", 
+                                      command=self.compare_code, 
+                                      style='Modern.TButton')
+        self.diff_button.pack(side='left', padx=10)
+        
+        # Diffs of large, very different texts settle for a near-minimal
+        # script unless asked (see tokendiff.MINIMAL_SIZE)
+        self.diff_minimal = tk.BooleanVar(value=False)
+        tk.Checkbutton(button_frame, text="Always minimal",
+                       variable=self.diff_minimal,
+                       font=('Segoe UI', 11),
+                       fg=self.colors['text_secondary'],
+                       bg=self.colors['bg_secondary'],
+                       activebackground=self.colors['bg_secondary'],
+                       selectcolor=self.colors['bg_tertiary']).pack(side='left', padx=10)
+        
+        self.diff_status = tk.Label(button_frame,
+                                    text="Load or paste two versions to compare",
+                                    font=('Segoe UI', 12),
+                                    fg=self.colors['text_secondary'],
+                                    bg=self.colors['bg_secondary'])
+        self.diff_status.pack(side='left', padx=20)
+        
+        # Old and new text side by side; changed tokens are tagged
+        texts_frame = tk.Frame(diff_frame, bg=self.colors['bg_secondary'])
+        texts_frame.pack(fill='both', expand=True, padx=20)
+        self.diff_texts = {}
+        for side in ('old', 'new'):
+            text = scrolledtext.ScrolledText(texts_frame,
+                                             font=('Consolas', 11),
+                                             bg=self.colors['bg_primary'],
+                                             fg=self.colors['text_primary'],
+                                             insertbackground=self.colors['accent'],
+                                             wrap='none',
+                                             border=0,
+                                             highlightthickness=1,
+                                             highlightcolor=self.colors['accent'],
+                                             highlightbackground=self.colors['bg_tertiary'])
+            text.pack(side='left', fill='both', expand=True, padx=(0, 10) if side == 'old' else 0)
+            text.tag_configure('diff_change', background='#f5c6c6' if side == 'old' else '#c6ecd2')
+            text.tag_configure('diff_current', background=self.colors['warning'])
+            self.diff_texts[side] = text
+        
+        # One row per hunk; selecting a row shows it in both texts
+        table_frame = tk.Frame(diff_frame, bg=self.colors['bg_secondary'])
+        table_frame.pack(fill='x', padx=20, pady=20)
+        
+        columns = ('Change', 'Old', 'New', 'Removed', 'Added')
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical')
+        scrollbar.pack(side='right', fill='y')
+        self.diff_tree = ttk.Treeview(table_frame, columns=columns, show='headings',
+                                      yscrollcommand=scrollbar.set, height=8)
+        for col in columns:
+            self.diff_tree.heading(col, text=col)
+            self.diff_tree.column(col, width=100 if col in ('Change', 'Old', 'New') else 300,
+                                  anchor='center' if col in ('Change', 'Old', 'New') else 'w')
+        self.diff_tree.pack(fill='x', expand=True)
+        scrollbar.config(command=self.diff_tree.yview)
+        self.diff_tree.tag_configure('oddrow', background=self.colors['bg_tertiary'])
+        self.diff_tree.tag_configure('evenrow', background=self.colors['bg_primary'])
+        self.diff_tree.bind('<<TreeviewSelect>>', self.on_diff_select)
+    
+    # def create_grammar_tab(self):
+    #     grammar_frame = ttk.Frame(self.notebook, style='Modern.TFrame')
+    #     self.notebook.add(grammar_frame, text="📚 CFG Grammar")
+        
+    #     # Text area for grammar
+    #     self.grammar_text = scrolledtext.ScrolledText(grammar_frame,
+    #                                                  font=('Consolas', 11),
+    #                                                  bg=self.colors['bg_primary'],
+    #                                                  fg=self.colors['text_primary'],
+    #                                                  wrap='word',
+    #                                                  state='disabled',
+    #                                                  border=0,
+    #                                                  highlightthickness=1,
+    #                                                  highlightcolor=self.colors['accent'],
+    #                                                  highlightbackground=self.colors['bg_tertiary'])
+    #     self.grammar_text.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        # Load grammar
+        # self.load_grammar()
+    
+    def on_editor_yview(self, first, last):
+        self.code_editor.vbar.set(first, last)
+        self.update_line_numbers()
+        self.highlighter.on_view_change()
+    
+    def on_editor_modified(self, event=None):
+        # <<Modified>> only fires when the flag changes, so clear it each time
+        if self.code_editor.edit_modified():
+            self.code_editor.edit_modified(False)
+            self.update_line_numbers()
+            self.highlighter.on_edit()
+    
+    def update_line_numbers(self, event=None):
+        """Schedule a gutter redraw; bursts of events share a single redraw"""
+        if self.gutter_after is None:
+            self.gutter_after = self.root.after(self.GUTTER_DELAY, self.redraw_line_numbers)
+    
+    def redraw_line_numbers(self):
+        """Draw the numbers of the visible lines only, whatever the file size"""
+        self.gutter_after = None
+        self.line_numbers.delete('all')
+        x = self.line_numbers.winfo_width() - 5
+        
+        index = self.code_editor.index('@0,0 linestart')
+        while True:
+            info = self.code_editor.dlineinfo(index)
+            if info is None:
+                break
+            self.line_numbers.create_text(x, info[1], anchor='ne',
+                                          text=index.split('.')[0],
+                                          font=('Consolas', 11),
+                                          fill=self.colors['text_secondary'])
+            next_index = self.code_editor.index(f'{index} +1line')
+            if next_index == index:
+                break
+            index = next_index
+    
+    def create_sample_file(self):
+        """Create sample file if it doesn't exist"""
+        sample_content = '''/* This is a wonderful example of the 
+lexical analyzer's functions. 
+Greetings and blessings! */
+
+int main() {
+    // Variable declarations
+    int x, y, z;
+    float pi = 3.14159;
+    char letter = 'A';
+    char message[] = "The result is %d \\n"; 
+    bool flag = true;
+
+    // Arithmetic operations
+    x = 10;
+    y = 20;
+    z = x + y * 2;
+
+    /* Multi-line comment
+       with more information */
+    
+    // Control structures
+    if (x > 0) {
+        printf(message, z);   // Print the computed result
+    } else if (x < 0) {
+        printf("x is negative \\n");
+    } else {
+        printf("x is zero \\n");
+    }
+
+    // While loop
+    int counter = 0;
+    while (counter < 5) {
+        printf("Counter: %d \\n", counter);
+        counter++;
+    }
+
+    return 0;
+}'''
+        
+        try:
+            with open('example.txt', 'w', encoding='utf-8') as f:
+                f.write(sample_content)
+            return True
+        except Exception:
+            return False
+    
+    def load_file(self):
+        filename = filedialog.askopenfilename(
+            title="Select code file",
+            filetypes=[("Text files", "*.txt"),
+                      ("C/C++ files", "*.c *.cpp *.h"),
+                      ("All files", "*.*")]
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                self.code_editor.delete('1.0', 'end')
+                self.code_editor.insert('1.0', content)
+                self.update_line_numbers()
+                self.highlighter.invalidate()
+                self.analysis_status.config(text=f"File loaded: {os.path.basename(filename)}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load file:\n{e}")
+    
+    def load_sample(self):
+        if os.path.exists('example.txt'):
+            try:
+                with open('example.txt', 'r', encoding='utf-8') as f:
+                    content = f.read()
+                self.code_editor.delete('1.0', 'end')
+                self.code_editor.insert('1.0', content)
+                self.update_line_numbers()
+                self.highlighter.invalidate()
+                self.analysis_status.config(text="Example code loaded")
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load example:\n{e}")
+        else:
+            messagebox.showwarning("Warning", "Example file does not exist")
+    
+    def clear_editor(self):
+        self.cancel_analysis()
+        self.code_editor.delete('1.0', 'end')
+        self.update_line_numbers()
+        self.highlighter.invalidate()
+        self.clear_analysis()
+        self.analysis_status.config(text="Editor cleared")
+    
+    def clear_analysis(self):
+        # Clear token table
+        self.token_table.clear()
+        self.total_tokens_label.config(text="Total Tokens: 0")
+        self.analysis_progress['value'] = 0
+        
+        # Clear classification
+        self.classification_text.config(state='normal')
+        self.classification_text.delete('1.0', 'end')
+        self.classification_text.config(state='disabled')
+    
+    def analyze_code(self):
+        code = self.code_editor.get('1.0', 'end-1c')
+        
+        if not code.strip():
+            messagebox.showwarning("Warning", "No code to analyze")
+            return
+        
+        if self.analysis_job is not None:
+            return
+        
+        try:
+            # Small edits of the last analyzed code are re-lexed in place
+            if self.incremental.text:
+                start, end, new_text = self.incremental.changed_region(code)
+                if max(end - start, len(new_text)) <= self.INCREMENTAL_LIMIT:
+                    self.incremental.edit(start, end, new_text)
+                    self.clear_analysis()
+                    self.token_table.set_source(self.incremental)
+                    self.show_analysis(self.incremental, self.analyzer.classify_tokens(self.incremental))
+                    return
+            
+            self.start_analysis_job(code)
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Error during analysis:\n{e}")
+    
+    def start_analysis_job(self, code):
+        """Lex code on a worker thread; the table fills as batches arrive"""
+        self.clear_analysis()
+        job = AnalysisJob(self.analyzer, code, self.token_cache)
+        self.analysis_job = job
+        self.token_table.set_source(job.buffer, 0)
+        self.analyze_button.state(['disabled'])
+        self.cancel_button.state(['!disabled'])
+        self.analysis_status.config(text="Status: Analyzing...")
+        self.notebook.select(1)
+        job.start()
+        self.root.after(self.POLL_INTERVAL, self.poll_analysis)
+    
+    def poll_analysis(self):
+        job = self.analysis_job
+        if job is None:
+            return
+        
+        progress = None
+        finished = None
+        try:
+            while finished is None:
+                message = job.messages.get_nowait()
+                if message[0] == 'progress':
+                    progress = message
+                else:
+                    finished = message
+        except queue.Empty:
+            pass
+        
+        if progress is not None:
+            _, scanned, found = progress
+            if self.token_table.source is not job.buffer:
+                # The job answered from the token cache with another buffer
+                self.token_table.set_source(job.buffer, found)
+            self.token_table.extend_to(found)
+            self.total_tokens_label.config(text=f"Total Tokens: {found}")
+            self.analysis_progress['value'] = 100 * scanned / max(len(job.text), 1)
+            self.analysis_status.config(text=f"Status: Analyzing... {scanned}/{len(job.text)} chars, "
+                                             f"{found} tokens")
+        
+        if finished is None:
+            self.root.after(self.POLL_INTERVAL, self.poll_analysis)
+            return
+        
+        self.analysis_job = None
+        self.analyze_button.state(['!disabled'])
+        self.cancel_button.state(['disabled'])
+        
+        if finished[0] == 'done':
+            _, incremental, classification = finished
+            self.incremental = incremental
+            self.token_table.extend_to(len(job.buffer))
+            self.analysis_progress['value'] = 100
+            self.show_analysis(job.buffer, classification)
+        elif finished[0] == 'cancelled':
+            _, scanned, found = finished
+            self.token_table.extend_to(found)
+            self.analysis_status.config(text=f"Analysis cancelled - {found} tokens in the first "
+                                             f"{scanned} chars")
+        else:
+            self.analysis_status.config(text="Status: Analysis failed")
+            messagebox.showerror("Error", f"Error during analysis:\n{finished[1]}")
+    
+    def cancel_analysis(self):
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+            self.analysis_status.config(text="Status: Cancelling...")
+    
+    def show_analysis(self, tokens, classification):
+        """Show the totals and classification of a finished analysis"""
+        # Comments are never part of the token stream
+        token_count = len(tokens)
+        self.total_tokens_label.config(text=f"Total Tokens: {token_count}")
+        self.analysis_status.config(text=f"Analysis completed - {token_count} tokens found")
+        
+        # Generate classification
+        self.update_classification(tokens, classification)
+        
+        # Switch to analysis tab
+        self.notebook.select(1)
+    
+    def jump_to_line(self):
+        try:
+            line = int(self.jump_line_entry.get())
+        except ValueError:
+            messagebox.showwarning("Warning", "Enter a line number")
+            return
+        if not self.token_table.jump_to_line(line):
+            self.analysis_status.config(text=f"No tokens on or after line {line}")
+    
+    def update_classification(self, tokens, classification=None):
+        """Update the classification tab with categorized tokens"""
+        if classification is None:
+            classification = self.analyzer.classify_tokens(tokens)
+        
+        classification_text = classification.render_report()
+        
+        # Update the text widget
+        self.classification_text.config(state='normal')
+        self.classification_text.delete('1.0', 'end')
+        self.classification_text.insert('1.0', classification_text)
+        self.classification_text.config(state='disabled')
+    
+    def profile_code(self):
+        """Profile the editor code on a worker thread and show the report"""
+        code = self.code_editor.get('1.0', 'end-1c')
+        
+        if not code.strip():
+            messagebox.showwarning("Warning", "No code to profile")
+            return
+        
+        if self.profile_results is not None:
+            return
+        
+        profile = LexerProfile(name for name, _ in self.analyzer.compiled_patterns)
+        results = queue.Queue()
+        
+        def run():
+            try:
+                self.analyzer.tokenize_profiled(code, profile)
+                results.put(('done', profile))
+            except Exception as e:
+                results.put(('error', e))
+        
+        self.profile_results = results
+        self.profile_button.state(['disabled'])
+        self.show_performance("Profiling...\n")
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(self.POLL_INTERVAL, self.poll_profile)
+    
+    def poll_profile(self):
+        try:
+            status, result = self.profile_results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.POLL_INTERVAL, self.poll_profile)
+            return
+        
+        self.profile_results = None
+        self.profile_button.state(['!disabled'])
+        if status == 'done':
+            self.profile = result
+            self.show_performance(result.render_report())
+        else:
+            self.show_performance("")
+            messagebox.showerror("Error", f"Error during profiling:\n{result}")
+    
+    def show_performance(self, report):
+        self.performance_text.config(state='normal')
+        self.performance_text.delete('1.0', 'end')
+        self.performance_text.insert('1.0', report)
+        self.performance_text.config(state='disabled')
+    
+    def export_profile(self, fmt):
+        if self.profile is None:
+            messagebox.showwarning("Warning", "Profile the code first")
+            return
+        
+        extension, label = {'json': ('.json', "JSON files"),
+                            'pstats': ('.prof', "pstats files"),
+                            'folded': ('.folded', "Folded stacks")}[fmt]
+        filename = filedialog.asksaveasfilename(
+            title="Export profile",
+            defaultextension=extension,
+            filetypes=[(label, '*' + extension), ("All files", "*.*")]
+        )
+        
+        if filename:
+            try:
+                if fmt == 'json':
+                    self.profile.write_json(filename)
+                elif fmt == 'pstats':
+                    self.profile.write_pstats(filename)
+                else:
+                    self.profile.write_folded(filename)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not export profile:\n{e}")
+    
+    def load_diff_file(self, side):
+        filename = filedialog.askopenfilename(
+            title=f"Select {side} version",
+            filetypes=[("C/C++ files", "*.c *.cpp *.h"),
+                      ("Text files", "*.txt"),
+                      ("All files", "*.*")]
+        )
+        
+        if filename:
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                self.diff_texts[side].delete('1.0', 'end')
+                self.diff_texts[side].insert('1.0', content)
+                self.diff_status.config(text=f"{side.capitalize()} file loaded: "
+                                             f"{os.path.basename(filename)}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load file:\n{e}")
+    
+    def copy_editor_to_diff(self):
+        self.diff_texts['new'].delete('1.0', 'end')
+        self.diff_texts['new'].insert('1.0', self.code_editor.get('1.0', 'end-1c'))
+    
+    def compare_code(self):
+        """Diff the old and new texts on a worker thread and list the hunks"""
+        old_text = self.diff_texts['old'].get('1.0', 'end-1c')
+        new_text = self.diff_texts['new'].get('1.0', 'end-1c')
+        
+        if not old_text.strip() and not new_text.strip():
+            messagebox.showwarning("Warning", "No code to compare")
+            return
+        
+        if self.diff_results is not None:
+            return
+        
+        results = queue.Queue()
+        minimal = self.diff_minimal.get()
+        
+        def run():
+            try:
+                results.put(('done', TokenDiff(old_text, new_text, self.analyzer, minimal)))
+            except Exception as e:
+                results.put(('error', e))
+        
+        self.diff_results = results
+        self.diff_button.state(['disabled'])
+        self.diff_status.config(text="Comparing...")
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(self.POLL_INTERVAL, self.poll_diff)
+    
+    def poll_diff(self):
+        try:
+            status, result = self.diff_results.get_nowait()
+        except queue.Empty:
+            self.root.after(self.POLL_INTERVAL, self.poll_diff)
+            return
+        
+        self.diff_results = None
+        self.diff_button.state(['!disabled'])
+        if status == 'done':
+            self.show_diff(result)
+        else:
+            self.diff_status.config(text="Comparison failed")
+            messagebox.showerror("Error", f"Error during comparison:\n{result}")
+    
+    def show_diff(self, diff):
+        self.diff = diff
+        for text in self.diff_texts.values():
+            text.tag_remove('diff_change', '1.0', 'end')
+            text.tag_remove('diff_current', '1.0', 'end')
+        self.diff_tree.delete(*self.diff_tree.get_children())
+        
+        # Token offsets are character offsets, which Tk indexes count too
+        for number, change in enumerate(diff.changes()):
+            if number == self.DIFF_HUNK_LIMIT:
+                break
+            for side, buffer in (('old', diff.old), ('new', diff.new)):
+                first, last = change[side]['start'], change[side]['end']
+                if first < last:
+                    self.diff_texts[side].tag_add('diff_change', f"1.0+{buffer.starts[first]}c",
+                                                  f"1.0+{buffer.ends[last - 1]}c")
+            self.diff_tree.insert('', 'end', iid=str(number),
+                                  values=(change['op'],
+                                          f"{change['old']['line']}:{change['old']['column']}",
+                                          f"{change['new']['line']}:{change['new']['column']}",
+                                          ' '.join(change['old']['values'][:20]),
+                                          ' '.join(change['new']['values'][:20])),
+                                  tags=('evenrow' if number % 2 == 0 else 'oddrow',))
+        
+        stats = diff.stats()
+        shown = "" if stats['hunks'] <= self.DIFF_HUNK_LIMIT else \
+                f" (first {self.DIFF_HUNK_LIMIT} listed)"
+        self.diff_status.config(text=f"{stats['hunks']} changes{shown}: "
+                                     f"-{stats['deleted']} +{stats['inserted']} tokens, "
+                                     f"{stats['equal']} equal "
+                                     f"({(diff.lex_seconds + diff.diff_seconds) * 1000:.0f} ms)")
+    
+    def on_diff_select(self, event=None):
+        selection = self.diff_tree.selection()
+        if self.diff is None or not selection:
+            return
+        old_start, old_end, new_start, new_end = self.diff.hunks[int(selection[0])]
+        for side, buffer, first, last in (('old', self.diff.old, old_start, old_end),
+                                          ('new', self.diff.new, new_start, new_end)):
+            text = self.diff_texts[side]
+            text.tag_remove('diff_current', '1.0', 'end')
+            line, column = TokenDiff.anchor(buffer, first)
+            if first < last:
+                text.tag_add('diff_current', f"1.0+{buffer.starts[first]}c",
+                             f"1.0+{buffer.ends[last - 1]}c")
+            text.see(f"{line}.{column - 1}")
+    
+    # def load_grammar(self):
+    #     grammar_text = self.cfg.get_grammar_text()
+    #     self.grammar_text.config(state='normal')
+    #     self.grammar_text.delete('1.0', 'end')
+    #     self.grammar_text.insert('1.0', grammar_text)
+    #     self.grammar_text.config(state='disabled')
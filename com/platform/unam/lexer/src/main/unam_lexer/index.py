@@ -0,0 +1,362 @@
+"""Persistent inverted index of identifiers, keywords and literals across a source tree"""
+
+import os
+import gc
+import marshal
+import tempfile
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+
+from .analyzer import LexicalAnalyzer, UnknownInputError
+from .tokens import TokenBuffer, TokenStatistics
+
+# Token categories worth looking up; operators and punctuation are not indexed
+INDEXED_CATEGORIES = ('keywords', 'identifiers', 'constants', 'literals')
+
+def encode_postings(positions):
+    """Varint bytes for a flat [line, column, line, column, ...] list in token order.
+
+    Stores the count, then per posting the line delta and the column (as a
+    delta too when the line did not change), so most postings take 2 bytes.
+    """
+    out = bytearray()
+    append = out.append
+    values = [len(positions) // 2]
+    previous_line = 0
+    previous_column = 0
+    for i in range(0, len(positions), 2):
+        line = positions[i]
+        column = positions[i + 1]
+        if line == previous_line:
+            values.append(0)
+            values.append(column - previous_column)
+        else:
+            values.append(line - previous_line)
+            values.append(column)
+        previous_line = line
+        previous_column = column
+    for value in values:
+        while value >= 0x80:
+            append(value & 0x7F | 0x80)
+            value >>= 7
+        append(value)
+    return bytes(out)
+
+def decode_postings(data):
+    """[(line, column), ...] from encode_postings bytes"""
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = 0
+            shift = 0
+    positions = []
+    line = 0
+    column = 0
+    for i in range(1, len(values), 2):
+        if values[i]:
+            line += values[i]
+            column = values[i + 1]
+        else:
+            column += values[i + 1]
+        positions.append((line, column))
+    return positions
+
+def postings_count(data):
+    """Number of postings in encode_postings bytes, without decoding them"""
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+        shift += 7
+    return 0
+
+def file_postings(analyzer, text):
+    """{(value, type): postings bytes} of the indexed tokens of a text"""
+    tokens = analyzer.tokenize_buffer(text)
+    names = TokenBuffer.TYPE_NAMES
+    category_of = TokenStatistics.CATEGORY_OF_TYPE
+    indexed = [category_of.get(name) in INDEXED_CATEGORIES for name in names]
+    groups = {}
+    for code, start, end, line, column in zip(tokens.type_codes, tokens.starts, tokens.ends,
+                                              tokens.lines, tokens.columns):
+        if indexed[code]:
+            key = (text[start:end], names[code])
+            positions = groups.get(key)
+            if positions is None:
+                groups[key] = [line, column]
+            else:
+                positions.append(line)
+                positions.append(column)
+    return {key: encode_postings(positions) for key, positions in groups.items()}
+
+def index_file(analyzer, path):
+    """(path, (mtime_ns, size), postings) or (path, None, error message)"""
+    try:
+        stat = os.stat(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        postings = file_postings(analyzer, text)
+    except (OSError, UnicodeDecodeError, UnknownInputError) as e:
+        return path, None, str(e)
+    return path, (stat.st_mtime_ns, stat.st_size), postings
+
+# One analyzer per index worker process, built on first use
+_index_analyzer = None
+
+def index_file_worker(job):
+    """index_file in a worker process:
+    job is (path, engine, dfa_cache_dir, dfa_fast_path, language, max_unknown)
+    """
+    global _index_analyzer
+    path, engine, dfa_cache_dir, dfa_fast_path, language, max_unknown = job
+    if _index_analyzer is None:
+        _index_analyzer = LexicalAnalyzer(engine, dfa_cache_dir, dfa_fast_path, language,
+                                          max_unknown)
+    return index_file(_index_analyzer, path)
+
+class TokenIndex:
+    """Inverted index: token value -> type -> file -> (line, column) postings.
+
+    Files are re-indexed one at a time when their mtime or size changes;
+    file_terms remembers the terms of each file so its old postings can be
+    dropped. The index is saved with marshal, terms in sorted order so
+    prefix queries bisect the loaded keys without sorting them again.
+    Indexes built with another language spec, or by an interpreter whose
+    marshal format differs, are discarded on load and reset says why.
+    """
+
+    MAGIC = b'LXIX'
+    VERSION = 1
+
+    def __init__(self, analyzer=None):
+        self.analyzer = analyzer or LexicalAnalyzer()
+        self.fingerprint = self.analyzer.fingerprint()
+        self.files = {}         # path -> [file id, mtime_ns, size]
+        self.paths = {}         # file id -> path
+        self.file_terms = {}    # file id -> [(value, type), ...]
+        self.terms = {}         # value -> {type: {file id: postings}}
+        self.next_id = 0
+        self.sorted_values = None
+        self.reset = None       # why load started a new index instead of reading the file
+
+    def __len__(self):
+        return len(self.files)
+
+    # -- updates --------------------------------------------------------------------
+
+    def is_current(self, path, stat=None):
+        entry = self.files.get(path)
+        if entry is None:
+            return False
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return False
+        return entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size
+
+    def add(self, path, signature, postings):
+        """Replace the postings of path; signature is (mtime_ns, size)"""
+        self.remove(path)
+        file_id = self.next_id
+        self.next_id += 1
+        self.files[path] = [file_id, signature[0], signature[1]]
+        self.paths[file_id] = path
+        self.file_terms[file_id] = list(postings)
+        terms = self.terms
+        for (value, token_type), data in postings.items():
+            by_type = terms.get(value)
+            if by_type is None:
+                by_type = terms[value] = {}
+                self.sorted_values = None
+            by_file = by_type.get(token_type)
+            if by_file is None:
+                by_file = by_type[token_type] = {}
+            by_file[file_id] = data
+
+    def remove(self, path):
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return False
+        file_id = entry[0]
+        del self.paths[file_id]
+        terms = self.terms
+        for value, token_type in self.file_terms.pop(file_id):
+            by_type = terms[value]
+            by_file = by_type[token_type]
+            del by_file[file_id]
+            if not by_file:
+                del by_type[token_type]
+                if not by_type:
+                    del terms[value]
+                    self.sorted_values = None
+        return True
+
+    def update_file(self, path):
+        """Re-index path if it changed; returns True if it was lexed"""
+        path = os.path.abspath(path)
+        if self.is_current(path):
+            return False
+        path, signature, postings = index_file(self.analyzer, path)
+        if signature is None:
+            raise OSError(postings)
+        self.add(path, signature, postings)
+        return True
+
+    def update(self, paths, jobs=1, roots=None):
+        """Bring the index in line with paths: lex changed and new files, drop
+        the ones no longer listed under roots (any file if roots is None).
+        Returns {'indexed', 'removed', 'unchanged', 'errors'}
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        wanted = set(paths)
+        if roots is not None:
+            roots = [os.path.abspath(root) for root in roots]
+        removed = [path for path in self.files if path not in wanted and
+                   (roots is None or any(path == root or path.startswith(root + os.sep)
+                                         for root in roots))]
+        for path in removed:
+            self.remove(path)
+        stale = [path for path in paths if not self.is_current(path)]
+
+        errors = []
+        if jobs > 1 and len(stale) > 1:
+            analyzer = self.analyzer
+            config = (analyzer.engine, analyzer.dfa_cache_dir, analyzer.dfa_fast_path,
+                      analyzer.language, analyzer.max_unknown)
+            chunksize = max(1, min(64, len(stale) // (jobs * 4)))
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(index_file_worker,
+                                        [(path,) + config for path in stale],
+                                        chunksize=chunksize))
+        else:
+            results = (index_file(self.analyzer, path) for path in stale)
+        for path, signature, postings in results:
+            if signature is None:
+                errors.append((path, postings))
+                self.remove(path)
+            else:
+                self.add(path, signature, postings)
+        return {'indexed': len(stale) - len(errors), 'removed': len(removed),
+                'unchanged': len(paths) - len(stale), 'errors': errors}
+
+    # -- queries --------------------------------------------------------------------
+
+    def values_with_prefix(self, prefix):
+        """Indexed values starting with prefix, in sorted order"""
+        if self.sorted_values is None:
+            self.sorted_values = sorted(self.terms)
+        values = self.sorted_values
+        result = []
+        for i in range(bisect_left(values, prefix), len(values)):
+            if not values[i].startswith(prefix):
+                break
+            result.append(values[i])
+        return result
+
+    def search(self, term, prefix=False, types=None, limit=None):
+        """[(value, type, path, line, column), ...] for an exact value or a prefix,
+        optionally only for the given token types, ordered by value, path and position
+        """
+        values = self.values_with_prefix(term) if prefix else [term]
+        hits = []
+        for value in values:
+            for token_type, by_file in sorted(self.terms.get(value, {}).items()):
+                if types and token_type not in types:
+                    continue
+                for path, file_id in sorted((self.paths[i], i) for i in by_file):
+                    for line, column in decode_postings(by_file[file_id]):
+                        hits.append((value, token_type, path, line, column))
+                        if limit and len(hits) >= limit:
+                            return hits
+        return hits
+
+    def counts(self, term, prefix=False, types=None):
+        """[(value, type, occurrences, files), ...] without decoding positions"""
+        values = self.values_with_prefix(term) if prefix else [term]
+        result = []
+        for value in values:
+            for token_type, by_file in sorted(self.terms.get(value, {}).items()):
+                if not types or token_type in types:
+                    result.append((value, token_type,
+                                   sum(postings_count(data) for data in by_file.values()),
+                                   len(by_file)))
+        return result
+
+    def get_stats(self):
+        postings = sum(len(data) for by_type in self.terms.values()
+                       for by_file in by_type.values() for data in by_file.values())
+        return {'files': len(self.files), 'terms': len(self.terms), 'postings_bytes': postings}
+
+    # -- persistence ----------------------------------------------------------------
+
+    def save(self, path):
+        """Write the index atomically (temporary file, then rename)"""
+        payload = {
+            'version': self.VERSION,
+            'fingerprint': self.fingerprint,
+            'files': self.files,
+            'file_terms': self.file_terms,
+            'next_id': self.next_id,
+            'terms': {value: self.terms[value] for value in sorted(self.terms)},
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.MAGIC)
+                marshal.dump(payload, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, analyzer=None):
+        """Index saved at path; an empty index if the file is missing, or with
+        reset set to the reason if it cannot be used (other lexer version,
+        language spec or Python version)
+        """
+        index = cls(analyzer)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return index
+        if data[:4] != cls.MAGIC:
+            raise ValueError(f"{path}: not a token index")
+        # The payload is hundreds of thousands of small dicts; collector passes
+        # while they are built would take several times longer than the unmarshalling
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            payload = marshal.loads(memoryview(data)[4:])
+        except (EOFError, TypeError, ValueError):
+            # marshal data is only readable by the Python version that wrote it
+            payload = None
+        finally:
+            if collecting:
+                gc.enable()
+        if not isinstance(payload, dict):
+            index.reset = f"{path} is unreadable or was written by another Python version"
+            return index
+        if payload.get('version') != cls.VERSION or payload.get('fingerprint') != index.fingerprint:
+            index.reset = f"{path} was built by another lexer version or language"
+            return index
+        index.files = payload['files']
+        index.paths = {entry[0]: file_path for file_path, entry in index.files.items()}
+        index.file_terms = payload['file_terms']
+        index.next_id = payload['next_id']
+        index.terms = payload['terms']
+        index.sorted_values = list(index.terms)
+        return index
@@ -0,0 +1,254 @@
+"""Language profiles: the token specification of each supported language"""
+
+import json
+import hashlib
+import os
+
+C_KEYWORDS = (
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do',
+    'double', 'else', 'enum', 'extern', 'float', 'for', 'goto', 'if', 'inline',
+    'int', 'long', 'register', 'restrict', 'return', 'short', 'signed', 'sizeof',
+    'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void',
+    'volatile', 'while',
+)
+
+C_OPERATORS = (
+    '=', '+', '-', '*', '/', '%', '++', '--',
+    '==', '!=', '<', '>', '<=', '>=',
+    '&&', '||', '!',
+    '&', '|', '^', '~', '<<', '>>',
+    '+=', '-=', '*=', '/=', '%=',
+)
+
+C_PUNCTUATORS = ('(', ')', '{', '}', '[', ']', ';', ',', '.', ':', '#')
+
+# Tokens common to the C family profiles below (ASCII identifiers, C numbers)
+C_FAMILY_PATTERNS = {
+    'STRING_LITERAL': r'"([^"\\\n]|\\.|\\\n)*"',
+    'CHAR_LITERAL': r"'([^'\\\n]|\\[0-7][0-7]?[0-7]?|\\x[0-9a-fA-F][0-9a-fA-F]?|\\[^\n])'",
+    'FLOAT_CONSTANT': r'([0-9]+\.[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?[fFlL]?|[0-9]+[eE][+-]?[0-9]+[fFlL]?',
+    'INT_CONSTANT': r'(0[xX][0-9a-fA-F]+|[0-9]+)[uUlL]*',
+    'IDENTIFIER': r'[a-zA-Z_][a-zA-Z0-9_]*',
+    'COMMENT_SINGLE': r'//[^\n]*',
+    'COMMENT_MULTI': r'/\*.*?\*/',
+    'SPECIAL_SYMBOL': r'["\'\\]',
+    'WHITESPACE': r'[ \t\r\f\v]+',
+    'NEWLINE': r'\n',
+}
+
+def c_family_patterns(operator, punctuator, **overrides):
+    """token_patterns in the usual order from C_FAMILY_PATTERNS"""
+    patterns = dict(C_FAMILY_PATTERNS, OPERATOR=operator, PUNCTUATOR=punctuator, **overrides)
+    order = ('STRING_LITERAL', 'CHAR_LITERAL', 'FLOAT_CONSTANT', 'INT_CONSTANT', 'IDENTIFIER',
+             'COMMENT_SINGLE', 'COMMENT_MULTI', 'OPERATOR', 'PUNCTUATOR', 'SPECIAL_SYMBOL',
+             'WHITESPACE', 'NEWLINE')
+    return [(name, patterns[name]) for name in order]
+
+# Built-in profiles as plain data; LanguageProfile.get builds them on first use
+LANGUAGE_PROFILES = {
+    # The course dialect: C keywords, identifiers with accents/tildes
+    'sample': {
+        'name': 'sample',
+        'description': "Course sample dialect: C keywords, accented identifiers",
+        'extensions': ['.txt', '.c', '.h'],
+        'keywords': C_KEYWORDS,
+        'operators': C_OPERATORS,
+        'punctuators': C_PUNCTUATORS,
+        'special_symbols': ('"', "'", '\\'),
+        'token_patterns': [
+            # String literals
+            ('STRING_LITERAL', r'"([^"\\]|\\.)*"'),
+            ('CHAR_LITERAL', r"'([^'\\]|\\.)'"),
+
+            # Numbers
+            ('FLOAT_CONSTANT', r'\d+\.\d*([eE][+-]?\d+)?'),
+            ('INT_CONSTANT', r'\d+'),
+
+            # Identifiers and keywords (including accents/tildes)
+            ('IDENTIFIER', r'[a-zA-ZáéíóúÁÉÍÓÚñÑüÜ_][a-zA-ZáéíóúÁÉÍÓÚñÑüÜ0-9_]*'),
+
+            # Comments (single-line made flexible, multi-line handled with DOTALL)
+            ('COMMENT_SINGLE', r'//\s*[^\n]*'),
+            ('COMMENT_MULTI', r'/\*.*?\*/'),
+
+            # Operators (ordered by descending length to avoid conflicts)
+            ('OPERATOR', r'(\+\+|--|==|!=|<=|>=|&&|\|\||<<|>>|\+=|-=|\*=|/=|%=|[+\-*/%=<>&|^~!])'),
+
+            # Punctuators
+            ('PUNCTUATOR', r'[(){}\[\];,.:#]'),
+
+            # Special symbols (quotes and escape)
+            ('SPECIAL_SYMBOL', r'["\'\\]'),
+
+            # Whitespace (will be ignored)
+            ('WHITESPACE', r'[ \t]+'),
+
+            # Newline (we will ignore this token too)
+            ('NEWLINE', r'\n'),
+        ],
+        'string_prefix': r'"([^"\\]|\\.)*',
+        'lookahead': 4,
+    },
+    'c': {
+        'name': 'c',
+        'description': "C11: hex and suffixed numbers, all C operators",
+        'extensions': ['.c', '.h'],
+        'keywords': C_KEYWORDS + ('_Alignas', '_Alignof', '_Atomic', '_Bool', '_Complex',
+                                  '_Generic', '_Imaginary', '_Noreturn', '_Static_assert',
+                                  '_Thread_local'),
+        'operators': C_OPERATORS + ('->', '<<=', '>>=', '&=', '|=', '^=', '?'),
+        'punctuators': C_PUNCTUATORS + ('...',),
+        'special_symbols': ('"', "'", '\\'),
+        'token_patterns': c_family_patterns(
+            r'(<<=|>>=|->|\+\+|--|==|!=|<=|>=|&&|\|\||<<|>>|\+=|-=|\*=|/=|%=|&=|\|=|\^=|[+\-*/%=<>&|^~!?])',
+            r'(\.\.\.|[(){}\[\];,.:#])'),
+        'string_prefix': r'"([^"\\\n]|\\.|\\\n)*',
+        'lookahead': 6,
+    },
+    'cpp': {
+        'name': 'cpp',
+        'description': "C++20 keywords and operators (no raw strings or digit separators)",
+        'extensions': ['.cpp', '.cc', '.cxx', '.hpp', '.hh', '.h'],
+        'keywords': C_KEYWORDS + (
+            'alignas', 'alignof', 'and', 'and_eq', 'asm', 'bitand', 'bitor', 'bool',
+            'catch', 'char8_t', 'char16_t', 'char32_t', 'class', 'compl', 'concept',
+            'consteval', 'constexpr', 'constinit', 'const_cast', 'co_await', 'co_return',
+            'co_yield', 'decltype', 'delete', 'dynamic_cast', 'explicit', 'export', 'false',
+            'friend', 'mutable', 'namespace', 'new', 'noexcept', 'not', 'not_eq', 'nullptr',
+            'operator', 'or', 'or_eq', 'private', 'protected', 'public', 'reinterpret_cast',
+            'requires', 'static_assert', 'static_cast', 'template', 'this', 'thread_local',
+            'throw', 'true', 'try', 'typeid', 'typename', 'using', 'virtual', 'wchar_t',
+            'xor', 'xor_eq'),
+        'operators': C_OPERATORS + ('->', '->*', '.*', '::', '<=>', '<<=', '>>=', '&=', '|=',
+                                    '^=', '?'),
+        'punctuators': C_PUNCTUATORS + ('...',),
+        'special_symbols': ('"', "'", '\\'),
+        'token_patterns': c_family_patterns(
+            r'(<=>|<<=|>>=|->\*|->|\.\*|::|\+\+|--|==|!=|<=|>=|&&|\|\||<<|>>|\+=|-=|\*=|/=|%=|&=|\|=|\^=|[+\-*/%=<>&|^~!?])',
+            r'(\.\.\.|[(){}\[\];,.:#])'),
+        'string_prefix': r'"([^"\\\n]|\\.|\\\n)*',
+        'lookahead': 6,
+    },
+    'java': {
+        'name': 'java',
+        'description': "Java-like: $ in identifiers, _ in numbers, >>> and @",
+        'extensions': ['.java'],
+        'keywords': (
+            'abstract', 'assert', 'boolean', 'break', 'byte', 'case', 'catch', 'char',
+            'class', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+            'extends', 'false', 'final', 'finally', 'float', 'for', 'goto', 'if',
+            'implements', 'import', 'instanceof', 'int', 'interface', 'long', 'native',
+            'new', 'null', 'package', 'permits', 'private', 'protected', 'public', 'record',
+            'return', 'sealed', 'short', 'static', 'strictfp', 'super', 'switch',
+            'synchronized', 'this', 'throw', 'throws', 'transient', 'true', 'try', 'var',
+            'void', 'volatile', 'while', 'yield'),
+        'operators': ('=', '+', '-', '*', '/', '%', '++', '--', '==', '!=', '<', '>', '<=',
+                      '>=', '&&', '||', '!', '&', '|', '^', '~', '<<', '>>', '>>>', '+=',
+                      '-=', '*=', '/=', '%=', '&=', '|=', '^=', '<<=', '>>=', '>>>=', '->',
+                      '::', '?'),
+        'punctuators': ('(', ')', '{', '}', '[', ']', ';', ',', '.', ':', '@', '...'),
+        'special_symbols': ('"', "'", '\\'),
+        'token_patterns': c_family_patterns(
+            r'(>>>=|<<=|>>=|>>>|->|::|\+\+|--|==|!=|<=|>=|&&|\|\||<<|>>|\+=|-=|\*=|/=|%=|&=|\|=|\^=|[+\-*/%=<>&|^~!?])',
+            r'(\.\.\.|[(){}\[\];,.:@])',
+            STRING_LITERAL=r'"([^"\\\n]|\\.)*"',
+            CHAR_LITERAL=r"'([^'\\\n]|\\uu?u?u?[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F]|\\[0-7][0-7]?[0-7]?|\\[^\n])'",
+            FLOAT_CONSTANT=r'([0-9][0-9_]*\.[0-9_]*|\.[0-9][0-9_]*)([eE][+-]?[0-9]+)?[fFdD]?|[0-9][0-9_]*([eE][+-]?[0-9]+[fFdD]?|[fFdD])',
+            INT_CONSTANT=r'(0[xX][0-9a-fA-F_]+|0[bB][01_]+|[0-9][0-9_]*)[lL]?',
+            IDENTIFIER=r'[a-zA-Z_$][a-zA-Z0-9_$]*'),
+        'string_prefix': r'"([^"\\\n]|\\.)*',
+        # The longest char literal, '\uuuu0041', ends 10 chars past a lone "'";
+        # Java allows more u's but the pattern stops at four to keep this bound
+        'lookahead': 10,
+    },
+}
+
+DEFAULT_LANGUAGE = 'sample'
+
+class LanguageProfile:
+    """Declarative lexer definition used by LexicalAnalyzer.
+
+    token_patterns are tried in order and use the usual token type names;
+    keywords turn IDENTIFIER tokens into KEYWORD and punctuators turn
+    SPECIAL_SYMBOL tokens into PUNCTUATOR. Patterns listed in dotall let
+    '.' match newlines. lookahead is how far past its end a match can
+    depend on the text (an unterminated string or comment aside), which is
+    what the streaming scanners wait for.
+
+    Patterns stay within the regex subset PatternParser supports, strings
+    start with '"', char literals with "'" and comments with '/': the DFA,
+    the streaming and incremental scanners and the highlighter rely on it.
+    """
+
+    # Profiles already built, by name or file path
+    _loaded = {}
+
+    def __init__(self, name, token_patterns, keywords=(), operators=(), punctuators=(),
+                 special_symbols=(), dotall=('COMMENT_MULTI',), string_prefix=r'"([^"\\]|\\.)*',
+                 lookahead=4, extensions=(), description=''):
+        self.name = name
+        self.description = description
+        self.extensions = tuple(extensions)
+        self.keywords = frozenset(keywords)
+        self.operators = frozenset(operators)
+        self.punctuators = frozenset(punctuators)
+        self.special_symbols = frozenset(special_symbols)
+        self.token_patterns = [(token_type, pattern) for token_type, pattern in token_patterns]
+        self.dotall = frozenset(dotall)
+        self.string_prefix = string_prefix
+        self.lookahead = lookahead
+        self.hash = None
+
+    @classmethod
+    def get(cls, name):
+        """A built-in profile by name, or a profile JSON file by path"""
+        profile = cls._loaded.get(name)
+        if profile is None:
+            if name in LANGUAGE_PROFILES:
+                profile = cls.from_dict(LANGUAGE_PROFILES[name])
+            elif os.path.isfile(name):
+                profile = cls.load(name)
+            else:
+                raise ValueError(f"Unknown language profile '{name}', expected one of "
+                                 f"{tuple(LANGUAGE_PROFILES)} or a profile file")
+            cls._loaded[name] = profile
+        return profile
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self):
+        """Plain-data form, the JSON profile file format"""
+        return {
+            'name': self.name,
+            'description': self.description,
+            'extensions': list(self.extensions),
+            'keywords': sorted(self.keywords),
+            'operators': sorted(self.operators),
+            'punctuators': sorted(self.punctuators),
+            'special_symbols': sorted(self.special_symbols),
+            'token_patterns': [list(item) for item in self.token_patterns],
+            'dotall': sorted(self.dotall),
+            'string_prefix': self.string_prefix,
+            'lookahead': self.lookahead,
+        }
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def spec_hash(self):
+        """Hash of everything that decides the token output (not name or description)"""
+        if self.hash is None:
+            spec = self.to_dict()
+            for key in ('name', 'description', 'extensions', 'operators', 'special_symbols'):
+                del spec[key]
+            data = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+            self.hash = hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+        return self.hash
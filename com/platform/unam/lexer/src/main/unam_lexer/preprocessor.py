@@ -0,0 +1,297 @@
+"""Preprocessor directives, include resolution and the include graph"""
+
+import os
+import re
+import json
+from bisect import bisect_left
+
+from .analyzer import LexicalAnalyzer
+from .tokens import TokenBuffer
+from .utf8 import sniff_file
+
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp', '.hxx', '.inc')
+
+class Directive:
+    """A preprocessor line: name ('include', 'define', ...), the text after
+    it with line continuations joined, its line and token range [first, last)
+    """
+    __slots__ = ('name', 'argument', 'line', 'first', 'last', 'target')
+
+    def __init__(self, name, argument, line, first, last):
+        self.name = name
+        self.argument = argument
+        self.line = line
+        self.first = first
+        self.last = last
+        self.target = None      # resolved path of an #include
+
+    def include_name(self):
+        """(header name, angled) of an #include, or None if it names no header"""
+        m = re.match(r'\s*(?:<([^>\n]+)>|"([^"\n]+)")', self.argument)
+        if m is None:
+            return None
+        return (m.group(1), True) if m.group(1) is not None else (m.group(2), False)
+
+class SourceFile:
+    """One file, lexed once per run and shared by every unit that includes it"""
+
+    def __init__(self, path, tokens, directives, size, skipped=None):
+        self.path = path
+        self.tokens = tokens
+        self.directives = directives
+        self.size = size
+        self.skipped = skipped  # why a file was not lexed (looks binary, unreadable)
+        self.guard = self.find_guard()
+        self.missing = []       # (line, argument) of includes that did not resolve
+
+    def includes(self):
+        return [d for d in self.directives if d.name == 'include']
+
+    def find_guard(self):
+        """'#pragma once', the macro of an #ifndef/#define/#endif guard
+        wrapping the whole file, or None
+        """
+        directives = self.directives
+        for d in directives:
+            if d.name == 'pragma' and d.argument.split()[:1] == ['once']:
+                return '#pragma once'
+        if len(directives) < 3:
+            return None
+        first, second, last = directives[0], directives[1], directives[-1]
+        if first.first != 0 or last.name != 'endif' or last.last != len(self.tokens):
+            return None
+        # The final #endif must close the opening conditional, not a later one
+        depth = 0
+        for i, d in enumerate(directives):
+            if d.name in ('if', 'ifdef', 'ifndef'):
+                depth += 1
+            elif d.name == 'endif':
+                depth -= 1
+                if depth == 0:
+                    if i != len(directives) - 1:
+                        return None
+                    break
+        if first.name == 'ifndef':
+            macro = first.argument.split()[:1]
+        elif first.name == 'if':
+            m = re.match(r'\s*!\s*defined\s*\(?\s*(\w+)', first.argument)
+            macro = [m.group(1)] if m else []
+        else:
+            return None
+        if macro and second.name == 'define' and second.argument.split()[:1] == macro:
+            return macro[0]
+        return None
+
+class TranslationUnit:
+    """A file with its includes expanded, as (SourceFile, first, last) spans
+    over the shared token buffers; directive lines are left out
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.spans = []
+        self.files = []         # every file included, in first-inclusion order
+        self.missing = []       # (path, line, argument) of unresolved includes
+        self.cycles = []        # (path, line, target) of includes skipped as cyclic
+        self.skipped = []       # (path, line, target, reason) of includes not lexed
+        self.bytes = 0          # size as a compiler reads it, headers counted per expansion
+
+    def __len__(self):
+        return sum(last - first for _, first, last in self.spans)
+
+    def rows(self):
+        """Yield (path, type, value, line, column) of every token in order"""
+        for source, first, last in self.spans:
+            path = source.path
+            for row in source.tokens.row_range(first, last):
+                yield (path,) + row
+
+    def dependencies(self):
+        return [self.source.path] + [source.path for source in self.files]
+
+class Preprocessor:
+    """Recognizes directives on top of a LexicalAnalyzer and expands #include.
+
+    Quoted includes are looked up next to the including file, then in
+    include_paths; angled ones in include_paths, then system_paths. Each
+    file is read and lexed once per Preprocessor, however many units
+    include it, and a guarded header (#pragma once or a whole-file
+    #ifndef guard) is expanded at most once per unit. Files that look
+    binary or cannot be read are not lexed. Conditionals and macros are
+    not evaluated.
+    """
+
+    DIRECTIVE_START = re.compile(r'^[ \t]*#', re.MULTILINE)
+
+    def __init__(self, analyzer=None, include_paths=(), system_paths=(), cache=None):
+        self.analyzer = analyzer or LexicalAnalyzer()
+        self.include_paths = list(include_paths)
+        self.system_paths = list(system_paths)
+        self.cache = cache          # optional TokenCache shared across runs
+        self.files = {}             # real path -> SourceFile
+        self.stats = {'files_lexed': 0, 'bytes_lexed': 0, 'include_hits': 0}
+
+    def load(self, path):
+        """SourceFile for path, lexed on first use"""
+        key = os.path.realpath(path)
+        source = self.files.get(key)
+        if source is not None:
+            self.stats['include_hits'] += 1
+            return source
+
+        try:
+            reason = sniff_file(path)
+            if reason is None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            reason = str(e)
+        if reason is not None:
+            source = SourceFile(os.path.normpath(path), TokenBuffer(''), [], 0, reason)
+            self.files[key] = source
+            return source
+        tokens = self.cache.tokenize(text) if self.cache else self.analyzer.tokenize_buffer(text)
+        source = SourceFile(os.path.normpath(path), tokens, self.find_directives(text, tokens),
+                            len(text))
+        self.files[key] = source
+        self.stats['files_lexed'] += 1
+        self.stats['bytes_lexed'] += len(text)
+
+        directory = os.path.dirname(source.path)
+        for directive in source.includes():
+            header = directive.include_name()
+            if header is not None:
+                directive.target = self.resolve(header[0], header[1], directory)
+            if directive.target is None:
+                source.missing.append((directive.line, directive.argument))
+        return source
+
+    def find_directives(self, text, tokens):
+        """Directives of a lexed file: a '#' token that starts its line"""
+        directives = []
+        starts = tokens.starts
+        for m in self.DIRECTIVE_START.finditer(text):
+            offset = m.end() - 1
+            first = bisect_left(starts, offset)
+            if first >= len(tokens) or starts[first] != offset:
+                # The '#' is inside a comment or string
+                continue
+
+            # The directive runs to the end of the line, continuations included
+            end = text.find('\n', offset)
+            while end != -1 and (text[end - 1:end] == '\\' or text[end - 2:end] == '\\\r'):
+                end = text.find('\n', end + 1)
+            if end == -1:
+                end = len(text)
+            last = bisect_left(starts, end, first)
+
+            name = ''
+            argument_start = offset + 1
+            if first + 1 < last and tokens.type_name(first + 1) in ('IDENTIFIER', 'KEYWORD'):
+                name = tokens.value(first + 1)
+                argument_start = tokens.ends[first + 1]
+            argument = re.sub(r'\\\r?\n', ' ', text[argument_start:end]).strip()
+            directives.append(Directive(name, argument, tokens.lines[first], first, last))
+        return directives
+
+    def resolve(self, name, angled, directory):
+        """Path of an included header, or None"""
+        if os.path.isabs(name):
+            return name if os.path.isfile(name) else None
+        if angled:
+            candidates = self.include_paths + self.system_paths
+        else:
+            candidates = [directory] + self.include_paths + self.system_paths
+        for base in candidates:
+            path = os.path.normpath(os.path.join(base, name))
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def translation_unit(self, path):
+        """Expand the includes of path into a TranslationUnit"""
+        source = self.load(path)
+        unit = TranslationUnit(source)
+        self.expand(source, unit, [os.path.realpath(source.path)], set(), set())
+        return unit
+
+    def expand(self, source, unit, stack, expanded_once, seen):
+        unit.bytes += source.size
+        pos = 0
+        for directive in source.directives:
+            if directive.first > pos:
+                unit.spans.append((source, pos, directive.first))
+            pos = directive.last
+            if directive.name != 'include':
+                continue
+            if directive.target is None:
+                unit.missing.append((source.path, directive.line, directive.argument))
+                continue
+            header = self.load(directive.target)
+            if header.skipped:
+                unit.skipped.append((source.path, directive.line, header.path, header.skipped))
+                continue
+            key = os.path.realpath(header.path)
+            if header.guard and key in expanded_once:
+                # Also covers a guarded header reached again while expanding itself
+                continue
+            if key in stack:
+                unit.cycles.append((source.path, directive.line, header.path))
+                continue
+            if header.guard:
+                expanded_once.add(key)
+            if key not in seen:
+                seen.add(key)
+                unit.files.append(header)
+            stack.append(key)
+            self.expand(header, unit, stack, expanded_once, seen)
+            stack.pop()
+        if pos < len(source.tokens):
+            unit.spans.append((source, pos, len(source.tokens)))
+
+    # -- dependency graph -----------------------------------------------------------
+
+    def graph(self):
+        """{path: [paths it includes directly]} over every file loaded so far"""
+        return {source.path: list(dict.fromkeys(d.target for d in source.includes() if d.target))
+                for source in self.files.values()}
+
+    def graph_json(self, units=()):
+        graph = self.graph()
+        files = {}
+        for source in self.files.values():
+            files[source.path] = {
+                'bytes': source.size,
+                'tokens': len(source.tokens),
+                'guard': source.guard,
+                'includes': graph[source.path],
+                'missing': [argument for _, argument in source.missing],
+                'skipped': source.skipped,
+            }
+        return {
+            'files': files,
+            'translation_units': {unit.source.path: {'tokens': len(unit),
+                                                     'included_bytes': unit.bytes,
+                                                     'dependencies': unit.dependencies(),
+                                                     'cycles': [list(c) for c in unit.cycles]}
+                                  for unit in units},
+            'stats': dict(self.stats),
+        }
+
+    def write_json(self, writer, units=()):
+        writer.write(json.dumps(self.graph_json(units), indent=2, ensure_ascii=False) + '\n')
+
+    def write_dot(self, writer):
+        writer.write('digraph includes {\n    rankdir=LR;\n    node [shape=box];\n')
+        for path, targets in sorted(self.graph().items()):
+            writer.write(f'    {json.dumps(path)};\n')
+            for target in targets:
+                writer.write(f'    {json.dumps(path)} -> {json.dumps(target)};\n')
+        writer.write('}\n')
+
+    def write_make(self, writer, units):
+        """make rules: one 'object: unit headers...' line per translation unit"""
+        for unit in units:
+            target = os.path.splitext(unit.source.path)[0] + '.o'
+            dependencies = ' '.join(path.replace(' ', '\\ ') for path in unit.dependencies())
+            writer.write(f'{target}: {dependencies}\n')
@@ -0,0 +1,474 @@
+"""Long-running lexer server over a Unix socket or localhost HTTP"""
+
+import sys
+import json
+import time
+import queue
+import threading
+import signal
+import socket
+import socketserver
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from collections import Counter, deque
+
+from .analyzer import LexicalAnalyzer
+from .batch import token_result
+from .watch import TreeWatcher
+
+SERVER_OPS = {'tokenize': 'tokens', 'classify': 'classify', 'counts': 'counts'}
+
+# Analyzers of a server worker process, one per language, built on first use
+_server_analyzers = {}
+
+def server_analyzer(language):
+    analyzer = _server_analyzers.get(language)
+    if analyzer is None:
+        analyzer = _server_analyzers[language] = LexicalAnalyzer(language=language)
+    return analyzer
+
+def server_worker_warmup(language):
+    """Compile the default language's patterns before the first request arrives"""
+    server_analyzer(language).tokenize_buffer('int x = 0;')
+    return os.getpid()
+
+def server_worker_batch(batch):
+    """Lex a batch of (op, text, language) requests in a worker process"""
+    results = []
+    for op, text, language in batch:
+        try:
+            analyzer = server_analyzer(language)
+            results.append(token_result(analyzer, analyzer.tokenize_buffer(text), SERVER_OPS[op]))
+        except (OSError, ValueError, TypeError) as e:
+            results.append({'error': str(e)})
+    return results
+
+class ServerMetrics:
+    """Request counters and recent latencies of a LexerServer"""
+
+    WINDOW = 10000      # latencies kept for the percentiles
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = Counter()
+        self.errors = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.tokens_out = 0
+        self.in_flight = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.recent = deque(maxlen=self.WINDOW)     # (finished at, seconds)
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def end(self, op, size, tokens, seconds, error=False):
+        with self.lock:
+            self.in_flight -= 1
+            self.requests[op] += 1
+            self.bytes_in += size
+            self.tokens_out += tokens
+            if error:
+                self.errors += 1
+            self.recent.append((time.monotonic(), seconds))
+
+    def reject(self):
+        with self.lock:
+            self.rejected += 1
+
+    def batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def snapshot(self, queued=0):
+        with self.lock:
+            recent = list(self.recent)
+            uptime = max(time.time() - self.started, 1e-9)
+            total = sum(self.requests.values())
+            snapshot = {
+                'uptime': round(uptime, 3),
+                'requests': total,
+                'by_op': dict(self.requests),
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'queued': queued,
+                'bytes_in': self.bytes_in,
+                'tokens_out': self.tokens_out,
+                'requests_per_sec': round(total / uptime, 2),
+                'batches': self.batches,
+                'mean_batch': round(self.batched_requests / self.batches, 2) if self.batches else 0,
+            }
+
+        latencies = sorted(seconds for _, seconds in recent)
+        if latencies:
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+            snapshot['latency_ms'] = {'p50': percentile(0.50), 'p90': percentile(0.90),
+                                      'p99': percentile(0.99), 'max': round(latencies[-1] * 1000, 3),
+                                      'samples': len(latencies)}
+            span = time.monotonic() - recent[0][0]
+            snapshot['recent_requests_per_sec'] = round(len(recent) / span, 2) if span > 0 else None
+        return snapshot
+
+class LexBatcher:
+    """Groups requests bound for the worker pool into batches.
+
+    A batch leaves once it holds `size` requests or `max_chars` of text,
+    or `wait` seconds after its first request, so a burst of requests
+    costs one round trip to a worker instead of one each.
+    """
+
+    def __init__(self, pool, metrics, size=32, wait=0.002, max_chars=4 * 1024 * 1024):
+        self.pool = pool
+        self.metrics = metrics
+        self.size = size
+        self.wait = wait
+        self.max_chars = max_chars
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, op, text, language):
+        """Queue a request; returns a Future for its result dict"""
+        future = Future()
+        self.queue.put(((op, text, language), future))
+        return future
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            chars = len(item[0][1])
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.size and chars < self.max_chars:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+                chars += len(item[0][1])
+            self.send(batch)
+
+    def send(self, batch):
+        self.metrics.batch(len(batch))
+        futures = [future for _, future in batch]
+        try:
+            done = self.pool.submit(server_worker_batch, [request for request, _ in batch])
+        except RuntimeError as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        def deliver(done):
+            try:
+                results = done.result()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                return
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        done.add_done_callback(deliver)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+class LexerServer:
+    """Long-running lexer shared by editors and CI jobs.
+
+    Texts up to INLINE_LIMIT chars are lexed right in the connection
+    thread, where a round trip to another process would cost more than
+    the lexing.  Larger ones go, batched, to a pool of worker processes
+    started and warmed up before the server accepts connections.  At most
+    max_pending requests are in flight: socket clients wait for a slot,
+    so a full server stops reading and the client blocks on its socket;
+    HTTP requests get a "server busy" reply instead.
+    """
+
+    INLINE_LIMIT = 16 * 1024
+
+    def __init__(self, workers=None, language=None, max_pending=256,
+                 batch_size=32, batch_wait=0.002, watcher=None):
+        self.language = language
+        self.watcher = watcher      # TreeWatcher answering the 'watch' op, if any
+        self.analyzers = {}
+        self.analyzers_lock = threading.Lock()
+        self.metrics = ServerMetrics()
+        self.max_pending = max_pending
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.workers = workers or os.cpu_count() or 1
+        self.analyzer(language)
+
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.worker_pids = sorted(set(self.pool.map(server_worker_warmup,
+                                                    [language] * self.workers)))
+        self.batcher = LexBatcher(self.pool, self.metrics, batch_size, batch_wait)
+
+    def analyzer(self, language):
+        """The in-process analyzer for a language (LanguageProfile.get raises on bad names)"""
+        analyzer = self.analyzers.get(language)
+        if analyzer is None:
+            with self.analyzers_lock:
+                analyzer = self.analyzers.get(language)
+                if analyzer is None:
+                    analyzer = self.analyzers[language] = LexicalAnalyzer(language=language)
+        return analyzer
+
+    def handle(self, request, block=True):
+        """Answer one request dict: {"id", "op", "text", "language"} -> response dict"""
+        request_id = request.get('id')
+        op = request.get('op')
+        if op == 'ping':
+            return {'id': request_id, 'ok': True}
+        if op == 'metrics':
+            return {'id': request_id, 'metrics': self.get_metrics()}
+        if op == 'watch':
+            return self.watch_state(request_id, request.get('file'), request.get('top') or 0)
+        if op not in SERVER_OPS:
+            return {'id': request_id, 'error': f"unknown op {op!r}"}
+        text = request.get('text')
+        if not isinstance(text, str):
+            return {'id': request_id, 'error': "'text' must be a string"}
+        language = request.get('language') or self.language
+
+        if not self.slots.acquire(blocking=block):
+            self.metrics.reject()
+            return {'id': request_id, 'error': "server busy", 'busy': True}
+        self.metrics.begin()
+        start = time.perf_counter()
+        result = None
+        try:
+            if len(text) <= self.INLINE_LIMIT:
+                analyzer = self.analyzer(language)
+                result = token_result(analyzer, analyzer.tokenize_buffer(text), SERVER_OPS[op])
+            else:
+                result = self.batcher.submit(op, text, language).result()
+        except (OSError, ValueError, TypeError, RuntimeError) as e:
+            result = {'error': str(e)}
+        finally:
+            self.slots.release()
+            if result is None:
+                result = {'error': "internal error"}
+            self.metrics.end(op, len(text), result.get('total', 0),
+                             time.perf_counter() - start, 'error' in result)
+        result['id'] = request_id
+        return result
+
+    def watch_state(self, request_id, path=None, top=0):
+        """The watched trees' aggregate state, or the last result of one file"""
+        if self.watcher is None:
+            return {'id': request_id, 'error': "not watching any tree (serve --watch DIR)"}
+        if path is not None:
+            result = self.watcher.get_file(path)
+            if result is None:
+                return {'id': request_id, 'error': f"not a watched source file: {path}"}
+            return {'id': request_id, 'result': result}
+        if not isinstance(top, int) or top < 0:
+            return {'id': request_id, 'error': "'top' must be a non-negative integer"}
+        return {'id': request_id, 'state': self.watcher.get_state(top)}
+
+    def get_metrics(self):
+        metrics = self.metrics.snapshot(self.batcher.pending())
+        metrics['workers'] = self.workers
+        metrics['max_pending'] = self.max_pending
+        return metrics
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.batcher.close()
+        self.pool.shutdown()
+
+class JsonLinesHandler(socketserver.StreamRequestHandler):
+    """One socket connection: a JSON request per line in, a JSON response per line out"""
+
+    def handle(self):
+        lexer = self.server.lexer
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                response = {'id': None, 'error': f"bad request: {e}"}
+            else:
+                response = lexer.handle(request)
+            self.wfile.write(json.dumps(response, ensure_ascii=False,
+                                        separators=(',', ':')).encode('utf-8') + b'\n')
+
+class UnixLexerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class LexerHTTPHandler(BaseHTTPRequestHandler):
+    """Localhost HTTP front end: POST /tokenize|/classify|/counts, GET /metrics|/watch"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path == '/metrics':
+            self.send_json(200, self.server.lexer.get_metrics())
+        elif path == '/watch':
+            query = parse_qs(url.query)
+            top = query.get('top', ['0'])[0]
+            response = self.server.lexer.watch_state(
+                None, query['file'][0] if 'file' in query else None, int(top) if top.isdigit() else -1)
+            self.send_json(400 if 'error' in response else 200, response)
+        elif path == '/health':
+            self.send_json(200, {'ok': True})
+        else:
+            self.send_json(404, {'error': f"no such endpoint {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        op = url.path.strip('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if op not in SERVER_OPS:
+            self.send_json(404, {'error': f"no such endpoint {url.path}"})
+            return
+        try:
+            # Either a JSON request object or the raw UTF-8 source text
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            else:
+                request = {'text': body.decode('utf-8')}
+        except (ValueError, UnicodeDecodeError) as e:
+            self.send_json(400, {'error': f"bad request: {e}"})
+            return
+        request['op'] = op
+        query = parse_qs(url.query)
+        if 'language' in query:
+            request['language'] = query['language'][0]
+
+        response = self.server.lexer.handle(request, block=False)
+        if response.get('busy'):
+            self.send_json(503, response)
+        elif 'error' in response:
+            self.send_json(400, response)
+        else:
+            self.send_json(200, response)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class LexerClient:
+    """Minimal client for a serve --socket server"""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.file = self.sock.makefile('rwb')
+        self.next_id = 0
+
+    def request(self, op, text=None, language=None, **fields):
+        self.next_id += 1
+        request = {'id': self.next_id, 'op': op}
+        if text is not None:
+            request['text'] = text
+        if language:
+            request['language'] = language
+        request.update(fields)
+        self.file.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_serve(args):
+    """Serve the lexer on a Unix socket (JSON Lines) or localhost HTTP until interrupted"""
+    if args.socket and os.path.exists(args.socket):
+        # Checked before the workers and the watcher start, so a refusal leaves nothing running
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(args.socket)
+        except OSError:
+            # A socket left behind by a server that did not shut down cleanly
+            os.unlink(args.socket)
+        else:
+            print(f"error: a server is already listening on {args.socket}", file=sys.stderr)
+            return 1
+        finally:
+            probe.close()
+
+    watcher = None
+    if args.watch:
+        watcher = TreeWatcher(args.watch, args.workers, args.language).start()
+        print(f"Watching {len(watcher.signatures)} files ({watcher.backend})", file=sys.stderr)
+    lexer = LexerServer(args.workers, args.language, args.max_pending,
+                        args.batch_size, args.batch_wait / 1000, watcher)
+    try:
+        if args.socket:
+            server = UnixLexerServer(args.socket, JsonLinesHandler)
+            where = args.socket
+        else:
+            server = ThreadingHTTPServer((args.host, args.port), LexerHTTPHandler)
+            server.verbose = args.verbose
+            where = f"http://{args.host}:{server.server_address[1]}"
+    except OSError:
+        lexer.close()
+        raise
+    server.lexer = lexer
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Serving on {where} with {lexer.workers} workers", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        lexer.close()
+    return 0
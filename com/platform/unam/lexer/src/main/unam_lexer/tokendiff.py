@@ -0,0 +1,382 @@
+"""Token-level diff: a minimal edit script between the significant tokens of two texts"""
+
+import sys
+import json
+import time
+
+from .analyzer import LexicalAnalyzer
+
+# Runs of equal tokens longer than this are compared in slices instead of one by one
+GALLOP_MIN = 8
+# Inputs whose searched tokens (both sides, after trimming) are at most
+# this many always get the exact search: even unrelated texts of this size
+# diff in a few seconds
+MINIMAL_SIZE = 10000
+# Above MINIMAL_SIZE, the edit cost after which a Myers search settles for
+# a split that is probably not optimal. GNU diff uses about the square root
+# of the input size, at least 4096; each step costs far more in Python, and
+# dissimilar inputs of 100k tokens would take minutes with that bound for a
+# script a few tenths of a percent shorter
+TOO_EXPENSIVE = 128
+
+def token_keys(buffer, table):
+    """Small-int identity of every token of a TokenBuffer.
+
+    table maps (type code, value) to its int; passing the same table for
+    both texts gives equal tokens equal ints, so the diff compares ints.
+    """
+    source = buffer.source
+    setdefault = table.setdefault
+    return [setdefault((code, source[start:end]), len(table))
+            for code, start, end in zip(buffer.type_codes, buffer.starts, buffer.ends)]
+
+def common_prefix(xv, yv, x, y, n):
+    """Length of the run of equal elements starting at xv[x], yv[y], at most n"""
+    k = 0
+    while k < n and k < GALLOP_MIN:
+        if xv[x + k] != yv[y + k]:
+            return k
+        k += 1
+    # Long run: compare doubling slices, then bisect the one with the mismatch
+    step = GALLOP_MIN
+    while k < n:
+        step = min(step * 2, n - k)
+        if xv[x + k:x + k + step] == yv[y + k:y + k + step]:
+            k += step
+            continue
+        lo, hi = k, k + step
+        while hi - lo > GALLOP_MIN:
+            mid = (lo + hi) // 2
+            if xv[x + lo:x + mid] == yv[y + lo:y + mid]:
+                lo = mid
+            else:
+                hi = mid
+        while xv[x + lo] == yv[y + lo]:
+            lo += 1
+        return lo
+    return n
+
+def common_suffix(xv, yv, x, y, n):
+    """Length of the run of equal elements ending at xv[x - 1], yv[y - 1], at most n"""
+    k = 0
+    while k < n and k < GALLOP_MIN:
+        if xv[x - 1 - k] != yv[y - 1 - k]:
+            return k
+        k += 1
+    step = GALLOP_MIN
+    while k < n:
+        step = min(step * 2, n - k)
+        if xv[x - k - step:x - k] == yv[y - k - step:y - k]:
+            k += step
+            continue
+        lo, hi = k, k + step
+        while hi - lo > GALLOP_MIN:
+            mid = (lo + hi) // 2
+            if xv[x - mid:x - lo] == yv[y - mid:y - lo]:
+                lo = mid
+            else:
+                hi = mid
+        while xv[x - 1 - lo] == yv[y - 1 - lo]:
+            lo += 1
+        return lo
+    return n
+
+def middle_snake(xv, yv, xoff, xlim, yoff, ylim, find_minimal, fd, bd, too_expensive):
+    """Split point of xv[xoff:xlim] / yv[yoff:ylim] on a shortest edit path.
+
+    Myers' bidirectional search: fd and bd hold the furthest x reached on
+    each diagonal (x - y) going forward and backward, until the two
+    searches overlap. Diagonals are list indexes and negative ones wrap to
+    the end, so both lists need len(xv) + len(yv) + 3 entries. Unless
+    find_minimal, a search costing more than too_expensive edits stops at
+    the diagonal that got furthest; the halves after such a split are not
+    guaranteed minimal. Returns (xmid, ymid, lo_minimal, hi_minimal).
+    """
+    dmin = xoff - ylim
+    dmax = xlim - yoff
+    fmid = xoff - yoff
+    bmid = xlim - ylim
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    odd = (fmid - bmid) & 1
+    fd[fmid] = xoff
+    bd[bmid] = xlim
+    cost = 0
+
+    while True:
+        cost += 1
+
+        # One more edit on every forward diagonal
+        if fmin > dmin:
+            fmin -= 1
+            fd[fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            fd[fmax + 1] = -1
+        else:
+            fmax -= 1
+        for d in range(fmax, fmin - 1, -2):
+            tlo = fd[d - 1]
+            thi = fd[d + 1]
+            x = thi if tlo < thi else tlo + 1
+            y = x - d
+            if x < xlim and y < ylim and xv[x] == yv[y]:
+                x += common_prefix(xv, yv, x, y, min(xlim - x, ylim - y))
+                y = x - d
+            fd[d] = x
+            if odd and bmin <= d <= bmax and bd[d] <= x:
+                return x, y, True, True
+
+        # And on every backward diagonal
+        if bmin > dmin:
+            bmin -= 1
+            bd[bmin - 1] = sys.maxsize
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            bd[bmax + 1] = sys.maxsize
+        else:
+            bmax -= 1
+        for d in range(bmax, bmin - 1, -2):
+            tlo = bd[d - 1]
+            thi = bd[d + 1]
+            x = tlo if tlo < thi else thi - 1
+            y = x - d
+            if xoff < x and yoff < y and xv[x - 1] == yv[y - 1]:
+                x -= common_suffix(xv, yv, x, y, min(x - xoff, y - yoff))
+                y = x - d
+            bd[d] = x
+            if not odd and fmin <= d <= fmax and x <= fd[d]:
+                return x, y, True, True
+
+        if find_minimal or cost < too_expensive:
+            continue
+
+        # Too expensive: split at whichever search got further from its corner
+        fxybest = -1
+        fxbest = xoff
+        for d in range(fmax, fmin - 1, -2):
+            x = min(fd[d], xlim)
+            y = x - d
+            if ylim < y:
+                x = ylim + d
+                y = ylim
+            if fxybest < x + y:
+                fxybest = x + y
+                fxbest = x
+        bxybest = sys.maxsize
+        bxbest = xlim
+        for d in range(bmax, bmin - 1, -2):
+            x = max(xoff, bd[d])
+            y = x - d
+            if y < yoff:
+                x = yoff + d
+                y = yoff
+            if x + y < bxybest:
+                bxybest = x + y
+                bxbest = x
+        if (xlim + ylim) - bxybest < fxybest - (xoff + yoff):
+            return fxbest, fxybest - fxbest, True, False
+        return bxbest, bxybest - bxbest, False, True
+
+def diff_sequences(a, b, minimal=False):
+    """Edit script turning sequence a into b, as change hunks.
+
+    Returns [(a_start, a_end, b_start, b_end), ...] in order: a[a_start:a_end]
+    is replaced by b[b_start:b_end] (one side empty for a pure delete or
+    insert) and everything between hunks is equal. The common prefix and
+    suffix are trimmed first and elements that do not occur on the other
+    side are set aside as changed, which leaves Myers' search only the
+    elements that can match. The script is minimal unless more than
+    MINIMAL_SIZE elements are left to search and the search gives up on a
+    very costly region; minimal=True never gives up.
+    """
+    n = len(a)
+    m = len(b)
+    prefix = common_prefix(a, b, 0, 0, min(n, m))
+    suffix = common_suffix(a, b, n, m, min(n, m) - prefix)
+    a_changed = bytearray(n)
+    b_changed = bytearray(m)
+
+    if prefix + suffix < max(n, m):
+        a_changed[prefix:n - suffix] = b'\x01' * (n - suffix - prefix)
+        b_changed[prefix:m - suffix] = b'\x01' * (m - suffix - prefix)
+        in_a = set(a[prefix:n - suffix])
+        in_b = set(b[prefix:m - suffix])
+        xs = [i for i in range(prefix, n - suffix) if a[i] in in_b]
+        ys = [j for j in range(prefix, m - suffix) if b[j] in in_a]
+        xv = [a[i] for i in xs]
+        yv = [b[j] for j in ys]
+        for i in xs:
+            a_changed[i] = 0
+        for j in ys:
+            b_changed[j] = 0
+
+        fd = [0] * (len(xv) + len(yv) + 3)
+        bd = [0] * (len(xv) + len(yv) + 3)
+
+        minimal = minimal or len(xv) + len(yv) <= MINIMAL_SIZE
+        stack = [(0, len(xv), 0, len(yv), minimal)]
+        while stack:
+            xoff, xlim, yoff, ylim, find_minimal = stack.pop()
+            if xoff < xlim and yoff < ylim and xv[xoff] == yv[yoff]:
+                k = common_prefix(xv, yv, xoff, yoff, min(xlim - xoff, ylim - yoff))
+                xoff += k
+                yoff += k
+            if xoff < xlim and yoff < ylim and xv[xlim - 1] == yv[ylim - 1]:
+                k = common_suffix(xv, yv, xlim, ylim, min(xlim - xoff, ylim - yoff))
+                xlim -= k
+                ylim -= k
+            if xoff == xlim:
+                for j in range(yoff, ylim):
+                    b_changed[ys[j]] = 1
+            elif yoff == ylim:
+                for i in range(xoff, xlim):
+                    a_changed[xs[i]] = 1
+            else:
+                xmid, ymid, lo_minimal, hi_minimal = middle_snake(
+                    xv, yv, xoff, xlim, yoff, ylim, find_minimal, fd, bd, TOO_EXPENSIVE)
+                stack.append((xmid, xlim, ymid, ylim, hi_minimal))
+                stack.append((xoff, xmid, yoff, ymid, lo_minimal))
+
+    # Unchanged elements pair up in order, so hunks are the changed runs
+    # between equal stretches of the same length on both sides
+    hunks = []
+    i = j = 0
+    while True:
+        next_i = a_changed.find(1, i)
+        next_j = b_changed.find(1, j)
+        if next_i < 0:
+            next_i = n
+        if next_j < 0:
+            next_j = m
+        skip = min(next_i - i, next_j - j)
+        i += skip
+        j += skip
+        if i == n and j == m:
+            return hunks
+        i_end = i
+        if i == next_i:
+            i_end = a_changed.find(0, i)
+            if i_end < 0:
+                i_end = n
+        j_end = j
+        if j == next_j:
+            j_end = b_changed.find(0, j)
+            if j_end < 0:
+                j_end = m
+        hunks.append((i, i_end, j, j_end))
+        i = i_end
+        j = j_end
+
+class TokenDiff:
+    """Minimal edit script between the significant tokens of two texts.
+
+    Both texts are lexed and whitespace and comments dropped, so only
+    changes a compiler would see show up. hunks are (old_start, old_end,
+    new_start, new_end) ranges into the old and new TokenBuffers.
+    """
+
+    def __init__(self, old_text, new_text, analyzer=None, minimal=False):
+        self.analyzer = analyzer or LexicalAnalyzer()
+        start = time.perf_counter()
+        self.old = self.analyzer.tokenize_buffer(old_text)
+        self.new = self.analyzer.tokenize_buffer(new_text)
+        lexed = time.perf_counter()
+        table = {}
+        old_keys = token_keys(self.old, table)
+        new_keys = token_keys(self.new, table)
+        self.hunks = diff_sequences(old_keys, new_keys, minimal)
+        self.lex_seconds = lexed - start
+        self.diff_seconds = time.perf_counter() - lexed
+
+    @classmethod
+    def from_files(cls, old_path, new_path, analyzer=None, minimal=False):
+        with open(old_path, 'r', encoding='utf-8') as f:
+            old_text = f.read()
+        with open(new_path, 'r', encoding='utf-8') as f:
+            new_text = f.read()
+        return cls(old_text, new_text, analyzer, minimal)
+
+    @staticmethod
+    def anchor(buffer, index):
+        """(line, column) of a token, or of the end of the text past the last one"""
+        if index < len(buffer):
+            return buffer.lines[index], buffer.columns[index]
+        source = buffer.source
+        return source.count('\n') + 1, len(source) - source.rfind('\n')
+
+    def changes(self):
+        """Yield one dict per hunk: the operation and, for each side, the
+        token range, the line/column it starts at and the token values.
+
+        A side with no tokens is anchored at the token after the change.
+        """
+        for old_start, old_end, new_start, new_end in self.hunks:
+            if old_start == old_end:
+                op = 'insert'
+            elif new_start == new_end:
+                op = 'delete'
+            else:
+                op = 'replace'
+            sides = {}
+            for side, buffer, first, last in (('old', self.old, old_start, old_end),
+                                              ('new', self.new, new_start, new_end)):
+                line, column = self.anchor(buffer, first)
+                sides[side] = {'start': first, 'end': last, 'line': line, 'column': column,
+                               'values': [buffer.value(i) for i in range(first, last)]}
+            yield {'op': op, 'old': sides['old'], 'new': sides['new']}
+
+    def stats(self):
+        deleted = sum(old_end - old_start for old_start, old_end, _, _ in self.hunks)
+        inserted = sum(new_end - new_start for _, _, new_start, new_end in self.hunks)
+        return {'old_tokens': len(self.old), 'new_tokens': len(self.new),
+                'equal': len(self.old) - deleted, 'deleted': deleted, 'inserted': inserted,
+                'hunks': len(self.hunks),
+                'lex_seconds': round(self.lex_seconds, 6),
+                'diff_seconds': round(self.diff_seconds, 6)}
+
+    def render(self, old_name='old', new_name='new', max_values=None):
+        """Text report: a header per hunk with both anchors, then the
+        removed (-) and added (+) token values, max_values per side at most
+        """
+        lines = [f"--- {old_name} ({len(self.old)} tokens)",
+                 f"+++ {new_name} ({len(self.new)} tokens)"]
+        for change in self.changes():
+            old = change['old']
+            new = change['new']
+            lines.append(f"@@ {old_name}:{old['line']}:{old['column']} "
+                         f"{new_name}:{new['line']}:{new['column']} {change['op']} "
+                         f"{old['end'] - old['start']} -> {new['end'] - new['start']}")
+            for sign, values in (('-', old['values']), ('+', new['values'])):
+                if not values:
+                    continue
+                shown = values if max_values is None else values[:max_values]
+                more = len(values) - len(shown)
+                lines.append(f"{sign} {' '.join(shown)}" + (f" ... ({more} more)" if more else ""))
+        return '\n'.join(lines)
+
+def run_diff(args):
+    """Compare two source files token by token; exit 1 if they differ, like diff"""
+    try:
+        diff = TokenDiff.from_files(args.old, args.new, LexicalAnalyzer(language=args.language),
+                                    args.minimal)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    stats = diff.stats()
+    if args.format == 'json':
+        print(json.dumps({'old': args.old, 'new': args.new, 'stats': stats,
+                          'hunks': list(diff.changes())}, ensure_ascii=False))
+    else:
+        if diff.hunks:
+            print(diff.render(args.old, args.new, args.max_tokens))
+        print(f"{stats['hunks']} hunks: -{stats['deleted']} +{stats['inserted']} tokens "
+              f"({stats['old_tokens']} -> {stats['new_tokens']}); "
+              f"lex {diff.lex_seconds * 1000:.1f} ms, diff {diff.diff_seconds * 1000:.1f} ms",
+              file=sys.stderr)
+    return 1 if diff.hunks else 0
@@ -0,0 +1,328 @@
+"""Tokens, the columnar token buffer and the statistics built from it"""
+
+import json
+import marshal
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+class Token:
+    __slots__ = ('type', 'value', 'line', 'column')
+
+    def __init__(self, token_type, value, line, column):
+        self.type = token_type
+        self.value = value
+        self.line = line
+        self.column = column
+    
+    def __str__(self):
+        return f"Token({self.type}, '{self.value}', {self.line}:{self.column})"
+
+class TokenBuffer:
+    """Columnar token storage: parallel arrays instead of one Token per token.
+
+    Each token is a small-int type code, start/end offsets into the source,
+    a line and a column. Values are sliced from the source on access and
+    Token objects are only built when indexed or iterated.
+    """
+
+    # Interned token type names, shared by every buffer so codes are stable
+    TYPE_NAMES = []
+    TYPE_CODES = {}
+
+    @classmethod
+    def intern_type(cls, name):
+        code = cls.TYPE_CODES.get(name)
+        if code is None:
+            code = len(cls.TYPE_NAMES)
+            if code > 255:
+                raise ValueError("Too many token types for a TokenBuffer")
+            cls.TYPE_NAMES.append(name)
+            cls.TYPE_CODES[name] = code
+        return code
+
+    def __init__(self, source):
+        self.source = source
+        self.type_codes = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('I')
+        self.columns = array('I')
+
+    def append(self, type_code, start, end, line, column):
+        self.type_codes.append(type_code)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return Token(self.TYPE_NAMES[self.type_codes[index]], self.value(index),
+                     self.lines[index], self.columns[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def type_name(self, index):
+        return self.TYPE_NAMES[self.type_codes[index]]
+
+    def value(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def rows(self):
+        """Yield (type, value, line, column) tuples without building Token objects"""
+        names = self.TYPE_NAMES
+        source = self.source
+        for code, start, end, line, column in zip(self.type_codes, self.starts, self.ends,
+                                                  self.lines, self.columns):
+            yield names[code], source[start:end], line, column
+
+    def row_at(self, index):
+        """(type, value, line, column) of one token"""
+        return (self.TYPE_NAMES[self.type_codes[index]], self.value(index),
+                self.lines[index], self.columns[index])
+
+    def row_range(self, first, last):
+        """(type, value, line, column) tuples of tokens [first, last)"""
+        return [self.row_at(i) for i in range(first, min(last, len(self)))]
+
+    def index_of_line(self, line):
+        """Index of the first token on or after the given line"""
+        return bisect_left(self.lines, line)
+
+    def nbytes(self):
+        """Memory used by the columns (the source text is not counted)"""
+        return sum(col.itemsize * len(col) for col in
+                   (self.type_codes, self.starts, self.ends, self.lines, self.columns))
+
+class TokenStatistics:
+    """Per-category token statistics, built in a single pass.
+
+    counters[category] is a Counter of values in first-occurrence order,
+    first_seen[category][value] the (line, column) where a value first
+    appears and total the number of tokens seen (every type).
+    """
+
+    # (key, title, token types) in report order
+    CATEGORIES = (
+        ('keywords', 'Keywords', ('KEYWORD',)),
+        ('identifiers', 'Identifiers', ('IDENTIFIER',)),
+        ('punctuations', 'Punctuations', ('PUNCTUATOR',)),
+        ('operators', 'Operators', ('OPERATOR',)),
+        ('constants', 'Constants', ('INT_CONSTANT', 'FLOAT_CONSTANT')),
+        ('literals', 'Literals', ('STRING_LITERAL', 'CHAR_LITERAL')),
+    )
+    CATEGORY_OF_TYPE = {token_type: key for key, _, types in CATEGORIES for token_type in types}
+
+    def __init__(self):
+        self.counters = {key: Counter() for key, _, _ in self.CATEGORIES}
+        self.first_seen = {key: {} for key, _, _ in self.CATEGORIES}
+        self.total = 0
+
+    def add_rows(self, rows):
+        """Count (type, value, line, column) rows"""
+        category_of = self.CATEGORY_OF_TYPE
+        counters = self.counters
+        first_seen = self.first_seen
+        total = 0
+        for token_type, value, line, column in rows:
+            total += 1
+            category = category_of.get(token_type)
+            if category is None:
+                continue
+            counter = counters[category]
+            count = counter.get(value)
+            if count is None:
+                counter[value] = 1
+                first_seen[category][value] = (line, column)
+            else:
+                counter[value] = count + 1
+        self.total += total
+
+    def merge(self, other):
+        """Add the counts of another TokenStatistics (e.g. another file)"""
+        for key, counter in other.counters.items():
+            self.counters[key].update(counter)
+            seen = self.first_seen[key]
+            for value, position in other.first_seen[key].items():
+                seen.setdefault(value, position)
+        self.total += other.total
+
+    def category_total(self, key):
+        return sum(self.counters[key].values())
+
+    def category_totals(self):
+        return {key: self.category_total(key) for key, _, _ in self.CATEGORIES}
+
+    def to_dict(self):
+        """Plain-data form for JSON output"""
+        return {
+            'total': self.total,
+            'categories': {
+                key: [{'value': value, 'count': count,
+                       'line': self.first_seen[key][value][0],
+                       'column': self.first_seen[key][value][1]}
+                      for value, count in self.counters[key].items()]
+                for key, _, _ in self.CATEGORIES
+            },
+        }
+
+    def render_report(self):
+        """Text report shown in the classification tab"""
+        parts = ["TOKEN CLASSIFICATION\n", "=" * 60 + "\n\n"]
+
+        for n, (key, title, _) in enumerate(self.CATEGORIES, 1):
+            counter = self.counters[key]
+            parts.append(f"{n}. {title}: {', '.join(counter) if counter else '(none)'}\n")
+        parts.append("\n")
+
+        # Total count (excluding comments)
+        parts.append(f"Count = {self.total} tokens\n\n")
+
+        # Detailed breakdown
+        parts.append("DETAILED BREAKDOWN:\n")
+        parts.append("-" * 40 + "\n")
+
+        for key, title, _ in self.CATEGORIES:
+            counter = self.counters[key]
+            if counter:
+                parts.append(f"\n{title} ({self.category_total(key)} total):\n")
+                for item, count in counter.items():
+                    parts.append(f"  • {item} (appears {count} time{'s' if count > 1 else ''})\n")
+
+        return ''.join(parts)
+
+class LexerProfile:
+    """Where the scanner spends its time, recorded while profiling is enabled.
+
+    Per pattern: matches, failed match attempts and nanoseconds spent in
+    match(). Per token type: counts. Per category: UTF-8 bytes consumed.
+    UNKNOWN tokens are counted by line and by char to find hotspots.
+    """
+
+    # Categories for the types TokenStatistics does not classify
+    OTHER_CATEGORIES = {
+        'WHITESPACE': 'whitespace',
+        'NEWLINE': 'whitespace',
+        'COMMENT_SINGLE': 'comments',
+        'COMMENT_MULTI': 'comments',
+        'UNKNOWN': 'unknown',
+    }
+
+    def __init__(self, pattern_names):
+        self.pattern_names = list(pattern_names)
+        self.matches = Counter()
+        self.failures = Counter()
+        self.pattern_ns = Counter()
+        self.type_counts = Counter()
+        self.category_bytes = Counter()
+        self.unknown_lines = Counter()
+        self.unknown_chars = Counter()
+        self.runs = 0
+        self.chars = 0
+        self.total_ns = 0
+
+    def category_of(self, token_type):
+        category = TokenStatistics.CATEGORY_OF_TYPE.get(token_type)
+        return category or self.OTHER_CATEGORIES.get(token_type, 'other')
+
+    def match_seconds(self):
+        return sum(self.pattern_ns.values()) / 1e9
+
+    def to_dict(self, top=20):
+        """Plain-data form for JSON output"""
+        total_ns = sum(self.pattern_ns.values()) or 1
+        return {
+            'runs': self.runs,
+            'chars': self.chars,
+            'seconds': self.total_ns / 1e9,
+            'match_seconds': self.match_seconds(),
+            'patterns': [
+                {'name': name,
+                 'matches': self.matches[name],
+                 'failures': self.failures[name],
+                 'attempts': self.matches[name] + self.failures[name],
+                 'seconds': self.pattern_ns[name] / 1e9,
+                 'share': self.pattern_ns[name] / total_ns}
+                for name in self.pattern_names
+            ],
+            'types': dict(self.type_counts.most_common()),
+            'category_bytes': dict(self.category_bytes.most_common()),
+            'unknown': {
+                'total': self.type_counts['UNKNOWN'],
+                'lines': [[line, count] for line, count in self.unknown_lines.most_common(top)],
+                'chars': [[ch, count] for ch, count in self.unknown_chars.most_common(top)],
+            },
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def write_pstats(self, path):
+        """Dump in the marshal format of cProfile, readable by pstats.Stats(path)
+
+        Each pattern is a function called from 'tokenize'; the scan loop
+        itself is the tokenize self time.
+        """
+        root = ('<lexer>', 0, 'tokenize')
+        match_ns = sum(self.pattern_ns.values())
+        stats = {root: (self.runs, self.runs, max(self.total_ns - match_ns, 0) / 1e9,
+                        self.total_ns / 1e9, {})}
+        for n, name in enumerate(self.pattern_names, 1):
+            calls = self.matches[name] + self.failures[name]
+            seconds = self.pattern_ns[name] / 1e9
+            stats[('<lexer>', n, f'match:{name}')] = (
+                calls, calls, seconds, seconds, {root: (calls, calls, seconds, seconds)})
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)
+
+    def write_folded(self, path):
+        """Folded stacks ('frame;frame microseconds') for flamegraph.pl or speedscope"""
+        match_ns = sum(self.pattern_ns.values())
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"tokenize {max(self.total_ns - match_ns, 0) // 1000}\n")
+            for name in self.pattern_names:
+                f.write(f"tokenize;match:{name} {self.pattern_ns[name] // 1000}\n")
+
+    def render_report(self, top=10):
+        """Text report shown in the Performance tab"""
+        data = self.to_dict(top)
+        parts = ["LEXER PERFORMANCE\n", "=" * 60 + "\n\n"]
+        parts.append(f"Runs: {self.runs}   Chars: {self.chars}   "
+                     f"Time: {data['seconds']:.4f}s (match: {data['match_seconds']:.4f}s)\n\n")
+
+        parts.append("PATTERNS (in match order):\n")
+        parts.append("-" * 60 + "\n")
+        parts.append(f"{'pattern':<16}{'matches':>10}{'failed':>12}{'ms':>10}{'share':>9}\n")
+        for item in data['patterns']:
+            parts.append(f"{item['name']:<16}{item['matches']:>10}{item['failures']:>12}"
+                         f"{item['seconds'] * 1000:>10.2f}{item['share']:>9.1%}\n")
+
+        parts.append("\nTOKEN TYPES:\n")
+        parts.append("-" * 40 + "\n")
+        for token_type, count in data['types'].items():
+            parts.append(f"  {token_type:<16}{count:>10}\n")
+
+        parts.append("\nBYTES PER CATEGORY:\n")
+        parts.append("-" * 40 + "\n")
+        for category, size in data['category_bytes'].items():
+            parts.append(f"  {category:<16}{size:>10}\n")
+
+        unknown = data['unknown']
+        parts.append(f"\nUNKNOWN HOTSPOTS ({unknown['total']} tokens):\n")
+        parts.append("-" * 40 + "\n")
+        for line, count in unknown['lines']:
+            parts.append(f"  line {line}: {count}\n")
+        if unknown['chars']:
+            parts.append("  chars: " + ', '.join(f"{ch!r} x{count}" for ch, count in unknown['chars']) + "\n")
+
+        return ''.join(parts)
@@ -0,0 +1,252 @@
+"""UTF-8 byte patterns and token buffers over memory-mapped files"""
+
+from .dfa import CharSet, MAX_CODEPOINT, PatternParser
+from .tokens import Token, TokenBuffer
+
+def utf8_byte_sequences(lo, hi):
+    """Split code points lo..hi into UTF-8 byte range sequences.
+
+    Each result is a list of (first_byte, last_byte) per position and the
+    sequences are disjoint, so their alternation matches exactly the UTF-8
+    encodings of the code points (surrogates have none and are skipped).
+    """
+    result = []
+    stack = [(lo, hi)]
+    while stack:
+        a, b = stack.pop()
+        if a > b:
+            continue
+        if a <= 0xDFFF and b >= 0xD800:
+            stack.append((a, 0xD7FF))
+            stack.append((0xE000, b))
+            continue
+        split = False
+        # Same encoded length on both ends
+        for boundary in (0x7F, 0x7FF, 0xFFFF):
+            if a <= boundary < b:
+                stack.append((a, boundary))
+                stack.append((boundary + 1, b))
+                split = True
+                break
+        if split:
+            continue
+        if b <= 0x7F:
+            result.append([(a, b)])
+            continue
+        # Split until every continuation byte covers a full or common range
+        n = len(chr(a).encode('utf-8'))
+        for i in range(1, n):
+            m = (1 << (6 * i)) - 1
+            if a & ~m != b & ~m:
+                if a & m != 0:
+                    stack.append((a, a | m))
+                    stack.append(((a | m) + 1, b))
+                    split = True
+                    break
+                if b & m != m:
+                    stack.append((a, (b & ~m) - 1))
+                    stack.append((b & ~m, b))
+                    split = True
+                    break
+        if not split:
+            result.append(list(zip(chr(a).encode('utf-8'), chr(b).encode('utf-8'))))
+    return result
+
+def byte_range_regex(lo, hi):
+    if lo == hi:
+        return f'\\x{lo:02x}'
+    return f'[\\x{lo:02x}-\\x{hi:02x}]'
+
+def byte_class_regex(ranges):
+    ranges = sorted(ranges)
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        # A lone byte stays a literal so re keeps its prefix optimizations
+        return byte_range_regex(*ranges[0])
+    return '[' + ''.join(f'\\x{a:02x}' if a == b else f'\\x{a:02x}-\\x{b:02x}'
+                         for a, b in ranges) + ']'
+
+def charset_bytes_parts(chars):
+    """Split chars into (ASCII byte class, multi-byte alternation), either may be None"""
+    single = []
+    multi = []
+    for lo, hi in chars.intervals:
+        for sequence in utf8_byte_sequences(lo, hi):
+            if len(sequence) == 1:
+                single.append(sequence[0])
+            else:
+                multi.append(sequence)
+    ascii_part = byte_class_regex(single) if single else None
+    multi_part = None
+    if multi:
+        # Group by lead byte range and guard with a lookahead on the lead
+        # bytes, so ASCII positions fail fast instead of trying every branch
+        by_lead = {}
+        for sequence in multi:
+            by_lead.setdefault(sequence[0], []).append(sequence[1:])
+        groups = []
+        for lead, tails in sorted(by_lead.items()):
+            tails = sorted(''.join(byte_range_regex(a, b) for a, b in tail) for tail in tails)
+            tail = tails[0] if len(tails) == 1 else '(?:' + '|'.join(tails) + ')'
+            groups.append(byte_range_regex(*lead) + tail)
+        guard = '(?=' + byte_class_regex(list(by_lead)) + ')'
+        multi_part = guard + (groups[0] if len(groups) == 1 else '(?:' + '|'.join(groups) + ')')
+    return ascii_part, multi_part
+
+def charset_bytes_regex(chars):
+    """Bytes regex (as str) matching the UTF-8 encoding of one char of chars"""
+    branches = [part for part in charset_bytes_parts(chars) if part]
+    if not branches:
+        # Empty class: never matches
+        return '(?!)'
+    return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+# Text mode reads \r\n and a lone \r as \n; in bytes a char class with \n
+# takes them as one unit and no class matches \r by itself
+LINE_END_BYTES = r'\r\n|\r(?!\n)'
+CARRIAGE_RETURN = CharSet.of('\r')
+
+def utf8_bytes_pattern(pattern, dotall=False):
+    """Rewrite a token pattern so it matches UTF-8 bytes exactly like the str
+    pattern matches the text read from them in text mode
+    """
+    parser = PatternParser(None, pattern, dotall)
+    out = []
+    while parser.pos < len(pattern):
+        ch = parser.next()
+        if ch == '[':
+            chars = parser.parse_class()
+        elif ch == '\\':
+            chars = parser.parse_escape()
+        elif ch == '.':
+            chars = CharSet([(0, MAX_CODEPOINT)]) if dotall else CharSet.of('\n').complement()
+        elif ch == '(' and pattern.startswith('?:', parser.pos):
+            parser.pos += 2
+            out.append('(?:')
+            continue
+        elif ch in '()|*+?':
+            out.append(ch)
+            continue
+        else:
+            chars = CharSet.of(ch)
+
+        newline = chars.contains(10)
+        if chars.contains(13):
+            chars = chars.complement().union(CARRIAGE_RETURN).complement()
+        ascii_part, multi_part = charset_bytes_parts(chars)
+        if newline:
+            # Tried last: only it matches \r, and most chars are not line ends
+            multi_part = (multi_part + '|' if multi_part else '') + LINE_END_BYTES
+        greedy_star = (pattern.startswith('*', parser.pos)
+                       and not pattern.startswith('*?', parser.pos))
+        if ascii_part and multi_part and greedy_star:
+            # (A|M)* unrolled to A*(?:MA*)* keeps the ASCII run on re's fast
+            # single-class repeat
+            parser.pos += 1
+            out.append(f'{ascii_part}*(?:(?:{multi_part}){ascii_part}*)*')
+        elif newline:
+            out.append(f'(?:{ascii_part}|{multi_part})' if ascii_part else f'(?:{multi_part})')
+        else:
+            out.append(charset_bytes_regex(chars))
+    return ''.join(out)
+
+# How much of a file sniff_binary looks at
+SNIFF_SIZE = 8192
+# Control bytes other than \t \n \v \f \r, deleted to count the text bytes
+CONTROL_BYTES = bytes(range(9)) + bytes(range(14, 32)) + b'\x7f'
+
+def sniff_binary(head):
+    """Why bytes from the start of a file do not look like UTF-8 source
+    ('binary data', 'UTF-16 text', ...), or None if they do
+    """
+    head = bytes(head[:SNIFF_SIZE])
+    if head.startswith((b'\xff\xfe\x00\x00', b'\x00\x00\xfe\xff')):
+        return 'UTF-32 text'
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'UTF-16 text'
+    if b'\x00' in head:
+        # UTF-16 without a byte order mark: ASCII chars leave every other byte zero
+        half = len(head) // 2
+        if half and max(head[0::2].count(0), head[1::2].count(0)) > half * 3 // 4:
+            return 'UTF-16 text'
+        return 'binary data'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A char cut by the end of the sniffed block is fine
+        if e.end < len(head) or len(head) < SNIFF_SIZE:
+            return 'not UTF-8 text'
+    controls = len(head) - len(head.translate(None, CONTROL_BYTES))
+    if controls * 10 > len(head):
+        return 'binary data'
+    return None
+
+def sniff_file(path):
+    """sniff_binary of the start of a file"""
+    with open(path, 'rb') as f:
+        return sniff_binary(f.read(SNIFF_SIZE))
+
+def count_line_ends(value):
+    """Line ends in UTF-8 bytes the way text mode reads them (\n, \r\n, lone \r)"""
+    newlines = value.count(b'\n')
+    if b'\r' in value:
+        newlines += value.count(b'\r') - value.count(b'\r\n')
+    return newlines
+
+def last_line_end(value):
+    """Offset of the last byte of the last line end in value, -1 if none"""
+    return max(value.rfind(b'\n'), value.rfind(b'\r'))
+
+def decode_value(value):
+    """Token value from UTF-8 bytes as text mode reads them: \r\n and lone \r become \n"""
+    value = value.decode('utf-8', 'replace')
+    if '\r' in value:
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
+    return value
+
+def utf8_length(value):
+    """Number of chars in valid UTF-8 bytes"""
+    return len(value) if value.isascii() else len(value.decode('utf-8'))
+
+class MappedTokenBuffer(TokenBuffer):
+    """TokenBuffer over a memory-mapped file: offsets are byte offsets
+    into the mapping and values are decoded from UTF-8 only on access.
+    """
+
+    def __init__(self, source, file=None):
+        super().__init__(source)
+        self.file = file
+
+    def value(self, index):
+        return decode_value(self.source[self.starts[index]:self.ends[index]])
+
+    def row_at(self, index):
+        return (self.TYPE_NAMES[self.type_codes[index]], self.value(index),
+                self.lines[index], self.columns[index])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return Token(*self.row_at(index))
+
+    def rows(self):
+        names = self.TYPE_NAMES
+        source = self.source
+        for code, start, end, line, column in zip(self.type_codes, self.starts, self.ends,
+                                                  self.lines, self.columns):
+            yield names[code], decode_value(source[start:end]), line, column
+
+    def close(self):
+        """Release the mapping; the buffer cannot produce values afterwards"""
+        if hasattr(self.source, 'close'):
+            self.source.close()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
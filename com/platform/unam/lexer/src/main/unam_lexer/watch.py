@@ -0,0 +1,405 @@
+"""Watch mode: keep the token counts of a source tree current as files change"""
+
+import os
+import sys
+import json
+import time
+import signal
+import select
+import struct
+import threading
+from stat import S_ISREG
+from concurrent.futures import ProcessPoolExecutor
+
+from .batch import lex_file_worker, profile_extensions
+
+class Inotify:
+    """Linux inotify through ctypes: the paths touched since the last read.
+
+    Watches every directory of the trees; directories created later are
+    added as their events arrive. Raises OSError where inotify is missing,
+    so callers can fall back to polling.
+    """
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, roots):
+        import ctypes
+        import ctypes.util
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify needs Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.add_watch_call = libc.inotify_add_watch
+        self.add_watch_call.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}   # watch descriptor -> directory
+        try:
+            for root in roots:
+                self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, directory):
+        import ctypes
+        wd = self.add_watch_call(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch {directory}: {os.strerror(errno)}")
+        self.directories[wd] = directory
+
+    def add_tree(self, root):
+        if not os.path.isdir(root):
+            # A single file: watch the directory it is in
+            self.add_watch(os.path.dirname(root) or '.')
+            return
+        for directory, _, _ in os.walk(root):
+            self.add_watch(directory)
+
+    def wait(self, timeout):
+        """True when events are ready within timeout seconds"""
+        return bool(select.select([self.fd], [], [], timeout)[0])
+
+    def read(self):
+        """(paths touched, overflowed): on overflow the caller must rescan everything"""
+        paths = set()
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, size = self.EVENT.unpack_from(data, pos)
+                pos += self.EVENT.size
+                name = data[pos:pos + size].rstrip(b'\0')
+                pos += size
+                if mask & self.IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    del self.directories[wd]
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                paths.add(path)
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO) \
+                        and os.path.isdir(path):
+                    # Files may have landed in it before the watch was added
+                    try:
+                        self.add_tree(path)
+                    except OSError:
+                        overflowed = True
+        return paths, overflowed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class TreeWatcher:
+    """Per-file token counts and running totals for source trees.
+
+    A snapshot maps every source file to its (mtime_ns, size, inode);
+    refresh() re-lexes only the files whose signature changed, in a pool
+    of jobs worker processes that stays up between refreshes, and moves
+    the totals by the difference between the old and the new counts of
+    each file. With inotify the candidates come from the kernel instead
+    of a stat of the whole tree, so an update costs what changed.
+    """
+
+    # Quiet period that ends a burst of events (a checkout, a build)
+    SETTLE = 0.05
+
+    def __init__(self, roots, jobs=None, language=None, extensions=None, use_inotify=True):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.jobs = jobs or os.cpu_count() or 1
+        self.language = language
+        if not extensions:
+            extensions = profile_extensions(language)
+        self.extensions = tuple((ext if ext.startswith('.') else '.' + ext).lower()
+                                for ext in extensions)
+        self.lock = threading.Lock()
+        self.signatures = {}    # path -> (mtime_ns, size, inode)
+        self.results = {}       # path -> lex_file_worker result (counts and categories)
+        self.counts = {}
+        self.categories = {}
+        self.tokens = 0
+        self.bytes = 0
+        self.generation = 0
+        self.last_update = None
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify(self.roots)
+            except (OSError, AttributeError):
+                # No inotify (or out of watches): poll instead
+                self.inotify = None
+
+    @property
+    def backend(self):
+        return 'inotify' if self.inotify is not None else 'poll'
+
+    # -- snapshots ------------------------------------------------------------------
+
+    def is_source(self, path):
+        return path.lower().endswith(self.extensions)
+
+    def is_watched(self, path):
+        """Whether path is one of the roots or under one"""
+        return any(path == root or path.startswith(root + os.sep) for root in self.roots)
+
+    def signature(self, path):
+        """(mtime_ns, size, inode) of a source file, or None if it is gone"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def snapshot(self, roots=None):
+        """{path: signature} of every source file under roots"""
+        signatures = {}
+        stack = list(roots or self.roots)
+        while stack:
+            root = stack.pop()
+            if os.path.isfile(root):
+                signature = self.signature(root)
+                if signature is not None:
+                    signatures[root] = signature
+                continue
+            try:
+                entries = os.scandir(root)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and self.is_source(entry.name):
+                            stat = entry.stat()
+                            signatures[entry.path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                    except OSError:
+                        continue
+        return signatures
+
+    def changes_under(self, paths):
+        """{path: signature or None} for the files at or under paths (inotify events)"""
+        found = {}
+        for path in paths:
+            if not self.is_watched(path):
+                continue
+            if os.path.isdir(path):
+                found.update(self.snapshot([path]))
+            elif self.is_source(path):
+                found[path] = self.signature(path)
+            elif not os.path.exists(path):
+                # Maybe a removed or renamed directory: drop what was known under it
+                prefix = path + os.sep
+                found.update((known, None) for known in self.signatures if known.startswith(prefix))
+        return found
+
+    # -- updates --------------------------------------------------------------------
+
+    def refresh(self, paths=None):
+        """Re-lex what changed: under paths if given, else everything (a full snapshot).
+
+        Returns {'changed', 'removed', 'seconds'}; the listeners are called
+        with the watcher and that dict when anything changed.
+        """
+        start = time.perf_counter()
+        if paths is None:
+            current = self.snapshot()
+            candidates = dict(current)
+            candidates.update((path, None) for path in self.signatures if path not in current)
+        else:
+            candidates = self.changes_under(paths)
+
+        stale = [path for path, signature in candidates.items()
+                 if signature is not None and self.signatures.get(path) != signature]
+        removed = [path for path, signature in candidates.items()
+                   if signature is None and path in self.signatures]
+
+        jobs = [(path, 'counts', None, False, self.language, 'skip', None) for path in stale]
+        chunksize = max(1, min(64, len(jobs) // (self.jobs * 4)))
+        results = list(self.pool.map(lex_file_worker, jobs, chunksize=chunksize)) if jobs else []
+
+        if not stale and not removed:
+            return {'changed': 0, 'removed': 0, 'seconds': round(time.perf_counter() - start, 4)}
+        with self.lock:
+            for path in removed:
+                self.forget(path)
+                del self.signatures[path]
+            for path, result in zip(stale, results):
+                self.forget(path)
+                self.signatures[path] = candidates[path]
+                self.results[path] = result
+                self.tokens += result['total']
+                self.bytes += result['bytes']
+                for totals, values in ((self.counts, result.get('counts', {})),
+                                       (self.categories, result.get('categories', {}))):
+                    for key, count in values.items():
+                        if count:
+                            totals[key] = totals.get(key, 0) + count
+            self.generation += 1
+            self.last_update = {'changed': len(stale), 'removed': len(removed),
+                                'seconds': round(time.perf_counter() - start, 4),
+                                'time': time.time()}
+            update = dict(self.last_update)
+        for listener in self.listeners:
+            listener(self, update)
+        return update
+
+    def forget(self, path):
+        """Take a file's last result out of the totals (caller holds the lock)"""
+        result = self.results.pop(path, None)
+        if result is None:
+            return
+        self.tokens -= result['total']
+        self.bytes -= result['bytes']
+        for totals, values in ((self.counts, result.get('counts', {})),
+                               (self.categories, result.get('categories', {}))):
+            for key, count in values.items():
+                # Zero counts are never added to the totals
+                if not count:
+                    continue
+                totals[key] -= count
+                if not totals[key]:
+                    del totals[key]
+
+    # -- background thread ------------------------------------------------------------
+
+    def start(self, interval=1.0):
+        """Do a full refresh, then keep refreshing in a daemon thread; returns self"""
+        self.refresh()
+        self.thread = threading.Thread(target=self.run, args=(interval,), daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self, interval):
+        while not self.stop_event.is_set():
+            if self.inotify is None:
+                if self.stop_event.wait(interval):
+                    return
+                self.refresh()
+                continue
+            if not self.inotify.wait(interval):
+                continue
+            # Collect the whole burst before lexing
+            paths = set()
+            overflowed = False
+            while True:
+                touched, lost = self.inotify.read()
+                paths |= touched
+                overflowed = overflowed or lost
+                if not self.inotify.wait(self.SETTLE):
+                    break
+            self.refresh(None if overflowed else paths)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.inotify is not None:
+            self.inotify.close()
+        self.pool.shutdown()
+
+    # -- queries ----------------------------------------------------------------------
+
+    def get_state(self, top=0):
+        """JSON-ready aggregate state; with top, also the files with the most tokens"""
+        with self.lock:
+            errors = {path: r['error'] for path, r in self.results.items() if 'error' in r}
+            skipped = {path: r['skipped'] for path, r in self.results.items() if 'skipped' in r}
+            state = {
+                'roots': self.roots,
+                'backend': self.backend,
+                'generation': self.generation,
+                'files': len(self.results) - len(errors) - len(skipped),
+                'tokens': self.tokens,
+                'bytes': self.bytes,
+                'counts': dict(sorted(self.counts.items())),
+                'categories': dict(self.categories),
+                'errors': errors,
+                'skipped': skipped,
+                'last_update': self.last_update,
+            }
+            if top:
+                busiest = sorted(self.results.items(), key=lambda item: -item[1]['total'])[:top]
+                state['top_files'] = [[path, result['total']] for path, result in busiest]
+        return state
+
+    def get_file(self, path):
+        """The last result of one file (counts and categories), or None"""
+        with self.lock:
+            result = self.results.get(os.path.abspath(path))
+            return dict(result) if result is not None else None
+
+def run_watch(args):
+    """Lex source trees, then report every update until interrupted"""
+    watcher = TreeWatcher(args.paths, args.jobs, args.language, args.ext, not args.poll)
+
+    def report(watcher, update):
+        if args.format == 'jsonl':
+            state = watcher.get_state(args.top)
+            state['update'] = update
+            print(json.dumps(state, ensure_ascii=False), flush=True)
+        else:
+            state = watcher.get_state()
+            print(f"[{time.strftime('%H:%M:%S')}] {update['changed']} lexed, "
+                  f"{update['removed']} removed in {update['seconds'] * 1000:.0f} ms: "
+                  f"{state['files']} files, {state['tokens']} tokens, "
+                  f"{len(state['errors'])} failed, {len(state['skipped'])} skipped",
+                  file=sys.stderr, flush=True)
+
+    watcher.listeners.append(report)
+    if args.once:
+        try:
+            watcher.refresh()
+        finally:
+            watcher.stop()
+        return 1 if watcher.get_state()['errors'] else 0
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    watcher.start(args.interval)
+    print(f"Watching {len(watcher.signatures)} files ({watcher.backend}), Ctrl+C to stop",
+          file=sys.stderr, flush=True)
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return 0
@@ -0,0 +1,25 @@
+import os
+import sys
+import random
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The package lives in src/main next to this directory
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'main'))
+
+# Characters that exercise every token type, unterminated strings and
+# comments, unrecognized input and non-ASCII identifiers
+ALPHABET = 'ab_1 9.eE+\t\n"\'\\/*+-=<>!&|;{}#@$ñé'
+
+def random_text(seed, size=300, alphabet=ALPHABET):
+    rnd = random.Random(seed)
+    return ''.join(rnd.choice(alphabet) for _ in range(size))
+
+def token_key(tokens):
+    return [(token.type, token.value, token.line, token.column) for token in tokens]
+
+@pytest.fixture
+def sample_text():
+    with open(os.path.join(HERE, 'Class_example.txt'), 'r', encoding='utf-8') as f:
+        return f.read()
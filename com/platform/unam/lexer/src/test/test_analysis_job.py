@@ -0,0 +1,37 @@
+from unam_lexer import AnalysisJob, LexicalAnalyzer, TokenBuffer
+from conftest import random_text, token_key
+
+def messages(job):
+    job.start()
+    job.thread.join()
+    result = []
+    while not job.messages.empty():
+        result.append(job.messages.get())
+    return result
+
+def test_scan_in_steps_matches_tokenize(sample_text):
+    analyzer = LexicalAnalyzer()
+    for text in [sample_text] + [random_text(seed, 2000) for seed in range(10)]:
+        buffer = TokenBuffer(text)
+        pos, line, column = 0, 1, 1
+        while pos < len(text):
+            pos, line, column = analyzer.scan_into(buffer, text, pos, line, column, pos + 37)
+        assert token_key(buffer) == token_key(analyzer.tokenize(text))
+
+def test_job_reports_progress_then_results(sample_text):
+    analyzer = LexicalAnalyzer()
+    job = AnalysisJob(analyzer, sample_text * 4)
+    job.STEP = 500
+    reported = messages(job)
+    progress = [message for message in reported if message[0] == 'progress']
+    assert len(progress) > 1
+    assert [message[1] for message in progress] == sorted(message[1] for message in progress)
+    kind, incremental, classification = reported[-1]
+    assert kind == 'done'
+    assert token_key(incremental) == token_key(analyzer.tokenize(sample_text * 4))
+    assert classification.to_dict() == analyzer.classify_tokens(job.buffer).to_dict()
+
+def test_cancelled_job_keeps_partial_results(sample_text):
+    job = AnalysisJob(LexicalAnalyzer(), sample_text)
+    job.cancel()
+    assert messages(job) == [('cancelled', 0, 0)]
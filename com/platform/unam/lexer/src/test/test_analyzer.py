@@ -0,0 +1,26 @@
+import pytest
+
+from unam_lexer import LexicalAnalyzer
+from conftest import random_text, token_key
+
+def test_sample_tokens(sample_text):
+    tokens = LexicalAnalyzer().tokenize(sample_text)
+    assert tokens
+    assert all(token.type not in ('WHITESPACE', 'NEWLINE', 'COMMENT_SINGLE', 'COMMENT_MULTI')
+               for token in tokens)
+
+def test_reference_engine_agrees_with_master(sample_text):
+    master = LexicalAnalyzer()
+    reference = LexicalAnalyzer(engine='reference')
+    for text in [sample_text, ''] + [random_text(seed) for seed in range(40)]:
+        assert token_key(reference.tokenize(text)) == token_key(master.tokenize(text)), text
+
+def test_positions_across_lines():
+    tokens = LexicalAnalyzer().tokenize('int a;\n/* two\nlines */ b = "x";\n')
+    assert [(token.value, token.line, token.column) for token in tokens] == [
+        ('int', 1, 1), ('a', 1, 5), (';', 1, 6), ('b', 3, 10), ('=', 3, 12), ('"x"', 3, 14),
+        (';', 3, 17)]
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        LexicalAnalyzer(engine='nope')
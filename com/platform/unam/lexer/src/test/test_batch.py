@@ -0,0 +1,48 @@
+import json
+
+from unam_lexer.cli import main
+
+def lex(tmp_path, *args):
+    output = tmp_path / 'out.jsonl'
+    status = main(['lex', *map(str, args), '--jobs', '2', '--output', str(output)])
+    lines = output.read_text(encoding='utf-8').splitlines() if output.exists() else []
+    return status, [json.loads(line) for line in lines]
+
+def test_lex_directory(tmp_path, capsys):
+    source = tmp_path / 'src'
+    (source / 'sub').mkdir(parents=True)
+    (source / 'a.txt').write_bytes(b'int a = 1;\r\nfloat b;\r\n')
+    (source / 'sub' / 'b.c').write_text('int main() { return 0; }\n', encoding='utf-8')
+    (source / 'notes.md').write_text('# not source\n', encoding='utf-8')
+    status, results = lex(tmp_path, source)
+    assert status == 0
+    assert [result['file'] for result in results] == [str(source / 'a.txt'),
+                                                      str(source / 'sub' / 'b.c')]
+    assert results[0]['counts'] == {'KEYWORD': 2, 'IDENTIFIER': 2, 'OPERATOR': 1,
+                                    'INT_CONSTANT': 1, 'PUNCTUATOR': 2}
+    # Sizes are file bytes (CRLF counted as two), not decoded chars
+    assert [result['bytes'] for result in results] == [22, 25]
+    assert ', 17 tokens, 47 bytes in ' in capsys.readouterr().err
+
+def test_token_mode(tmp_path):
+    path = tmp_path / 'one.c'
+    path.write_text('x = "s";\n', encoding='utf-8')
+    status, results = lex(tmp_path, path, '--mode', 'tokens')
+    assert status == 0
+    assert results[0]['tokens'] == [['IDENTIFIER', 'x', 1, 1], ['OPERATOR', '=', 1, 3],
+                                    ['STRING_LITERAL', '"s"', 1, 5], ['PUNCTUATOR', ';', 1, 8]]
+
+def test_missing_path_is_an_error(tmp_path, capsys):
+    status, results = lex(tmp_path, tmp_path / 'nowhere')
+    assert status == 2 and results == []
+    assert 'nowhere: no such file or directory' in capsys.readouterr().err
+
+def test_classify_mode(tmp_path):
+    path = tmp_path / 'one.c'
+    path.write_text('int a = a + 1;\n', encoding='utf-8')
+    status, results = lex(tmp_path, path, '--mode', 'classify')
+    assert status == 0
+    classification = results[0]['classification']
+    assert classification['total'] == 7
+    assert classification['categories']['identifiers'] == [
+        {'value': 'a', 'count': 2, 'line': 1, 'column': 5}]
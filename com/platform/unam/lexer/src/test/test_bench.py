@@ -0,0 +1,50 @@
+import json
+from collections import Counter
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer
+from unam_lexer.cli import CORPUS_MIXES, compare_with_baseline, generate_corpus, main, parse_size
+
+@pytest.mark.parametrize('text, size', [('1000', 1000), ('512k', 512 * 1024),
+                                        ('4MB', 4 * 1024 ** 2), ('1.5K', 1536)])
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+@pytest.mark.parametrize('mix', sorted(CORPUS_MIXES))
+def test_corpus_is_reproducible(mix):
+    text = generate_corpus(4096, mix, seed=3)
+    assert len(text) == 4096
+    assert text == generate_corpus(4096, mix, seed=3)
+    assert text != generate_corpus(4096, mix, seed=4)
+
+def test_corpus_mix_shapes_the_tokens():
+    analyzer = LexicalAnalyzer()
+    strings = Counter(token.type for token in analyzer.tokenize(generate_corpus(8192, 'string-heavy')))
+    unknown = Counter(token.type for token in analyzer.tokenize(generate_corpus(8192, 'unknown-heavy')))
+    assert strings['STRING_LITERAL'] > strings['IDENTIFIER'] and strings['UNKNOWN'] == 0
+    assert unknown['UNKNOWN'] > unknown['IDENTIFIER']
+
+def test_corpus_command(tmp_path, capsys):
+    output = tmp_path / 'corpus.c'
+    assert main(['corpus', str(output), '--size', '2K', '--mix', 'string-heavy', '--seed', '7']) == 0
+    assert output.read_text(encoding='utf-8') == generate_corpus(2048, 'string-heavy', 7)
+    assert 'Wrote 2048 chars' in capsys.readouterr().err
+
+def test_bench_report_and_baseline(tmp_path, capsys):
+    report_path = tmp_path / 'bench.json'
+    assert main(['bench', '--size', '2K', '--repeat', '1', '--warmup', '0', '--no-memory',
+                 '--save', str(report_path)]) == 0
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    assert report['chars'] == 2048 and report['tokens'] > 0
+    assert report['corpus'] == {'mix': 'balanced', 'seed': 0, 'size': 2048}
+    names = [entry['name'] for entry in report['results']]
+    assert 'classify_tokens' in names
+    assert all('peak_bytes' not in entry for entry in report['results'])
+    assert json.loads(capsys.readouterr().out) == report
+
+    # A baseline far faster than anything measured flags every case
+    faster = {'results': [dict(entry, tokens_per_s=entry['tokens_per_s'] * 1000)
+                          for entry in report['results']]}
+    assert compare_with_baseline(report, faster, 0.10) == names
+    assert compare_with_baseline(report, report, 0.10) == []
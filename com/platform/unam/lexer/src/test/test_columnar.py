@@ -0,0 +1,108 @@
+import json
+from array import array
+from collections import Counter
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer, TokenTable
+from unam_lexer.cli import main
+from conftest import random_text
+
+@pytest.fixture
+def sources(tmp_path, sample_text):
+    source = tmp_path / 'src'
+    (source / 'sub').mkdir(parents=True)
+    texts = {source / 'a.c': sample_text,
+             source / 'sub' / 'b.c': random_text(1, 500),
+             source / 'sub' / 'c.h': 'int x = x + 1; /* y */ float y;\n'}
+    for path, text in texts.items():
+        path.write_text(text, encoding='utf-8')
+    return source, {str(path): text for path, text in sorted(texts.items())}
+
+def rows(table):
+    return [(table.files[table.file[i]], table.type_names[table.type[i]],
+             table.values[table.value[i]], table.line[i], table.column[i])
+            for i in range(len(table))]
+
+def expected_rows(texts):
+    analyzer = LexicalAnalyzer()
+    return [(path, token.type, token.value, token.line, token.column)
+            for path, text in texts.items() for token in analyzer.tokenize(text)]
+
+def test_save_load_round_trip(tmp_path, sources):
+    _, texts = sources
+    table = TokenTable.from_files(list(texts), LexicalAnalyzer())
+    assert rows(table) == expected_rows(texts)
+    path = tmp_path / 'tokens.lxt'
+    table.save(str(path))
+    loaded = TokenTable.load(str(path))
+    assert rows(loaded) == rows(table)
+    assert list(loaded.file_offsets) == list(table.file_offsets)
+    assert loaded.summary() == table.summary()
+
+def test_bad_table_file(tmp_path):
+    path = tmp_path / 'bad.lxt'
+    path.write_bytes(b'not a table at all, really')
+    with pytest.raises(ValueError):
+        TokenTable.load(str(path))
+
+def test_merge_matches_one_table(sources):
+    _, texts = sources
+    analyzer = LexicalAnalyzer()
+    merged = TokenTable()
+    for path in texts:
+        merged.merge(TokenTable.from_files([path], analyzer))
+    assert rows(merged) == rows(TokenTable.from_files(list(texts), analyzer))
+    assert len(merged.values) == len(set(merged.values))
+
+def test_aggregations(sources):
+    _, texts = sources
+    table = TokenTable.from_files(list(texts), LexicalAnalyzer())
+    expected = expected_rows(texts)
+    assert table.type_histogram() == Counter(row[1] for row in expected)
+    header = next(path for path in texts if path.endswith('c.h'))
+    assert table.type_histogram(header) == {'KEYWORD': 2, 'IDENTIFIER': 3, 'OPERATOR': 2,
+                                            'INT_CONSTANT': 1, 'PUNCTUATOR': 2}
+    assert table.top_values(('IDENTIFIER',), 1, header) == [('x', 2)]
+    assert table.line_counts(('IDENTIFIER',), header) == {1: 3}
+    with pytest.raises(ValueError):
+        table.line_counts()
+
+def test_export_and_stats_commands(tmp_path, sources, capsys):
+    source, texts = sources
+    output = tmp_path / 'out.lxt'
+    assert main(['export', str(source), '-o', str(output), '--jobs', '2']) == 0
+    assert rows(TokenTable.load(str(output))) == expected_rows(texts)
+    capsys.readouterr()
+
+    assert main(['stats', str(output), '--top', '3']) == 0
+    from_table = json.loads(capsys.readouterr().out)
+    assert main(['stats', str(source), '--top', '3']) == 0
+    assert json.loads(capsys.readouterr().out) == from_table
+    assert from_table['files'] == 3 and from_table['tokens'] == len(expected_rows(texts))
+
+def test_missing_path(tmp_path, capsys):
+    output = tmp_path / 'out.lxt'
+    assert main(['export', str(tmp_path / 'nowhere'), '-o', str(output)]) == 2
+    assert main(['stats', str(tmp_path / 'nowhere')]) == 2
+    assert capsys.readouterr().err.count('nowhere: no such file or directory') == 2
+    assert not output.exists()
+
+def test_merge_into_a_loaded_table(tmp_path, sources):
+    _, texts = sources
+    paths = list(texts)
+    analyzer = LexicalAnalyzer()
+    path = tmp_path / 'tokens.lxt'
+    # A file whose type list is ordered unlike this process's interned codes
+    TokenTable.from_files(paths[:1], analyzer).save(str(path))
+    loaded = TokenTable.load(str(path))
+    names = list(reversed(loaded.type_names)) + ['SHEBANG']
+    loaded.type = array('B', (names.index(loaded.type_names[code]) for code in loaded.type))
+    loaded.type_names = names
+    loaded.save(str(path))
+
+    loaded = TokenTable.load(str(path))
+    loaded.merge(TokenTable.from_files(paths[1:], analyzer))
+    assert rows(loaded) == expected_rows(texts)
+    loaded.save(str(path))
+    assert rows(TokenTable.load(str(path))) == expected_rows(texts)
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import random_text, token_key
+from unam_lexer import LexerDFA, LexicalAnalyzer, PatternSyntaxError
+
+@pytest.fixture
+def analyzers(tmp_path):
+    master = LexicalAnalyzer()
+    fast = LexicalAnalyzer(engine='dfa', dfa_cache_dir=str(tmp_path))
+    slow = LexicalAnalyzer(engine='dfa', dfa_cache_dir=str(tmp_path), dfa_fast_path=False)
+    return master, fast, slow
+
+def test_dfa_matches_tokenize_on_sample(analyzers, sample_text):
+    master, fast, slow = analyzers
+    expected = token_key(master.tokenize(sample_text))
+    assert token_key(fast.tokenize(sample_text)) == expected
+    assert token_key(slow.tokenize(sample_text)) == expected
+
+@pytest.mark.parametrize('seed', range(40))
+def test_dfa_matches_tokenize_on_random_text(analyzers, seed):
+    master, fast, slow = analyzers
+    text = random_text(seed)
+    expected = token_key(master.tokenize(text))
+    assert token_key(fast.tokenize(text)) == expected
+    assert token_key(slow.tokenize(text)) == expected
+
+def test_dfa_disk_cache_round_trip(tmp_path, monkeypatch, sample_text):
+    # Skip the per-process cache so the DFA is compiled and saved here
+    monkeypatch.setattr(LexicalAnalyzer, '_dfa_by_fingerprint', {})
+    analyzer = LexicalAnalyzer(engine='dfa', dfa_cache_dir=str(tmp_path))
+    dfa = analyzer.get_dfa()
+    [path] = tmp_path.iterdir()
+    loaded = LexerDFA.load(str(path))
+    assert loaded.pattern_names == dfa.pattern_names
+    assert list(loaded.scan(sample_text)) == list(dfa.scan(sample_text))
+
+def test_unsupported_pattern():
+    with pytest.raises(PatternSyntaxError):
+        LexerDFA.compile([('X', r'a(?=b)')])
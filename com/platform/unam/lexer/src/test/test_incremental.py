@@ -0,0 +1,39 @@
+import random
+
+from unam_lexer import IncrementalLexer, LexicalAnalyzer
+from conftest import ALPHABET, random_text, token_key
+
+def test_edits_match_full_relex(sample_text):
+    analyzer = LexicalAnalyzer()
+    lexer = IncrementalLexer(analyzer)
+    rnd = random.Random(3)
+    text = sample_text
+    lexer.set_text(text)
+    for _ in range(300):
+        start = rnd.randint(0, len(text))
+        end = min(len(text), start + rnd.choice([0, 0, 1, 3, 20]))
+        new_text = ''.join(rnd.choice(ALPHABET) for _ in range(rnd.choice([0, 1, 2, 10])))
+        lexer.edit(start, end, new_text)
+        text = text[:start] + new_text + text[end:]
+        assert list(lexer.rows()) == [tuple(row) for row in analyzer.tokenize_buffer(text).rows()]
+
+def test_update_finds_the_changed_region():
+    analyzer = LexicalAnalyzer()
+    lexer = IncrementalLexer(analyzer)
+    old = random_text(1, 5000)
+    lexer.update(old)
+    new = old[:2500] + '"unterminated' + old[2600:]
+    lexer.update(new)
+    assert token_key(lexer) == token_key(analyzer.tokenize(new))
+    # Only the edited neighbourhood was scanned again
+    assert lexer.rescanned_chars < len(new)
+
+def test_edit_returns_replaced_range():
+    lexer = IncrementalLexer()
+    lexer.set_text('int a = 1;\nint b = 2;\n')
+    first, removed, inserted = lexer.edit(15, 16, 'total')
+    # The rescan may start a token early, but it covers the edited one
+    assert first <= 6 < first + inserted
+    assert removed - inserted == 0
+    assert lexer[6].value == 'total'
+    assert (lexer[6].line, lexer[6].column) == (2, 5)
@@ -0,0 +1,113 @@
+import os
+import marshal
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer, TokenIndex
+from unam_lexer.cli import main
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return str(path)
+
+def test_save_load_round_trip(tmp_path):
+    a = write(tmp_path / 'a.c', 'int total = 0;\ntotal = total + 1;\n')
+    b = write(tmp_path / 'b.c', 'float totals;\n')
+    index = TokenIndex()
+    assert index.update([a, b])['indexed'] == 2
+    index_path = str(tmp_path / 'tokens.idx')
+    index.save(index_path)
+
+    loaded = TokenIndex.load(index_path)
+    assert len(loaded) == 2
+    assert loaded.search('total') == index.search('total') == [
+        ('total', 'IDENTIFIER', os.path.abspath(a), 1, 5),
+        ('total', 'IDENTIFIER', os.path.abspath(a), 2, 1),
+        ('total', 'IDENTIFIER', os.path.abspath(a), 2, 9),
+    ]
+    assert [row[0] for row in loaded.search('tot', prefix=True)] == ['total'] * 3 + ['totals']
+    assert loaded.counts('total') == [('total', 'IDENTIFIER', 3, 1)]
+    assert loaded.search('int', types=['KEYWORD']) == [('int', 'KEYWORD', os.path.abspath(a), 1, 1)]
+
+def test_update_reindexes_changed_and_drops_missing(tmp_path):
+    a = write(tmp_path / 'a.c', 'int alpha;\n')
+    b = write(tmp_path / 'b.c', 'int beta;\n')
+    index = TokenIndex()
+    index.update([a, b])
+    write(a, 'int gamma;\n')
+    # Make the change visible even on coarse mtime clocks
+    os.utime(a, ns=(0, 1))
+    result = index.update([a])
+    assert (result['indexed'], result['removed']) == (1, 1)
+    assert index.search('alpha') == [] and index.search('beta') == []
+    assert len(index.search('gamma')) == 1
+
+def test_other_language_starts_a_new_index(tmp_path):
+    index = TokenIndex()
+    index.update([write(tmp_path / 'a.c', 'int a;\n')])
+    index_path = str(tmp_path / 'tokens.idx')
+    index.save(index_path)
+    assert len(TokenIndex.load(index_path, LexicalAnalyzer(language='c'))) == 0
+    assert TokenIndex.load(index_path, LexicalAnalyzer(language='c')).reset
+
+def test_unreadable_payload_starts_a_new_index(tmp_path):
+    index_path = tmp_path / 'tokens.idx'
+    for payload in (TokenIndex.MAGIC + b'\xff\x00garbage', TokenIndex.MAGIC + marshal.dumps([1, 2])):
+        index_path.write_bytes(payload)
+        loaded = TokenIndex.load(str(index_path))
+        assert len(loaded) == 0 and loaded.reset
+    index_path.write_bytes(b'not an index')
+    with pytest.raises(ValueError):
+        TokenIndex.load(str(index_path))
+
+def test_parallel_workers_use_the_analyzer_settings(tmp_path):
+    paths = [write(tmp_path / f'{name}.java', 'boolean done;\n') for name in 'ab']
+    for jobs in (1, 2):
+        index = TokenIndex(LexicalAnalyzer(engine='dfa', language='java'))
+        assert index.update(paths, jobs=jobs)['indexed'] == 2
+        assert [row[1] for row in index.search('boolean')] == ['KEYWORD'] * 2
+
+def test_update_only_drops_files_under_the_roots(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    paths = [write(tmp_path / name, 'int shared;\n')
+             for name in ('a.c', 'b.c', os.path.join('sub', 'a.c'), os.path.join('sub', 'b.c'))]
+    index = TokenIndex()
+    index.update(paths)
+    result = index.update([paths[3]], roots=[str(tmp_path / 'sub')])
+    assert (result['indexed'], result['removed'], result['unchanged']) == (0, 1, 1)
+    assert [row[2] for row in index.search('shared')] == [os.path.abspath(path) for path in
+                                                          (paths[0], paths[1], paths[3])]
+
+def test_index_command_keeps_other_trees(tmp_path, capsys):
+    for tree in ('one', 'two'):
+        (tmp_path / tree).mkdir()
+        write(tmp_path / tree / 'a.c', f'int {tree};\n')
+    index_path = str(tmp_path / 'tokens.idx')
+    assert main(['index', str(tmp_path / 'one'), str(tmp_path / 'two'), '--index', index_path]) == 0
+    os.remove(tmp_path / 'two' / 'a.c')
+    write(tmp_path / 'two' / 'b.c', 'int three;\n')
+    assert main(['index', str(tmp_path / 'two'), '--index', index_path]) == 0
+    assert 'Indexed 1 files (0 unchanged, 1 removed, 0 failed)' in capsys.readouterr().err
+    assert main(['lookup', 'one', '--index', index_path]) == 0
+    assert main(['lookup', 'three', '--index', index_path]) == 0
+    assert main(['lookup', 'two', '--index', index_path]) == 1
+
+def test_index_command_rejects_a_missing_root(tmp_path, capsys):
+    write(tmp_path / 'a.c', 'int a;\n')
+    index_path = tmp_path / 'tokens.idx'
+    assert main(['index', str(tmp_path / 'nowhere'), '--index', str(index_path)]) == 2
+    assert 'nowhere: no such file or directory' in capsys.readouterr().err
+    assert not index_path.exists()
+    assert main(['index', str(tmp_path), '--index', str(index_path)]) == 0
+    saved = index_path.read_bytes()
+    assert main(['index', str(tmp_path), str(tmp_path / 'nowhere'), '--index', str(index_path)]) == 2
+    assert index_path.read_bytes() == saved
+    assert len(TokenIndex.load(str(index_path))) == 1
+
+def test_files_over_the_unknown_budget_are_errors(tmp_path):
+    paths = [write(tmp_path / f'{name}.c', 'int a = 1 @ 2 @ 3;\n') for name in 'ab']
+    for jobs in (1, 2):
+        index = TokenIndex(LexicalAnalyzer(max_unknown=1))
+        result = index.update(paths, jobs=jobs)
+        assert len(result['errors']) == 2 and len(index) == 0
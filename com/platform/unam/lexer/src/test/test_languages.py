@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from unam_lexer import DEFAULT_LANGUAGE, LANGUAGE_PROFILES, LanguageProfile, LexicalAnalyzer
+from unam_lexer.cli import main
+from conftest import random_text, token_key
+
+@pytest.fixture(scope='module')
+def cache_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('patterns'))
+
+def test_default_profile_is_the_sample_dialect(sample_text):
+    assert LexicalAnalyzer().language is LanguageProfile.get(DEFAULT_LANGUAGE)
+    assert token_key(LexicalAnalyzer(language=DEFAULT_LANGUAGE).tokenize(sample_text)) == \
+        token_key(LexicalAnalyzer().tokenize(sample_text))
+
+@pytest.mark.parametrize('language', sorted(LANGUAGE_PROFILES))
+def test_profile_file_round_trip(tmp_path, language, sample_text):
+    profile = LanguageProfile.get(language)
+    path = tmp_path / f'{language}.json'
+    profile.save(str(path))
+    loaded = LanguageProfile.load(str(path))
+    assert loaded.to_dict() == profile.to_dict()
+    assert loaded.spec_hash() == profile.spec_hash()
+    # A profile file is accepted wherever a profile name is
+    assert token_key(LexicalAnalyzer(language=str(path)).tokenize(sample_text)) == \
+        token_key(LexicalAnalyzer(language=language).tokenize(sample_text))
+
+def test_spec_hash_follows_the_token_output():
+    data = LanguageProfile.get('c').to_dict()
+    renamed = LanguageProfile.from_dict(dict(data, name='other', description='same rules',
+                                             extensions=['.x']))
+    assert renamed.spec_hash() == LanguageProfile.get('c').spec_hash()
+    changed = LanguageProfile.from_dict(dict(data, keywords=data['keywords'] + ['unless']))
+    assert changed.spec_hash() != renamed.spec_hash()
+    assert len({LanguageProfile.get(name).spec_hash() for name in LANGUAGE_PROFILES}) == \
+        len(LANGUAGE_PROFILES)
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        LanguageProfile.get('cobol')
+
+@pytest.mark.parametrize('language', sorted(LANGUAGE_PROFILES))
+@pytest.mark.parametrize('engine', ['reference', 'dfa'])
+def test_engines_agree_with_master(language, engine, cache_dir, sample_text):
+    master = LexicalAnalyzer(language=language, dfa_cache_dir=cache_dir)
+    other = LexicalAnalyzer(engine=engine, language=language, dfa_cache_dir=cache_dir)
+    for text in [sample_text, ''] + [random_text(seed) for seed in range(40)]:
+        assert token_key(other.tokenize(text)) == token_key(master.tokenize(text)), text
+
+@pytest.mark.parametrize('language', sorted(LANGUAGE_PROFILES))
+@pytest.mark.parametrize('chunk_size', [3, 7, 16, 64])
+def test_chunked_stream_matches_tokenize(language, chunk_size, sample_text):
+    analyzer = LexicalAnalyzer(language=language)
+    for text in [sample_text] + [random_text(seed, 2000) for seed in range(5)]:
+        assert token_key(analyzer.iter_tokens(io.StringIO(text), chunk_size)) == \
+            token_key(analyzer.tokenize(text))
+
+@pytest.mark.parametrize('us', [1, 4, 12, 30])
+@pytest.mark.parametrize('chunk_size', [3, 7, 16, 64])
+def test_java_unicode_escapes_stream(us, chunk_size):
+    # Longer escapes than the pattern takes must still not outrun the lookahead
+    analyzer = LexicalAnalyzer(language='java')
+    text = ("char c = '\\" + "u" * us + "0041';\n") * 3
+    assert token_key(analyzer.iter_tokens(io.StringIO(text), chunk_size)) == \
+        token_key(analyzer.tokenize(text))
+
+def test_java_char_literal_takes_up_to_four_us():
+    analyzer = LexicalAnalyzer(language='java')
+    assert [token.value for token in analyzer.tokenize("'\\uuuu0041'")] == ["'\\uuuu0041'"]
+    assert 'CHAR_LITERAL' not in [token.type for token in analyzer.tokenize("'\\uuuuu0041'")]
+
+def test_lex_uses_the_profile_extensions(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    for name in ('a.txt', 'b.c', 'C.java'):
+        (source / name).write_text('int a;\n', encoding='utf-8')
+
+    def lexed(*extra):
+        output = tmp_path / 'out.jsonl'
+        assert main(['lex', str(source), '--jobs', '1', '--output', str(output), *extra]) == 0
+        return [json.loads(line)['file'] for line in output.read_text(encoding='utf-8').splitlines()]
+
+    assert lexed() == [str(source / 'a.txt'), str(source / 'b.c')]
+    assert lexed('--language', 'java') == [str(source / 'C.java')]
+    assert lexed('--language', 'java', '--ext', '.c') == [str(source / 'b.c')]
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from conftest import random_text, token_key
+from unam_lexer import LexicalAnalyzer
+from unam_lexer.cli import main
+
+def test_mapped_file_matches_text_mode(tmp_path, sample_text):
+    analyzer = LexicalAnalyzer()
+    path = tmp_path / 'source.c'
+    for text in [sample_text] + [random_text(seed) for seed in range(40)]:
+        path.write_text(text, encoding='utf-8')
+        with analyzer.tokenize_mapped(str(path)) as buffer:
+            assert token_key(buffer) == token_key(analyzer.tokenize(text))
+
+def test_mapped_file_reads_line_ends_like_text_mode(tmp_path):
+    analyzer = LexicalAnalyzer()
+    path = tmp_path / 'source.c'
+    pieces = ['int', ' ', 'a', '=', '1', ';', '\r\n', '\r', '\n', '/* x', ' y */', '// c',
+              '"ab', '\\', 'cd"', "'", 'ñ', '@', '"q\rr"']
+    texts = ['"multi\r\nline" x\r\n', "'\r' \"a\rb\"\r"]
+    texts += [random_text(seed, 40, pieces) for seed in range(60)]
+    for text in texts:
+        path.write_bytes(text.encode('utf-8'))
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = [tuple(row) for row in analyzer.tokenize_buffer(f.read()).rows()]
+        with analyzer.tokenize_mapped(str(path)) as buffer:
+            assert list(buffer.rows()) == expected, text
+        assert [row[0] for row in analyzer.iter_mapped_rows(text.encode('utf-8'))] == \
+            [row[0] for row in expected]
+
+@pytest.mark.parametrize('mode', ['counts', 'tokens', 'classify'])
+def test_lex_mmap_matches_text_mode(tmp_path, mode):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'crlf.c').write_bytes('char *s = "año";\r\nint x;\r\n'.encode('utf-8'))
+    (source / 'empty.c').write_bytes(b'')
+    (source / 'plain.txt').write_text('a = b + 1; /* c */\n', encoding='utf-8')
+
+    def lex(*extra):
+        output = tmp_path / 'out.jsonl'
+        assert main(['lex', str(source), '--jobs', '1', '--mode', mode,
+                     '--output', str(output), *extra]) == 0
+        return [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+
+    text_results = lex()
+    # 'bytes' is the file size in both modes, CRLF and multibyte chars included
+    assert [result['bytes'] for result in text_results] == [27, 0, 19]
+    assert lex('--mmap') == text_results
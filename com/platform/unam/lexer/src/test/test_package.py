@@ -0,0 +1,36 @@
+import os
+import sys
+import subprocess
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main')
+LAUNCHER = os.path.join(MAIN, 'unam.fi.compilers.g5.02.py')
+
+def imported_modules(statement):
+    """Modules loaded by a fresh interpreter after running statement"""
+    code = f"{statement}\nimport sys\nprint('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=MAIN, capture_output=True,
+                            text=True, check=True)
+    return set(result.stdout.split())
+
+def test_package_import_does_not_load_tkinter():
+    modules = imported_modules('import unam_lexer')
+    assert 'unam_lexer' in modules
+    assert 'tkinter' not in modules
+    assert 'unam_lexer.gui' not in modules
+
+def test_cli_import_does_not_load_tkinter():
+    modules = imported_modules('import unam_lexer.cli')
+    assert 'tkinter' not in modules
+    assert 'unam_lexer.gui' not in modules
+
+def test_closed_stdout_pipe_exits_quietly():
+    # The reader closes the pipe before the command writes anything, like head would
+    read_end, write_end = os.pipe()
+    os.close(read_end)
+    try:
+        result = subprocess.run([sys.executable, LAUNCHER, 'languages'], cwd=MAIN,
+                                stdout=write_end, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.close(write_end)
+    assert result.returncode == 1
+    assert 'Traceback' not in result.stderr
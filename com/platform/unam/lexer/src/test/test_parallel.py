@@ -0,0 +1,71 @@
+import json
+import random
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer
+from unam_lexer import analyzer as analyzer_module
+from unam_lexer.cli import main
+from conftest import random_text, token_key
+
+def chunked_scan(analyzer, text, boundaries):
+    """What tokenize_parallel's workers return for chunks cut at boundaries"""
+    chunks = []
+    start = 0
+    line = 1
+    for stop in list(boundaries) + [len(text)]:
+        chunks.append((start, stop, line))
+        line += text.count('\n', start, stop)
+        start = stop
+    analyzer_module._parallel_job = (analyzer, text)
+    try:
+        results = [analyzer_module.lex_chunk_worker(chunk) for chunk in chunks]
+    finally:
+        analyzer_module._parallel_job = None
+    return chunks, results
+
+def test_stitch_at_any_line_start(sample_text):
+    analyzer = LexicalAnalyzer()
+    rnd = random.Random(5)
+    for text in [sample_text] + [random_text(seed, 3000) for seed in range(20)]:
+        expected = token_key(analyzer.tokenize_buffer(text))
+        # Workers start at column 1, so chunks start at line starts; any of
+        # them, including ones inside strings and comments
+        line_starts = [i + 1 for i, ch in enumerate(text[:-1]) if ch == '\n']
+        for _ in range(5):
+            boundaries = sorted(rnd.sample(line_starts, min(len(line_starts), rnd.randint(1, 8))))
+            chunks, results = chunked_scan(analyzer, text, boundaries)
+            stitched = analyzer.stitch_chunks(text, chunks, results)
+            assert token_key(stitched) == expected
+
+def test_chunk_boundaries_are_safe_line_starts(sample_text):
+    analyzer = LexicalAnalyzer()
+    text = sample_text * 20
+    boundaries = list(analyzer.iter_chunk_boundaries(text, 500))
+    assert boundaries
+    assert all(text[boundary - 1] == '\n' for boundary in boundaries)
+    chunks, results = chunked_scan(analyzer, text, boundaries)
+    assert token_key(analyzer.stitch_chunks(text, chunks, results)) == \
+        token_key(analyzer.tokenize_buffer(text))
+
+def test_tokenize_parallel(sample_text):
+    if 'fork' not in analyzer_module.multiprocessing.get_all_start_methods():
+        pytest.skip("tokenize_parallel needs fork")
+    analyzer = LexicalAnalyzer()
+    text = sample_text * 50
+    result = analyzer.tokenize_parallel(text, workers=2, min_chunk=len(text) // 8)
+    assert token_key(result) == token_key(analyzer.tokenize_buffer(text))
+
+def test_lex_split_matches_lex(tmp_path, sample_text):
+    path = tmp_path / 'big.c'
+    path.write_bytes((sample_text * 20).replace('\n', '\r\n').encode('utf-8'))
+
+    def lex(*extra):
+        output = tmp_path / 'out.jsonl'
+        assert main(['lex', str(path), '--jobs', '2', '--mode', 'tokens',
+                     '--output', str(output), *extra]) == 0
+        return [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+
+    results = lex('--split')
+    assert results == lex()
+    assert results[0]['bytes'] == path.stat().st_size
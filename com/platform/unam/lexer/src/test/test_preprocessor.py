@@ -0,0 +1,64 @@
+from unam_lexer import Preprocessor
+from unam_lexer.cli import main
+
+def write(path, data):
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    with open(path, mode) as f:
+        f.write(data)
+    return str(path)
+
+def values(unit):
+    return [row[2] for row in unit.rows()]
+
+def test_guard_must_wrap_the_whole_file(tmp_path):
+    write(tmp_path / 'a.h', '#ifndef A_H\n#define A_H\nint a;\n#endif\n#ifdef X\nint b;\n#endif\n')
+    m = write(tmp_path / 'm.c', '#include "a.h"\n#include "a.h"\n')
+    preprocessor = Preprocessor()
+    unit = preprocessor.translation_unit(m)
+    assert preprocessor.load(str(tmp_path / 'a.h')).guard is None
+    assert values(unit).count('b') == 2
+
+def test_guarded_header_is_expanded_once(tmp_path):
+    write(tmp_path / 'g.h', '#ifndef G_H\n#define G_H\n#ifdef X\nint x;\n#endif\nint g;\n#endif\n')
+    m = write(tmp_path / 'm.c', '#include "g.h"\n#include "g.h"\n')
+    preprocessor = Preprocessor()
+    unit = preprocessor.translation_unit(m)
+    assert preprocessor.load(str(tmp_path / 'g.h')).guard == 'G_H'
+    assert values(unit).count('g') == 1
+
+def test_unreadable_include_is_skipped(tmp_path):
+    # Valid UTF-8 at first, so only reading the whole file finds the bad byte
+    write(tmp_path / 'bad.h', b'int ok;\n' * 1100 + b'char *s = "\xff";\n')
+    m = write(tmp_path / 'm.c', '#include "bad.h"\n#include "bad.h"\nint m;\n')
+    preprocessor = Preprocessor()
+    unit = preprocessor.translation_unit(m)
+    assert values(unit) == ['int', 'm', ';']
+    assert [line for _, line, _, _ in unit.skipped] == [1, 2]
+    assert 'utf-8' in unit.skipped[0][3]
+    # Loaded once, like any other file, and not counted as lexed
+    assert len(preprocessor.files) == 2
+    assert preprocessor.stats['files_lexed'] == 1
+
+def test_deps_command(tmp_path, capsys):
+    write(tmp_path / 'a.h', '#pragma once\nint a;\n')
+    write(tmp_path / 'bad.c', b'\xff\xfe\n')
+    write(tmp_path / 'm.c', '#include "a.h"\nint m;\n')
+    output = tmp_path / 'deps.mk'
+    assert main(['deps', str(tmp_path), '--format', 'make', '-o', str(output)]) == 0
+    assert output.read_text(encoding='utf-8') == f"{tmp_path / 'm'}.o: {tmp_path / 'm.c'} {tmp_path / 'a.h'}\n"
+    err = capsys.readouterr().err
+    assert f"skipped: {tmp_path / 'bad.c'}" in err
+    assert '1 translation units (1 skipped)' in err
+
+def test_deps_missing_path(tmp_path, capsys):
+    assert main(['deps', str(tmp_path / 'nowhere')]) == 2
+    assert 'nowhere: no such file or directory' in capsys.readouterr().err
+
+def test_binary_include_is_skipped(tmp_path):
+    write(tmp_path / 'blob.h', b'\x00\x01\x02\xff' * 64)
+    m = write(tmp_path / 'm.c', '#include "blob.h"\nint m;\n')
+    preprocessor = Preprocessor()
+    unit = preprocessor.translation_unit(m)
+    assert values(unit) == ['int', 'm', ';']
+    assert [(line, reason) for _, line, _, reason in unit.skipped] == [(1, 'binary data')]
+    assert preprocessor.stats['files_lexed'] == 1
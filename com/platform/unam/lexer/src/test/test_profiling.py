@@ -0,0 +1,54 @@
+import json
+import pstats
+
+from conftest import random_text, token_key
+from unam_lexer import LexicalAnalyzer
+from unam_lexer.cli import main
+
+def test_profiled_tokenize_matches_tokenize(sample_text):
+    analyzer = LexicalAnalyzer()
+    texts = [sample_text] + [random_text(seed) for seed in range(20)]
+    expected = [token_key(analyzer.tokenize(text)) for text in texts]
+    profile = analyzer.enable_profiling()
+    assert [token_key(analyzer.tokenize(text)) for text in texts] == expected
+    assert analyzer.disable_profiling() is profile and analyzer.profile is None
+    assert profile.runs == len(texts)
+    assert profile.chars == sum(map(len, texts))
+    assert sum(profile.category_bytes.values()) == sum(len(text.encode('utf-8')) for text in texts)
+
+def test_profile_counts_and_hotspots():
+    analyzer = LexicalAnalyzer()
+    profile = analyzer.enable_profiling()
+    analyzer.tokenize('int a = 1; // c\n@ x $\n')
+    data = profile.to_dict()
+    assert data['types']['KEYWORD'] == 1 and data['types']['COMMENT_SINGLE'] == 1
+    assert data['unknown']['total'] == 2
+    assert data['unknown']['lines'] == [[2, 2]]
+    assert sorted(ch for ch, _ in data['unknown']['chars']) == ['$', '@']
+    # Every match attempt that did not win counts as a failure of that pattern
+    names = [item['name'] for item in data['patterns']]
+    assert names == profile.pattern_names
+    assert sum(item['matches'] for item in data['patterns']) == sum(data['types'].values()) - 2
+    assert 'UNKNOWN HOTSPOTS (2 tokens)' in profile.render_report()
+
+def test_profile_command_writes_every_format(tmp_path, capsys):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'a.c').write_text('int main() { return 0; }\n', encoding='utf-8')
+    (source / 'notes.txt').write_text('x = y @ z;\n', encoding='utf-8')
+    outputs = {name: tmp_path / f'profile.{name}' for name in ('json', 'pstats', 'folded')}
+    assert main(['profile', str(source), '--json', str(outputs['json']),
+                 '--pstats', str(outputs['pstats']), '--folded', str(outputs['folded'])]) == 0
+    assert 'LEXER PERFORMANCE' in capsys.readouterr().out
+
+    data = json.loads(outputs['json'].read_text(encoding='utf-8'))
+    assert data['runs'] == 2 and data['unknown']['total'] == 1
+    stats = pstats.Stats(str(outputs['pstats']))
+    assert ('<lexer>', 0, 'tokenize') in stats.stats
+    folded = outputs['folded'].read_text(encoding='utf-8').splitlines()
+    assert folded[0].startswith('tokenize ')
+    assert len(folded) == 1 + len(data['patterns'])
+
+def test_profile_missing_path(tmp_path, capsys):
+    assert main(['profile', str(tmp_path / 'nowhere')]) == 2
+    assert 'nowhere: no such file or directory' in capsys.readouterr().err
@@ -0,0 +1,98 @@
+import json
+import multiprocessing
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer
+from unam_lexer.batch import token_result
+from unam_lexer.cli import main
+from unam_lexer.server import (JsonLinesHandler, LexerClient, LexerHTTPHandler, LexerServer,
+                               UnixLexerServer)
+
+@pytest.fixture(scope='module')
+def lexer():
+    lexer = LexerServer(workers=1, batch_wait=0)
+    yield lexer
+    lexer.close()
+
+def serve(server, lexer):
+    server.lexer = lexer
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+@pytest.fixture
+def socket_path(lexer, tmp_path):
+    path = str(tmp_path / 'lexer.sock')
+    server = UnixLexerServer(path, JsonLinesHandler)
+    serve(server, lexer)
+    yield path
+    server.shutdown()
+    server.server_close()
+
+def expected(text, mode, language=None):
+    analyzer = LexicalAnalyzer(language=language)
+    return token_result(analyzer, analyzer.tokenize_buffer(text), mode)
+
+def test_client_requests(socket_path, sample_text):
+    with LexerClient(socket_path) as client:
+        assert client.request('ping') == {'id': 1, 'ok': True}
+        response = client.request('tokenize', sample_text)
+        assert response.pop('id') == 2
+        assert response == expected(sample_text, 'tokens')
+        response = client.request('counts', 'int x;', language='c')
+        assert response['counts'] == {'KEYWORD': 1, 'IDENTIFIER': 1, 'PUNCTUATOR': 1}
+        assert 'error' in client.request('tokenize', 'x', language='cobol')
+        assert 'error' in client.request('parse', 'x')
+
+def test_large_text_goes_to_the_workers(lexer, socket_path, sample_text):
+    text = sample_text * (LexerServer.INLINE_LIMIT // len(sample_text) + 1)
+    assert len(text) > LexerServer.INLINE_LIMIT
+    with LexerClient(socket_path) as client:
+        batches = client.request('metrics')['metrics']['batches']
+        response = client.request('classify', text)
+        assert client.request('metrics')['metrics']['batches'] == batches + 1
+    del response['id']
+    assert response == expected(text, 'classify')
+
+def test_bad_json_line(socket_path):
+    with LexerClient(socket_path) as client:
+        client.file.write(b'not json\n[1]\n')
+        client.file.flush()
+        for _ in range(2):
+            assert json.loads(client.file.readline())['error'].startswith('bad request')
+        assert client.request('ping')['ok']
+
+def test_second_server_on_a_served_socket(socket_path, tmp_path, capsys):
+    children = len(multiprocessing.active_children())
+    threads = threading.active_count()
+    assert main(['serve', '--socket', socket_path, '--workers', '2',
+                 '--watch', str(tmp_path)]) == 1
+    assert 'already listening' in capsys.readouterr().err
+    # No worker processes or watcher threads are left behind
+    assert len(multiprocessing.active_children()) == children
+    assert threading.active_count() == threads
+    with LexerClient(socket_path) as client:
+        assert client.request('ping')['ok']
+
+def test_http_front_end(lexer):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LexerHTTPHandler)
+    server.verbose = False
+    serve(server, lexer)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        request = urllib.request.Request(url + '/counts?language=c', data=b'int x;')
+        with urllib.request.urlopen(request) as reply:
+            assert json.load(reply)['counts'] == {'KEYWORD': 1, 'IDENTIFIER': 1, 'PUNCTUATOR': 1}
+        with urllib.request.urlopen(url + '/health') as reply:
+            assert json.load(reply) == {'ok': True}
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(urllib.request.Request(url + '/nowhere', data=b''))
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
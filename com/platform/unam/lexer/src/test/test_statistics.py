@@ -0,0 +1,37 @@
+from collections import Counter
+
+from unam_lexer import LexicalAnalyzer, TokenStatistics
+from conftest import random_text
+
+def naive_counts(tokens):
+    counts = {key: Counter() for key, _, _ in TokenStatistics.CATEGORIES}
+    for token in tokens:
+        category = TokenStatistics.CATEGORY_OF_TYPE.get(token.type)
+        if category is not None:
+            counts[category][token.value] += 1
+    return counts
+
+def test_counts_match_a_naive_count(sample_text):
+    analyzer = LexicalAnalyzer()
+    for text in [sample_text] + [random_text(seed, 2000) for seed in range(10)]:
+        tokens = analyzer.tokenize(text)
+        stats = analyzer.classify_tokens(analyzer.tokenize_buffer(text))
+        assert stats.counters == naive_counts(tokens)
+        assert stats.total == len(tokens)
+
+def test_first_occurrence_order_and_position():
+    stats = LexicalAnalyzer().classify_tokens(LexicalAnalyzer().tokenize('b = a;\na = b + b;\n'))
+    assert list(stats.counters['identifiers'].items()) == [('b', 3), ('a', 2)]
+    assert stats.first_seen['identifiers'] == {'b': (1, 1), 'a': (1, 5)}
+    assert stats.category_totals()['operators'] == 3
+    report = stats.render_report()
+    assert '2. Identifiers: b, a' in report
+    assert 'b (appears 3 times)' in report
+
+def test_merge_adds_counts():
+    analyzer = LexicalAnalyzer()
+    merged = analyzer.classify_tokens(analyzer.tokenize('int a;'))
+    merged.merge(analyzer.classify_tokens(analyzer.tokenize('int b;\nint a;')))
+    assert merged.counters['keywords'] == Counter({'int': 3})
+    assert merged.first_seen['identifiers'] == {'a': (1, 5), 'b': (1, 5)}
+    assert merged.total == 9
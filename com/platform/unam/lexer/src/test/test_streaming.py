@@ -0,0 +1,43 @@
+import io
+import pathlib
+
+import pytest
+
+from unam_lexer import LexicalAnalyzer
+from conftest import random_text, token_key
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64])
+def test_chunked_stream_matches_tokenize(sample_text, chunk_size):
+    analyzer = LexicalAnalyzer()
+    for text in [sample_text] + [random_text(seed, 2000) for seed in range(10)]:
+        # Chunks small enough to cut through tokens, strings and comments
+        stream = io.StringIO(text)
+        assert token_key(analyzer.iter_tokens(stream, chunk_size=chunk_size)) == \
+            token_key(analyzer.tokenize(text))
+
+def test_text_and_path_sources(tmp_path, sample_text):
+    analyzer = LexicalAnalyzer()
+    path = tmp_path / 'source.c'
+    path.write_text(sample_text, encoding='utf-8')
+    expected = token_key(analyzer.tokenize(sample_text))
+    assert token_key(analyzer.iter_tokens(sample_text)) == expected
+    assert token_key(analyzer.iter_tokens(pathlib.Path(path), chunk_size=16)) == expected
+
+def test_a_str_source_is_never_opened(tmp_path, monkeypatch):
+    analyzer = LexicalAnalyzer()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'main.c').write_text('int main;\n', encoding='utf-8')
+    assert [token.value for token in analyzer.iter_tokens('main.c')] == ['main', '.', 'c']
+    assert [token.value for token in analyzer.iter_tokens(path='main.c', chunk_size=4)] == \
+        ['int', 'main', ';']
+    with pytest.raises(TypeError):
+        list(analyzer.iter_tokens('int a;', path='main.c'))
+    with pytest.raises(TypeError):
+        list(analyzer.iter_tokens())
+
+def test_tokens_straddling_a_chunk_boundary():
+    analyzer = LexicalAnalyzer()
+    text = 'x = 1.5e+3; /* a\ncomment */ s = "str\\"ing"; c = \'\\n\'; a += b;\n'
+    for chunk_size in range(1, len(text) + 1):
+        assert token_key(analyzer.iter_tokens(io.StringIO(text), chunk_size)) == \
+            token_key(analyzer.tokenize(text)), chunk_size
@@ -0,0 +1,40 @@
+import sys
+
+from unam_lexer import LexicalAnalyzer, TokenCache
+from conftest import random_text, token_key
+
+def test_memory_hits():
+    cache = TokenCache()
+    text = random_text(1, 1000)
+    first = cache.tokenize(text)
+    assert cache.tokenize(text) is first
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+def test_disk_round_trip(tmp_path, sample_text):
+    directory = str(tmp_path / 'tokens')
+    TokenCache(directory=directory).tokenize(sample_text)
+    cache = TokenCache(directory=directory)
+    buffer = cache.tokenize(sample_text)
+    assert cache.get_stats()['disk_hits'] == 1
+    assert token_key(buffer) == token_key(LexicalAnalyzer().tokenize(sample_text))
+
+def test_other_language_misses_the_disk_copy(tmp_path, sample_text):
+    directory = str(tmp_path / 'tokens')
+    TokenCache(directory=directory).tokenize(sample_text)
+    cache = TokenCache(LexicalAnalyzer(language='c'), directory=directory)
+    cache.tokenize(sample_text)
+    assert cache.get_stats()['disk_hits'] == 0
+
+def test_lru_eviction():
+    texts = [random_text(seed, 2000) for seed in range(3)]
+    analyzer = LexicalAnalyzer()
+    # Room for exactly two of the three results
+    cache = TokenCache(analyzer, max_bytes=sum(analyzer.tokenize_buffer(text).nbytes()
+                                               + sys.getsizeof(text) for text in texts[1:]))
+    for text in texts:
+        cache.tokenize(text)
+    assert cache.get_stats()['evictions'] == 1
+    # The oldest entry went first
+    cache.tokenize(texts[0])
+    assert cache.get_stats()['hits'] == 0
@@ -0,0 +1,112 @@
+import json
+import random
+
+from unam_lexer import TokenDiff
+from unam_lexer.cli import main
+from unam_lexer import tokendiff
+from unam_lexer.tokendiff import diff_sequences
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+def apply_hunks(a, b, hunks):
+    """b rebuilt from a and the hunks, checking the equal stretches between them"""
+    result = []
+    i = j = 0
+    for a_start, a_end, b_start, b_end in hunks:
+        assert a_start - i == b_start - j and a[i:a_start] == b[j:b_start]
+        assert a_start < a_end or b_start < b_end
+        result += a[i:a_start] + b[b_start:b_end]
+        i, j = a_end, b_end
+    assert a[i:] == b[j:]
+    return result + a[i:]
+
+def test_edit_scripts_are_minimal():
+    rnd = random.Random(1)
+    for _ in range(1000):
+        alphabet = rnd.randint(1, 6)
+        a = [rnd.randrange(alphabet) for _ in range(rnd.randint(0, 40))]
+        if rnd.random() < 0.5:
+            b = list(a)
+            for _ in range(rnd.randint(0, 6)):
+                position = rnd.randint(0, len(b))
+                if rnd.random() < 0.5:
+                    b.insert(position, rnd.randrange(alphabet + 2))
+                elif b:
+                    del b[min(position, len(b) - 1)]
+        else:
+            b = [rnd.randrange(alphabet) for _ in range(rnd.randint(0, 40))]
+        expected = len(a) + len(b) - 2 * lcs_length(a, b)
+        for minimal in (False, True):
+            hunks = diff_sequences(a, b, minimal)
+            assert apply_hunks(a, b, hunks) == b
+            assert sum(a_end - a_start + b_end - b_start
+                       for a_start, a_end, b_start, b_end in hunks) == expected
+
+def edit_cost(hunks):
+    return sum(a_end - a_start + b_end - b_start for a_start, a_end, b_start, b_end in hunks)
+
+def test_costly_inputs_below_the_size_limit_are_minimal(monkeypatch):
+    rnd = random.Random(3)
+    a = [rnd.randrange(20) for _ in range(600)]
+    b = [rnd.randrange(20) for _ in range(600)]
+    expected = len(a) + len(b) - 2 * lcs_length(a, b)
+    assert expected > tokendiff.TOO_EXPENSIVE
+    assert edit_cost(diff_sequences(a, b)) == expected
+    # Above the limit the search may give up on costly regions, but not with minimal
+    monkeypatch.setattr(tokendiff, 'MINIMAL_SIZE', 100)
+    hunks = diff_sequences(a, b)
+    assert apply_hunks(a, b, hunks) == b and edit_cost(hunks) > expected
+    assert edit_cost(diff_sequences(a, b, minimal=True)) == expected
+
+def test_long_sequences_with_scattered_changes():
+    rnd = random.Random(2)
+    a = [rnd.randrange(50) for _ in range(20000)]
+    b = list(a)
+    for _ in range(50):
+        b[rnd.randrange(len(b))] = 99
+    hunks = diff_sequences(a, b)
+    assert apply_hunks(a, b, hunks) == b
+    assert len(hunks) <= 50
+
+def test_whitespace_and_comments_are_not_changes():
+    old = 'int main(void) {\n    int x = 1; /* note */\n    return x + 2;\n}\n'
+    new = 'int main(void)\n{\n  int x = 1;   // other note\n  int y = 3;\n  return x * y;\n}\n'
+    diff = TokenDiff(old, old.replace('    ', '\t') + '// trailing\n')
+    assert diff.hunks == []
+
+    changes = list(TokenDiff(old, new).changes())
+    assert [change['op'] for change in changes] == ['insert', 'replace']
+    insert, replace = changes
+    assert insert['new']['values'] == ['int', 'y', '=', '3', ';']
+    # An empty side is anchored at the token after the change
+    assert (insert['old']['line'], insert['old']['column']) == (3, 5)
+    assert (insert['new']['line'], insert['new']['column']) == (4, 3)
+    assert (replace['old']['values'], replace['new']['values']) == (['+', '2'], ['*', 'y'])
+    assert (replace['old']['line'], replace['old']['column']) == (3, 14)
+
+def test_change_at_end_is_anchored_past_the_last_token():
+    diff = TokenDiff('a = 1;\n', 'a = 1;\nb = 2;')
+    change, = diff.changes()
+    assert change['op'] == 'insert'
+    assert (change['old']['line'], change['old']['column']) == (2, 1)
+
+def test_diff_command(tmp_path, capsys):
+    old, new = tmp_path / 'old.c', tmp_path / 'new.c'
+    old.write_text('int a = 1;\n', encoding='utf-8')
+    new.write_text('int a = 1; /* same */\n', encoding='utf-8')
+    assert main(['diff', str(old), str(new)]) == 0
+    assert capsys.readouterr().out == ''
+    new.write_text('int a = 2;\n', encoding='utf-8')
+    assert main(['diff', str(old), str(new), '--format', 'json']) == 1
+    data = json.loads(capsys.readouterr().out)
+    assert data['stats']['hunks'] == 1
+    assert [hunk['op'] for hunk in data['hunks']] == ['replace']
+    assert main(['diff', str(old), str(tmp_path / 'nowhere.c')]) == 2
+    assert main(['diff', str(old), str(new), '--max-tokens', '-1']) == 2
@@ -0,0 +1,26 @@
+from unam_lexer import LexicalAnalyzer, TokenBuffer
+from conftest import random_text, token_key
+
+def test_buffer_matches_tokenize(sample_text):
+    analyzer = LexicalAnalyzer()
+    for text in [sample_text, ''] + [random_text(seed, 2000) for seed in range(10)]:
+        tokens = analyzer.tokenize(text)
+        buffer = analyzer.tokenize_buffer(text)
+        assert len(buffer) == len(tokens)
+        assert token_key(buffer) == token_key(tokens)
+        assert list(buffer.rows()) == [tuple(row) for row in token_key(tokens)]
+
+def test_views_and_indexing():
+    buffer = LexicalAnalyzer().tokenize_buffer('int total = 42;\n')
+    assert (buffer.type_name(1), buffer.value(1)) == ('IDENTIFIER', 'total')
+    token = buffer[-2]
+    assert (token.type, token.value, token.line, token.column) == ('INT_CONSTANT', '42', 1, 13)
+    assert buffer.nbytes() > 0
+
+def test_classification_of_buffer_and_tokens(sample_text):
+    analyzer = LexicalAnalyzer()
+    assert analyzer.classify_tokens(analyzer.tokenize_buffer(sample_text)).to_dict() == \
+        analyzer.classify_tokens(analyzer.tokenize(sample_text)).to_dict()
+
+def test_type_codes_are_interned():
+    assert TokenBuffer.intern_type('IDENTIFIER') == TokenBuffer.intern_type('IDENTIFIER')
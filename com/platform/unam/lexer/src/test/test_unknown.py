@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+from conftest import random_text, token_key
+from unam_lexer import LexicalAnalyzer, UnknownInputError
+from unam_lexer.cli import main
+from unam_lexer.utf8 import sniff_binary
+
+TEXTS = ['int a = 1 @@$ 2;\n', '@' * 50, 'x \x00\x00\x01 y', '`ñ`\n@\n$x', '']
+
+def unknown_values(tokens):
+    return [token.value for token in tokens if token.type == 'UNKNOWN']
+
+def test_a_run_is_one_unknown_token():
+    analyzer = LexicalAnalyzer()
+    assert unknown_values(analyzer.tokenize('int a = 1 @@$ 2;')) == ['@@$']
+    assert unknown_values(analyzer.tokenize('\x00' * 4096)) == ['\x00' * 4096]
+    # A char that can start a token ends the run
+    assert [token.value for token in analyzer.tokenize('@@x@')] == ['@@', 'x', '@']
+
+@pytest.mark.parametrize('engine', ['dfa', 'reference'])
+def test_engines_agree_on_runs(engine, tmp_path):
+    master = LexicalAnalyzer()
+    other = LexicalAnalyzer(engine=engine, dfa_cache_dir=str(tmp_path))
+    for text in TEXTS + [random_text(seed) for seed in range(20)]:
+        assert token_key(other.tokenize(text)) == token_key(master.tokenize(text)), text
+
+def test_scanners_agree_on_runs(tmp_path):
+    analyzer = LexicalAnalyzer()
+    path = tmp_path / 'source.c'
+    for text in TEXTS:
+        expected = token_key(analyzer.tokenize(text))
+        assert token_key(analyzer.tokenize_buffer(text)) == expected
+        assert token_key(analyzer.iter_tokens(io.StringIO(text), 3)) == expected
+        path.write_text(text, encoding='utf-8')
+        with analyzer.tokenize_mapped(str(path)) as buffer:
+            assert token_key(buffer) == expected
+
+def test_max_unknown():
+    analyzer = LexicalAnalyzer(max_unknown=2)
+    assert len(unknown_values(analyzer.tokenize('@ x $ y'))) == 2
+    with pytest.raises(UnknownInputError) as error:
+        analyzer.tokenize('@ x $ y\n`')
+    assert (error.value.limit, error.value.line, error.value.column) == (2, 2, 1)
+
+def test_sniff_binary():
+    assert sniff_binary(b'int a;\n') is None
+    assert sniff_binary('año\n'.encode('utf-8')) is None
+    assert sniff_binary(b'\x00\x01\x02\xff' * 64) == 'binary data'
+    assert sniff_binary('int a;'.encode('utf-16')) == 'UTF-16 text'
+    assert sniff_binary('int a;'.encode('utf-16-le')) == 'UTF-16 text'
+    assert sniff_binary('int a;'.encode('utf-32')) == 'UTF-32 text'
+    assert sniff_binary(b'caf\xe9\n') == 'not UTF-8 text'
+    assert sniff_binary(b'\x01\x02\x03 abc') == 'binary data'
+
+def test_lex_binary_policy(tmp_path, capsys):
+    source = tmp_path / 'src'
+    source.mkdir()
+    (source / 'a.c').write_text('int a;\n', encoding='utf-8')
+    (source / 'blob.c').write_bytes(b'\x00\x01\x02' * 64)
+
+    def lex(*extra):
+        output = tmp_path / 'out.jsonl'
+        status = main(['lex', str(source), '--jobs', '1', '--output', str(output), *extra])
+        return status, [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+
+    status, results = lex()
+    assert status == 0 and results[1] == {'file': str(source / 'blob.c'), 'skipped': 'binary data',
+                                          'bytes': 0, 'total': 0}
+    assert '(0 failed, 1 skipped)' in capsys.readouterr().err
+    status, results = lex('--binary', 'flag')
+    assert status == 0 and results[1]['binary'] == 'binary data' and results[1]['total'] == 1
+    status, results = lex('--binary', 'lex', '--max-unknown', '0')
+    assert status == 1 and 'error' in results[1] and 'error' not in results[0]
+    assert main(['lex', str(source), '--max-unknown', '-1']) == 2
@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from unam_lexer.cli import main
+from unam_lexer.server import LexerServer
+from unam_lexer.watch import TreeWatcher
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    # Make each write visible even on coarse mtime clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    write(tmp_path / 'a.c', 'int a;\n')
+    write(tmp_path / 'sub' / 'b.h', 'float b = 1.5;\n')
+    write(tmp_path / 'notes.md', 'int ignored;\n')
+    watcher = TreeWatcher([str(tmp_path)], jobs=1, use_inotify=False)
+    yield tmp_path, watcher
+    watcher.stop()
+
+def test_refresh_after_an_edit(tree):
+    root, watcher = tree
+    updates = []
+    watcher.listeners.append(lambda watcher, update: updates.append(update))
+    assert watcher.refresh()['changed'] == 2
+    assert watcher.backend == 'poll'
+    state = watcher.get_state(top=1)
+    assert (state['files'], state['tokens']) == (2, 8)
+    assert state['counts'] == {'FLOAT_CONSTANT': 1, 'IDENTIFIER': 2, 'KEYWORD': 2,
+                               'OPERATOR': 1, 'PUNCTUATOR': 2}
+    assert state['top_files'] == [[str(root / 'sub' / 'b.h'), 5]]
+
+    # Nothing changed: no re-lex and no listener call
+    assert watcher.refresh()['changed'] == 0 and len(updates) == 1
+    write(root / 'a.c', 'int a, c;\n')
+    update = watcher.refresh()
+    assert (update['changed'], update['removed']) == (1, 0)
+    assert watcher.get_state()['tokens'] == 10
+    assert watcher.get_file(str(root / 'a.c'))['counts'] == {'KEYWORD': 1, 'IDENTIFIER': 2,
+                                                            'PUNCTUATOR': 2}
+
+    os.remove(root / 'sub' / 'b.h')
+    assert watcher.refresh()['removed'] == 1
+    state = watcher.get_state()
+    assert (state['files'], state['tokens'], state['generation']) == (1, 5, 3)
+    assert 'FLOAT_CONSTANT' not in state['counts']
+
+def test_refresh_of_event_paths(tree):
+    root, watcher = tree
+    watcher.refresh()
+    write(root / 'sub' / 'c.c', 'int c;\n')
+    write(root / 'a.c', 'int a, d;\n')
+    # Only what the events name is looked at
+    assert watcher.refresh([str(root / 'sub')])['changed'] == 1
+    assert watcher.get_file(str(root / 'a.c'))['total'] == 3
+    os.remove(root / 'sub' / 'b.h')
+    os.remove(root / 'sub' / 'c.c')
+    os.rmdir(root / 'sub')
+    assert watcher.refresh([str(root / 'sub')])['removed'] == 2
+
+def test_server_watch_op(tree):
+    root, watcher = tree
+    watcher.refresh()
+    lexer = LexerServer(workers=1, batch_wait=0, watcher=watcher)
+    try:
+        assert lexer.watch_state(1)['state']['tokens'] == 8
+        assert lexer.watch_state(2, str(root / 'a.c'))['result']['total'] == 3
+        assert 'error' in lexer.watch_state(3, str(root / 'notes.md'))
+        lexer.watcher = None
+        assert 'error' in lexer.watch_state(4)
+    finally:
+        lexer.close()
+
+def test_watch_once(tree, capsys):
+    root, _ = tree
+    assert main(['watch', str(root), '--once', '--poll', '--jobs', '1', '--format', 'jsonl']) == 0
+    state = json.loads(capsys.readouterr().out)
+    assert state['files'] == 2 and state['update']['changed'] == 2
+    assert main(['watch', str(root / 'nowhere'), '--once']) == 2
+    assert 'nowhere: no such file or directory' in capsys.readouterr().err